@@ -5,41 +5,20 @@ Description: Game using A* Search
 '''
 
 import pygame
-import random
-import heapq # Based on my research, heapq is faster since it doesn't have the locking mechanisms that PriorityQueue() has
+
+from pathfinding import DIRECTIONS, EAST, GRAPH_WIDTH, GRAPH_HEIGHT, WALLS, ComponentIndex, CooperativePlanner, DStarLite, Grid, Instrumentation, Landmarks, PathCache, PlannerService, PlanScheduler, SharedDistanceField
 
 # Chosen pygame colors
 GREEN4 = (0, 139, 0)
 DARKSLATEGRAY4 = (82, 139, 139)
-
-# Directions in pygame. In pygame, the origin starts on the top-left corner of the screen with increasing x going right and increasing y going down (not up)
-EAST = (1, 0) # RIGHT
-WEST = (-1, 0) # LEFT
-SOUTH = (0, 1) # DOWN
-NORTH = (0, -1) # UP
-SOUTHEAST = (1, 1) # RIGHT_DOWN
-SOUTHWEST = (-1, 1) # LEFT_DOWN
-NORTHEAST = (1, -1) # RIGHT_UP
-NORTHWEST = (-1, -1) # LEFT_UP
-DIRECTIONS = [EAST, WEST, SOUTH, NORTH, SOUTHEAST, SOUTHWEST, NORTHEAST, NORTHWEST]
+EXPLORED = (255, 215, 0, 90) # Gold, see-through: the nodes the last search expanded, shown by the debug overlay
+WHITE = (255, 255, 255)
 
 # Graph properties
 NODE_SIZE = 48
-GRAPH_WIDTH = 28
-GRAPH_HEIGHT = 15
 WIDTH = NODE_SIZE * GRAPH_WIDTH # = 1344
 HEIGHT = NODE_SIZE * GRAPH_HEIGHT # = 720
 
-# Nodes in which the player shouldn't be able to pass
-WALLS = [(2,0),(0,11),(23,14),(0,0),(1,0),(3,0),(17,0),(18,0),(19,0),(20,0),(22,0),(23,0),(24,0),(27,3),(27,4),(27,5),(27,12),(24,14),(22,14),(21,14),(19,14),(18,14),(10,14),(9,14),(8,14),
-(7,14),(6,14),(3,14),(4,14),(2,14),(0,14),(0,13),(0,12),(0,9),(0,8),(0,7),(0,5),(0,4),(0,3),(0,1),(19,6),(15,5),(15,7),(17,10),(17,8),(17,6),(17,5),(17,4),(22,5),(23,7),(22,10),(24,10),(24,9),
-(24,7),(25,5),(26,5),(22,8),(19,10),(13,12),(6,5),(4,8),(5,12),(7,12),(7,10),(6,8),(3,5),(3,3),(4,3),(10,3),(11,4),(15,6),(15,8),(14,5),(11,7),(11,6),(11,5),(12,5),(22,2),(24,2),(24,5),(24,6),
-(22,7),(22,3),(22,4),(23,2),(26,3),(25,3),(24,3),(20,6),(19,5),(19,7),(19,8),(19,9),(20,10),(21,10),(20,8),(25,9),(26,8),(26,9),(17,9),(17,11),(17,3),(17,2),(13,10),(13,11),(7,11),(6,12),(5,8),
-(7,8),(7,9),(4,7),(3,4),(5,5),(4,5),(7,5),(8,5),(9,5),(11,3),(13,2),(13,3),(15,3),(14,3),(15,1),(6,6),(8,8),(10,8),(9,12),(10,12),(11,12),(9,11),(9,10),(15,12),(16,12),(17,12),(13,13),(15,13),
-(17,14),(11,14),(5,1),(26,2),(26,0),(19,2),(20,2),(20,3),(20,4),(19,4),(26,7),(19,12),(20,12),(21,12),(22,12),(23,12),(24,12),(24,11),(26,12),(26,11),(3,10),(4,9),(4,10),(5,10),(2,10),(2,9),
-(2,8),(2,7),(2,11),(2,12),(3,12),(2,5),(1,3),(2,1),(4,2),(5,2),(7,2),(9,3),(13,1),(12,1),(11,1),(6,4),(8,3),(8,2),(10,1),(27,14),(26,14),(8,7),(11,8),(11,9),(12,9),(13,9),(14,9),(15,9),(11,11),
-(15,10),(10,7),(7,1),(7,0),(10,0),(9,0)]
-
 # Initialize pygame, set the screen, determine file directory
 pygame.init()
 screen = pygame.display.set_mode((WIDTH, HEIGHT)) # 1344 x 720
@@ -49,10 +28,38 @@ ENEMY_INITIAL_START = pygame.math.Vector2(26, 10)
 ENEMY_INITIAL_START2 = pygame.math.Vector2(0, 2)
 INITIAL_GOAL = pygame.math.Vector2(13, 7)
 
-# Initial speeds for the player and the enemy. As of now, speed values can only be INT data types
+# Initial speeds for the player and the enemy, in pixels per simulation step. As of now, speed values can only be INT data types
 INITIAL_PLAYER_SPEED = 1
 INITIAL_ENEMY_SPEED = 2
 
+'''
+Timing: the agents move in fixed simulation steps, so the game runs at the same speed on a slow or a fast computer
+Frames are drawn as often as MAX_FPS allows, with the agents placed between their last two steps, and path planning
+only gets PLANNING_BUDGET seconds of every frame. Searches that don't fit carry on in the next frames
+'''
+STEPS_PER_SECOND = 60
+STEP = 1 / STEPS_PER_SECOND
+MAX_FPS = 120
+MAX_FRAME_TIME = 0.25 # A longer frame (e.g. the window was dragged) is cut short instead of running hundreds of steps to catch up
+PLANNING_BUDGET = 0.004
+
+# The player's searches run on worker threads, so even a long one never holds up a frame. Set to False to search on the main thread,
+# within PLANNING_BUDGET
+BACKGROUND_PLANNING = True
+PLANNING_THREADS = 2
+
+# The player's searches estimate distances with this many landmarks (ALT), which know about the walls, instead of octile alone. 0 for octile
+LANDMARKS = 8
+
+# Every enemy chases the player, so by default they share one distance field to the player instead of planning one by one
+# Set to False to give every enemy its own D* Lite planner instead
+SHARED_ENEMY_FIELD = True
+
+# The enemies plan together instead, each one around the next COOPERATIVE_WINDOW steps of the ones planned before it (WHCA*),
+# so they make way for each other instead of piling onto the same nodes. Takes the place of SHARED_ENEMY_FIELD when True
+COOPERATIVE_ENEMIES = True
+COOPERATIVE_WINDOW = 8
+
 # GLOBAL Utility function which convert's a given node's graph coordinates into pygame's rectangular coordinates
 def convert(node):
     x = node.x * NODE_SIZE + (NODE_SIZE / 2) # Multiply by NODE_SIZE to find the graph's index, then add by half of the NODE_SIZE to go to the middle of the NODE; The same computation applies to y
@@ -60,98 +67,75 @@ def convert(node):
     return x, y
 
 def get_random_coordinates(graph):
-    start = graph.walls[0]
-    
-    while start in graph.walls:
-        x = random.randint(0, GRAPH_WIDTH - 1)
-        y = random.randint(0, GRAPH_HEIGHT - 1)
-        start = pygame.math.Vector2(x, y)
-        
-    return start
-
-# A priority queue implementation using heapq
-class PriorityQueue():
-    def __init__(self):
-        self.nodes = []
-
-    def push(self, priority, value):
-        '''
-        Params:
-        1st: a collection to push the priority-value combination into
-        2nd: (a priority, a value): values to be used for comparision since everytime this function is invoked,
-        the collection will RESORT by priority, THEN by value (to be used if priorities match)
-        '''
-        heapq.heappush(self.nodes, (priority, value))
-
-    def pop(self):
-        return heapq.heappop(self.nodes)[1] # THIS IS NOT 0 because the 0th index is the root node
-
-    def empty(self):
-        if len(self.nodes) == 0:
-            return True
-        else:
-            return False
+    return pygame.math.Vector2(graph.random_open_cell())
 
-class Node():
-    def __init__(self, value):
-        self.value = value
-        self.g = 0 # Initial cost is 0 since it takes no effort to get to where you are now
-        self.f = 0 # The priority value
-        self.path = pygame.math.Vector2(0, 0) # Normally a direction
-        self.children = []
+'''
+Keeps track of what changed on the screen, so a frame only redraws and sends those parts instead of the whole window
+The ground and the walls are drawn once on a background surface. Everything drawn over it during a frame (the goal, arrows, overlays)
+goes through blit(), which only lists it. present() compares the list with the last frame's: an image drawn at the same place as
+last frame is still on the screen and is left alone, the places nothing is drawn over anymore get the background back,
+and only those and the new images are drawn and sent to the display
+'''
+class Canvas:
+    def __init__(self, surface):
+        self.surface = surface
+        self.background = pygame.Surface(surface.get_size()).convert()
+        self.shown = [] # (image, (x, y)) of everything on the screen over the background
+        self.drawn = [] # (image, (x, y)) of everything drawn over the background this frame
+        self.erased = [] # Rects where the background was put back over whatever was there, since the last present()
+        self.dirty = [surface.get_rect()] # Rects that changed since the last present(), the first frame sends everything
+
+    # Draws an image over the background for this frame only
+    def blit(self, image, rectangle):
+        self.drawn.append((image, (int(rectangle[0]), int(rectangle[1]))))
+
+    # Puts the background back over part of the screen. Also the bgd of a sprite group's clear(), for the overlays under sprites to be drawn again
+    def erase(self, surface, rectangle):
+        surface.blit(self.background, rectangle, rectangle)
+        self.erased.append(pygame.Rect(rectangle))
+
+    # Copies part of the background to the screen after the background changed there
+    def refresh(self, rectangle=None):
+        if rectangle is None:
+            rectangle = self.surface.get_rect()
+        self.erase(self.surface, rectangle)
+        self.dirty.append(rectangle)
 
     '''
-    Abstract Data Types (ADTs) such as this Node clas, are NOT comparable,
-    so I have to redefine how to handle the "less than" operation for the PriorityQueue class to work
+    Draws what changed since the last frame, then the sprites of group if given, and sends the changed parts of the screen to the display
+    The places where images appeared, went away or were erased are merged into rects that don't overlap. Each rect gets the background
+    back and every image over it drawn again in order, so images with transparent pixels are never blended over themselves
     '''
-    def __lt__(self, other):
-        self_vals = (self.f, tuple(self.value))
-        other_vals = (other.f, tuple(other.value))
-        return self_vals < other_vals
-
-    def get_children(self, graph):
-        child_values = []
+    def present(self, group=None):
+        kept = set(self.shown).intersection(self.drawn)
+        changed = self.erased + [pygame.Rect(position, image.get_size()) for image, position in self.shown + self.drawn
+                                 if (image, position) not in kept]
+        regions = []
+        for rectangle in changed:
+            index = rectangle.collidelist(regions)
+            while index != -1:
+                rectangle = rectangle.union(regions.pop(index))
+                index = rectangle.collidelist(regions)
+            regions.append(rectangle)
+
+        for rectangle in regions:
+            self.surface.blit(self.background, rectangle, rectangle)
+        for image, position in self.drawn:
+            rectangle = pygame.Rect(position, image.get_size())
+            for index in rectangle.collidelistall(regions):
+                area = rectangle.clip(regions[index])
+                self.surface.blit(image, area, area.move(-position[0], -position[1]))
+
+        self.dirty.extend(regions)
+        if group is not None:
+            self.dirty.extend(group.draw(self.surface))
+        screen_rect = self.surface.get_rect()
+        pygame.display.update([rectangle.clip(screen_rect) for rectangle in self.dirty])
+        self.shown = self.drawn
+        self.drawn = []
+        self.erased = []
+        self.dirty = []
 
-        # Add the coordinate value of this node with every item in from the directions list
-        for direction in DIRECTIONS:
-            child_value = self.value + pygame.math.Vector2(direction)
-            child_values.append(child_value)
-            
-        # Remove the coordinates that are not within the screen and are walls by using python's filter function   
-        child_values = filter(graph.in_bounds, child_values)
-        child_values = filter(graph.passable, child_values)
-
-        '''
-        Now that we know what child coordinates to consider, make new nodes for the unvisted and use existing ones if they have been visited
-        (The exisitng ones are later found from the nodes dictionary, right after this function call)
-        '''
-        for value in child_values:
-            child = Node(value)
-            self.children.append(child)
-
-        return self.children
-        
-    '''
-    Computes the distance cost, g, from f = h + g to get from one node to the next using the distance formula: sqrt((x2 - x1)**2 + (y2 - y1)**2)
-    Pygame does this by using length_squared(), but this omits the square root part to avoid floats
-    Note that the params are flipped when the function is CALLED
-    That is because a_star search actually searches for a path from the GOAL to the START
-    This implies that self.value is CLOSER to the AGENT's goal and should be where we want to go from child_value' coordinate
-    '''
-    def cost_to(self, child_value):
-        '''
-        If the nodes are adjacent from each other, the distance = 1 due to distance formula of a 45-45-90 degree triangle
-        1 is then multiplied by 10 to avoid floats: 1 * 10 = 10
-        '''
-        if (self.value - child_value).length_squared() == 1:
-            return self.g + 10 # return the cost to get to yourself plus the cost to get to the child
-        else:
-            '''
-            If the nodes are diagonal from each other, the distance = hypoteneuse: 1.4 = c from a**2 + b**2 = c**2, where a = b = 1
-            10 is then multiplied to avoid floats: 1.4 * 10 = 14, the cost to get to the next DIAGONAL node
-            '''
-            return self.g + 14
-        
 class Agent(pygame.sprite.Sprite): # Inherit's pygame's Sprite class
     def __init__(self, position, goal, speed, name): # Python's eqivalent of a constructor
         pygame.sprite.Sprite.__init__(self) # First initialize the Sprite class since it is inherited
@@ -167,6 +151,8 @@ class Agent(pygame.sprite.Sprite): # Inherit's pygame's Sprite class
         # Find the agent's center in pygame's rectangular coordinates FROM graph coordinates
         center = convert(position)
         self.rect.center = center # Set the center of the rectangle
+        self.center = center # Where the simulation has the agent. The rectangle is only moved there when the agent is drawn
+        self.previous = center # Where the agent was one simulation step ago
 
         # Store arrow images into a dictionary for drawing a path
         self.arrows = {}
@@ -183,38 +169,32 @@ class Agent(pygame.sprite.Sprite): # Inherit's pygame's Sprite class
 
     # Draws the path to the goal
     def draw_path(self):
-        current = self.current
-        goal = self.goal
-
-        while current != goal:
-            direction = self.closed[tuple(current)].path # get the direction of the current node in vector form; This direction will point towards the goal
-            
-            center = convert(current)
+        # steps() walks the path from the agent's node, giving each node with the direction that points towards the goal
+        for node, direction in self.result.steps(self.current):
+            if direction == (0, 0):
+                continue # A cooperative plan waits on this node for a step, there is no arrow for that
+            center = convert(pygame.math.Vector2(node))
         
             # Draw the arrow image for a node
-            image = self.arrows[tuple(direction)] # Refer to the arrows dictionary to get the arrow IMAGE for the given direction
+            image = self.arrows[direction] # Refer to the arrows dictionary to get the arrow IMAGE for the given direction
             rectangle = image.get_rect()
             rectangle.center = center
-            screen.blit(image, rectangle)
-            
-            current = current + direction # Traverse to the next node by adding the direction
-
-            # Consider creating a solution path collection
+            canvas.blit(image, rectangle)
 
     # Player's moving function
     def update(self):
         if self.current != self.goal:
             # First, determine the next node
-            direction = self.closed[tuple(self.current)].path
+            direction = self.result.direction(self.current)
             next_node = self.current + direction
 
             # Get the RECTANGULAR CENTER of the next node
             next_center = convert(next_node)
 
             # Now get the difference between the next node's center AND the position of the player - This will help determine which direction to move
-            difference = (next_center[0] - self.rect.center[0], next_center[1] - self.rect.center[1])
+            difference = (next_center[0] - self.center[0], next_center[1] - self.center[1])
             
-            center = list(self.rect.center) # Assignment is neccessary due to rectangle's center attribute being immutable, since it is a tuple
+            center = list(self.center) # Assignment is neccessary due to the center being immutable, since it is a tuple
 
             # The normal cardinal directions
             if difference[0] > 0 and difference[1] == 0:
@@ -242,7 +222,14 @@ class Agent(pygame.sprite.Sprite): # Inherit's pygame's Sprite class
             elif difference[0] == 0 and difference[1] == 0: # When the player reaches the node:
                 self.current = next_node # Going nowhere, so move to the next node
 
-            self.rect.center = center # Once the player's stride is complete, reset the center coordinate for the player
+            self.center = tuple(center) # Once the player's stride is complete, reset the center coordinate for the player
+            self.rect.center = self.center # Collisions are checked at the simulation's positions
+
+    # Moves the rectangle part of the way from where the agent was one step ago to where it is now. alpha: 0 to 1
+    def interpolate(self, alpha):
+        x = self.previous[0] + (self.center[0] - self.previous[0]) * alpha
+        y = self.previous[1] + (self.center[1] - self.previous[1]) * alpha
+        self.rect.center = (round(x), round(y))
 
     # Updates the Player's position in both GRAPH and RECTANGULAR COORDINATES
     def position(self, start):
@@ -250,69 +237,27 @@ class Agent(pygame.sprite.Sprite): # Inherit's pygame's Sprite class
         
         center = convert(start)
         self.rect.center = center
+        self.center = center
+        self.previous = center
 
-    '''
-    The manhattan distance, h2, from the lecture slides, scaled to have a bigger effect on the priority calculation
-    Note that order doesn't matter since we are using the absolute value
-    '''
-    def heuristic(self, goal, child):
-        return (abs(goal.value.x - child.value.x) + abs(goal.value.y - child.value.y)) * 10
-
+    # Asks the graph's planner for a path. A cached path comes back at once, a new search may take a few frames
+    # Nothing is searched again unless the agent, its goal or a wall on the way has changed
     def a_star_search(self, graph):
-        self.state = 'Searching'
-        # SWITCHED because search will find a path from the goal TO THE start positions
-        start = Node(self.goal)
-        goal = Node(self.current)
-
-        # The open and closed queues
-        openPriorityQueue = PriorityQueue()
-        openPriorityQueue.push(0, start) # root node has 0 priority, that is why pop uses the 1st index instead of 0th
-        self.closed = {} # This dictionary will help me keep track of all instances of nodes I have explored
-        self.closed[tuple(start.value)] = start
-
-        while not openPriorityQueue.empty():
-            # Will always pop, and subsequently, examine the node with the lowest priority, f, thereby, drasticly reducing the search space
-            current = openPriorityQueue.pop()
-            
-            if current.value == goal.value:
-                self.state = 'Moving'
-                break
-            else:
-                children = current.get_children(graph) # Passing info about the environment, graph, to the agent to get a colllection of empty child nodes
-                
-                for child in children:
-                    # Grab an earlier reference to the child, if any, else the child that we are dealing will be one of the newly created nodes
-                    if tuple(child.value) in self.closed:
-                        child = self.closed[tuple(child.value)]
-                        
-                    # Calculate the distance cost, g, from f = g + h to get from one node to the next
-                    cost = current.cost_to(child.value)
-
-                    # Case 1: If child is unvisited
-                    if tuple(child.value) not in self.closed:
-                        child.g = cost
-                        
-                        '''
-                        Calculate the priority, f, from f = g + h, then push the child into the priority queue
-                        Pushing will ALSO resort the queue, since the PriorityQueue class uses Python's heapq
-                        '''
-                        child.f = cost + self.heuristic(goal, child)
-                        child.path = current.value - child.value # Set child with a vector that comes FROM the child TO current (Think: "head minus tail")
-                        
-                        self.closed[tuple(child.value)] = child # I need to keep track of all the state of the children for future reference
-                        openPriorityQueue.push(child.f, child)
-                        
-                    # Case 2: If child has been visited but it's cost, g, is too large
-                    elif cost < child.g:
-                        child.g = cost # update with the better cost
-                        child.f = cost + self.heuristic(goal, child)
-                        child.path = current.value - child.value
-
-                        self.closed[tuple(child.value)] = child # Replace the older version with this updated child
-                        openPriorityQueue.push(child.f, child) #What about removing the old version of the child first?
-                        
-                    # Case 3: If child has been visited but it's cost, g, is too small
-                        # Do nothing!
+        if not graph.components.connected(self.current, self.goal):
+            self.state = 'Trapped' # Walls cut the agent off from its goal, so there is nothing to search for
+            graph.requests.cancel(self)
+            return
+
+        # The agent keeps following its last path until the new one comes in, unless it was moved off that path
+        if self.state != 'Moving' or self.result.nodes.locate(self.current) == -1:
+            self.state = 'Searching'
+        graph.requests.request(self, self.current, self.goal, self.found_path)
+
+    # Called by the planner with the search result, which is kept around so draw_path() and update() can follow it
+    def found_path(self, result):
+        self.result = result
+        if result.found:
+            self.state = 'Moving'
 
 class Enemy(Agent):
     def __init__(self, position, goal, speed, name):
@@ -324,16 +269,84 @@ class Enemy(Agent):
         for direction in DIRECTIONS:
             angle = pygame.math.Vector2(direction).angle_to(pygame.math.Vector2(EAST))
             self.arrows[direction] = pygame.transform.rotate(arrow_img, angle)
-        
-        
-class Graph:
-    def __init__(self, width, height, goal):
-        self.width = width
-        self.height = height
 
-        self.walls = [] # Collection of walls to check against to prevent user from running into them
-        for wall in WALLS:
-            self.walls.append(pygame.math.Vector2(wall))
+        self.planner = None # Created on the first chase() call
+        self.planned = 0 # The frame the enemy last planned in. When planning runs out of time, the enemies that waited longest go first
+
+    '''
+    The enemy's goal moves with the player every frame, so instead of a new search each time,
+    it keeps a D* Lite planner around which only repairs the part of its search that the moves or wall changes affect
+    '''
+    def chase(self, graph, goal):
+        self.goal = goal
+
+        if self.planner is None:
+            self.planner = DStarLite(graph, self.current, goal)
+        else:
+            self.planner.move_start(self.current)
+            self.planner.move_goal(goal)
+
+        self.result = self.planner.plan()
+        if self.result.found:
+            self.state = 'Moving'
+        else:
+            self.state = 'Searching'
+
+    # Follows a distance field shared by every enemy, which already knows the next step from every node
+    def follow(self, field):
+        self.goal = pygame.math.Vector2(field.goal)
+        self.result = field # The field has the same direction() that draw_path() and update() use on a search result
+
+        if field.reachable(self.current):
+            self.state = 'Moving'
+        else:
+            self.state = 'Searching'
+
+    # Takes the enemy's part of a plan made for all the enemies together by the maze's CooperativePlanner
+    def cooperate(self, result):
+        self.goal = pygame.math.Vector2(result.goal)
+        self.result = result
+
+        if result.found:
+            self.state = 'Moving'
+        else:
+            self.state = 'Searching'
+
+    # The planner listens to the maze for wall changes, so it has to be unhooked once the enemy is gone
+    def stop_planning(self):
+        if self.planner is not None:
+            self.planner.detach()
+            self.planner = None
+
+    def kill(self):
+        self.stop_planning()
+        Agent.kill(self)
+
+class Graph(Grid): # The headless Grid holds the walls, this class only adds what is needed to draw them
+    def __init__(self, width, height, goal):
+        Grid.__init__(self, width, height, WALLS)
+        self.components = ComponentIndex(self) # Tells at once when walls cut an agent off from its goal
+        self.heuristic = Landmarks(self, LANDMARKS) if LANDMARKS else None # Its tables are worked out again whenever a wall is toggled
+        self.paths = PathCache(self, components=self.components, heuristic=self.heuristic) # Shared by the player and the enemies, and kept up to date as walls are toggled
+        self.crowd = CooperativePlanner(self, COOPERATIVE_WINDOW) # Plans the enemies together, when COOPERATIVE_ENEMIES is on
+        self.planner = PlanScheduler(self, PLANNING_BUDGET, cache=self.paths, components=self.components, heuristic=self.heuristic) # Spreads long searches over several frames
+
+        # Where the agents send their path requests: the worker threads, or the planner when BACKGROUND_PLANNING is off
+        self.service = None
+        self.requests = self.planner
+        if BACKGROUND_PLANNING:
+            self.service = self.requests = PlannerService(self, PLANNING_THREADS, cache=self.paths, components=self.components, heuristic=self.heuristic)
+
+        # The ground and walls are drawn once, and only the node that changed is drawn again when a wall is toggled
+        self.draw_background()
+        self.add_listener(self.wall_changed)
+
+        # Debug overlay, toggled with the 'd' key. While it is off, the searches run without instrumentation
+        self.debug = False
+        self.trace = Instrumentation(record=True)
+        self.explored_image = pygame.Surface((NODE_SIZE, NODE_SIZE), pygame.SRCALPHA)
+        self.explored_image.fill(EXPLORED)
+        self.font = None
 
         self.goal_image = pygame.image.load('icons/ufoBlue.png').convert_alpha()
         self.goal_image = pygame.transform.scale(self.goal_image, (50, 50))
@@ -342,14 +355,6 @@ class Graph:
         self.position(goal)
         self.home = goal
 
-    # Checks to see if the given node is within my screen
-    def in_bounds(self, node):
-        return 0 <= node.x < self.width and 0 <= node.y < self.height # Is x is between 0 and the width? Is y between 0 and the height?
-
-    # Checks if a node is a wall from the walls list
-    def passable(self, node):
-        return node not in self.walls
-
     def position(self, goal):
         self.home = goal
         center = convert(goal)
@@ -357,15 +362,10 @@ class Graph:
         self.rectangle = self.goal_image.get_rect()
         self.rectangle.center = (center)
 
-    # Print out a list of the walls for easy updating
-    def print_walls(self):
-        for wall in self.walls:
-            print('(' + str(int(wall.x)) + ',' + str(int(wall.y)) + ')')
-
-    # Draws the ground, the walls, and the goal icon
-    def draw(self):
+    # Draws the ground and the walls on the canvas' background
+    def draw_background(self):
         # First, let's draw the ground
-        screen.fill(GREEN4)
+        canvas.background.fill(GREEN4)
         
         # Then, let's draw the walls
         for wall in self.walls:
@@ -374,17 +374,42 @@ class Graph:
              1st param: Where to draw the wall
              2nd param: The width and height of the wall
             '''
-            position = wall * NODE_SIZE
+            position = pygame.math.Vector2(wall) * NODE_SIZE
             rectangle = pygame.Rect(position, (NODE_SIZE, NODE_SIZE))
-            pygame.draw.rect(screen, DARKSLATEGRAY4, rectangle) # Draw the rectangle onto the screen, with the given color
+            pygame.draw.rect(canvas.background, DARKSLATEGRAY4, rectangle) # Draw the rectangle onto the background, with the given color
+        canvas.refresh()
 
-        # Now let's draw the goal icon
-        screen.blit(self.goal_image, self.rectangle)
+    # Grid listener: draws the one node that changed on the background and marks it to be sent to the display
+    def wall_changed(self, node, blocked):
+        rectangle = pygame.Rect(pygame.math.Vector2(node) * NODE_SIZE, (NODE_SIZE, NODE_SIZE))
+        pygame.draw.rect(canvas.background, DARKSLATEGRAY4 if blocked else GREEN4, rectangle)
+        canvas.refresh(rectangle)
+
+    # Draws the goal icon
+    def draw(self):
+        canvas.blit(self.goal_image, self.rectangle)
+
+    # Turns the debug overlay on or off. The cached paths are dropped so the next search is traced
+    def toggle_debug(self):
+        self.debug = not self.debug
+        self.paths.options['instrument'] = self.trace if self.debug else None
+        self.requests.options['instrument'] = self.trace if self.debug else None
+        self.paths.clear()
+
+    # Colors the nodes the last traced search expanded, and writes its counters in the top left corner
+    def draw_debug(self):
+        for node in self.trace.expanded_nodes:
+            canvas.blit(self.explored_image, pygame.math.Vector2(self.coordinates(node)) * NODE_SIZE)
+
+        if self.font is None:
+            self.font = pygame.font.Font(None, 28) # pygame's default font, loaded the first time the overlay is shown
+        canvas.blit(self.font.render(self.trace.summary(), True, WHITE), (8, 8))
     
 # Set up the game
 print('Loading game. Please wait...\n')
 
 # Maze Setup
+canvas = Canvas(screen)
 maze = Graph(GRAPH_WIDTH, GRAPH_HEIGHT, INITIAL_GOAL)
 
 # Player setup
@@ -396,6 +421,7 @@ players.add(player)
 enemy = Enemy(ENEMY_INITIAL_START, player.current, INITIAL_ENEMY_SPEED, 'Enemy One')
 enemy2 = Enemy(ENEMY_INITIAL_START2, player.current, INITIAL_ENEMY_SPEED, 'Enemy Two')
 enemies = pygame.sprite.RenderUpdates()
+enemy_field = SharedDistanceField(maze) # One distance field to the player, read by every enemy
 enemies.add(enemy)
 enemies.add(enemy2)
 
@@ -408,16 +434,26 @@ all_sprites.add(enemy2)
 # Controls the game screen I am in
 on = True
 running = True
+clock = pygame.time.Clock()
+frame = 0
+crowd_situation = None # What the enemies' cooperative plan was made for: the walls and where everyone was
+crowd_waited = False # Whether the enemies' cooperative plan was put off last frame for lack of planning time
 
 # Start the game
 while on:
     retry = True
-    barrier = (-1, -1)
+    barrier = None
 
     player.a_star_search(maze)
     print('Load complete. Starting game...\n')
+    clock.tick() # Don't count the time spent loading or on the retry screen
+    lag = 0 # Time the simulation is behind the clock, used up in STEP sized steps
     
     while running:
+        lag += min(clock.tick(MAX_FPS) / 1000, MAX_FRAME_TIME)
+        frame += 1
+        maze.planner.begin_frame()
+
         # Check for player input
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -430,21 +466,25 @@ while on:
                 # Check if the 'w' key is pressed
                 if event.key == pygame.K_w:
                     maze.print_walls()
+
+                # The 'd' key shows or hides what the player's search explored
+                if event.key == pygame.K_d:
+                    maze.toggle_debug()
+                    player.a_star_search(maze)
                 
             if event.type == pygame.MOUSEBUTTONDOWN: # Get the screen coords of the mouseclick, then int divide by NODE_SIZE to get the graph coordinates
                 mouse_position = pygame.math.Vector2(pygame.mouse.get_pos()) // NODE_SIZE
 
                 if event.button == 1: # if there is a left mouse click, toggle the wall at the specified location
-                    if mouse_position in maze.walls:
-                        maze.walls.remove(mouse_position)
+                    if maze.is_wall(mouse_position):
+                        maze.remove_wall(mouse_position)
                     elif mouse_position == enemy.current or mouse_position == player.current:
                         print("You can't place a wall on top of an agent!")
                     else:
-                        if mouse_position not in maze.walls:
-                            if barrier in maze.walls:
-                                maze.walls.remove(barrier)
-                            maze.walls.append(mouse_position)
-                            barrier = mouse_position
+                        if barrier is not None and maze.is_wall(barrier):
+                            maze.remove_wall(barrier)
+                        maze.add_wall(mouse_position)
+                        barrier = mouse_position
 
                 if event.button == 2: # if there is a middle mouse click, update the start position of the player
                     player.position(mouse_position)
@@ -456,62 +496,114 @@ while on:
                 # Recalculate search whenever MOUSEBUTTONDOWN
                 player.a_star_search(maze)
 
-        for enemy in enemies:
-            enemy.goal = player.current
-            enemy.a_star_search(maze) # Will this process ever stop in the case that the enemy is trapped?
+        # Planning: first the searches waiting in the planner, then the enemies for as long as this frame's planning time lasts
+        # An enemy that doesn't get to plan keeps following its last plan until a later frame, but the one that waited longest always plans
+        maze.planner.run()
+        if maze.service is not None:
+            maze.service.poll() # Hands out the paths the worker threads found since the last frame
+        if COOPERATIVE_ENEMIES:
+            # All the enemies plan at once, and only when one of them reached a node, the player moved or a wall changed
+            # The plan is put off to the next frame if this frame's planning time is used up, but never twice in a row
+            situation = (maze.version, tuple(player.current), tuple(tuple(enemy.current) for enemy in enemies))
+            if situation != crowd_situation and not crowd_waited and not maze.planner.has_time():
+                crowd_waited = True
+            elif situation != crowd_situation:
+                crowd_situation = situation
+                crowd_waited = False
+                chasing = []
+                for enemy in enemies:
+                    if maze.components.connected(enemy.current, player.current):
+                        chasing.append(enemy)
+                    else:
+                        enemy.state = 'Trapped'
+                plans = maze.crowd.plan([(enemy, enemy.current, player.current) for enemy in chasing])
+                for enemy in chasing:
+                    enemy.cooperate(plans[enemy])
+        else:
+            for number, enemy in enumerate(sorted(enemies, key=lambda enemy: enemy.planned)):
+                if number > 0 and not maze.planner.has_time():
+                    break
+                enemy.planned = frame
+                if not maze.components.connected(enemy.current, player.current):
+                    enemy.state = 'Trapped' # No need to plan, the enemy can't reach the player until a wall is removed
+                elif SHARED_ENEMY_FIELD:
+                    enemy.follow(enemy_field.towards(player.current)) # Only computed again when the player moves or a wall changes
+                else:
+                    enemy.chase(maze, player.current)
+
+        # Simulation: as many fixed steps as the time since the last frame holds
+        while lag >= STEP and running:
+            lag -= STEP
+            for sprite in all_sprites:
+                sprite.previous = sprite.center
+            if player.state == 'Moving':
+                player.update()
+            for enemy in enemies:
+                if enemy.state == 'Moving':
+                    enemy.update()
+            #players.update()
+            #enemies.update()
+            #all_sprites.update()
+
+            '''
+            Collision Detection: Finds collisions between members of each group
+            If either the 3rd/4th parameter is True, the collided members will be removed from their group
+            3rd param applies to the group in the 1st param
+            4th param applies to the group in the 2nd param
+            '''
+            for enemy in pygame.sprite.groupcollide(players, enemies, True, True):
+                '''
+                Reset/Initialize procedure
+                WORKAROUND: Pygame's groupcollide() seems to prevent me from re-using references of player and enemy, as a set to be used together
+                As a workaround, I have to declare new instances - In this case, a new enemies are created
+                Hypothesis: According to the documentation on groupcollide(), when a collision occurs, a dictionary entry will be added linking the collided sprites
+                This may be the reason why they instantly collide, when re-running the game
+                '''
+                for remaining in enemies:
+                    remaining.stop_planning()
+                enemies.empty()
+                all_sprites.empty()
+
+                start = get_random_coordinates(maze)
+                enemy = Enemy(start, player.current, INITIAL_ENEMY_SPEED, 'New Enemy One')
+                start = get_random_coordinates(maze)
+                enemy2 = Enemy(start, player.current, INITIAL_ENEMY_SPEED, 'New Enemy Two')
+
+                enemies.add(enemy)
+                enemies.add(enemy2)
+                all_sprites.add(enemy)
+                all_sprites.add(enemy2)
+
+                player.position(INITIAL_START)
+                player.state = 'Searching' # Its path doesn't go through the start, and this frame is still drawn
+                players.add(player) # After player collision, players container is already emptied
+                all_sprites.add(player)
 
-        # Start drawing after all the updates have been applied
+                running = False
+
+        # Start drawing after all the updates have been applied. The sprites are erased first, so the arrows can be drawn under them
+        all_sprites.clear(screen, canvas.erase)
         maze.draw()
+        if maze.debug:
+            maze.draw_debug()
         if player.state == 'Moving':
              player.draw_path()
-             player.update()
         for enemy in enemies:
             if enemy.state == 'Moving':
                 enemy.draw_path()
-                enemy.update()
-        #players.update()
-        #enemies.update()
-        #all_sprites.update()
-
-        '''
-        Collision Detection: Finds collisions between members of each group
-        If either the 3rd/4th parameter is True, the collided members will be removed from their group
-        3rd param applies to the group in the 1st param
-        4th param applies to the group in the 2nd param
-        '''
-        for enemy in pygame.sprite.groupcollide(players, enemies, True, True):
-            '''
-            Reset/Initialize procedure
-            WORKAROUND: Pygame's groupcollide() seems to prevent me from re-using references of player and enemy, as a set to be used together
-            As a workaround, I have to declare new instances - In this case, a new enemies are created
-            Hypothesis: According to the documentation on groupcollide(), when a collision occurs, a dictionary entry will be added linking the collided sprites
-            This may be the reason why they instantly collide, when re-running the game
-            '''
-            enemies.empty()
-            all_sprites.empty()
-
-            start = get_random_coordinates(maze)
-            enemy = Enemy(start, player.current, INITIAL_ENEMY_SPEED, 'New Enemy One')
-            start = get_random_coordinates(maze)
-            enemy2 = Enemy(start, player.current, INITIAL_ENEMY_SPEED, 'New Enemy Two')
-
-            enemies.add(enemy)
-            enemies.add(enemy2)
-            all_sprites.add(enemy)
-            all_sprites.add(enemy2)
 
-            player.position(INITIAL_START)
-            players.add(player) # After player collision, players container is already emptied
-            all_sprites.add(player)
-
-            running = False
+        # Place the agents between their last two simulation steps, by how far the clock is into the next step
+        for sprite in all_sprites:
+            sprite.interpolate(lag / STEP)
 
         #players.draw(screen)
         #enemies.draw(screen)
-        all_sprites.draw(screen)
-        pygame.display.flip()
+        canvas.present(all_sprites) # Only the parts of the screen that changed are sent to the display
+
+    canvas.refresh() # The retry screen shows the maze without the agents, like a full redraw
 
     while retry:
+        clock.tick(MAX_FPS)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 on = False
@@ -544,7 +636,9 @@ while on:
                         barrier = mouse_position'''
 
             maze.draw()
-            pygame.display.flip()
+            canvas.present()
 
 print('Exiting...\n')
+if maze.service is not None:
+    maze.service.close()
 pygame.quit()
@@ -0,0 +1,29 @@
+'''
+Headless pathfinding engine for the Maze Pathfinding game
+Importing this package never touches pygame, so it can be used from batch workers, servers and tests
+
+pathfinding.vectorized, the NumPy engine, is not imported here since numpy is optional: import it on its own when needed
+'''
+
+from .grid import (
+    DIRECTIONS, EAST, WEST, SOUTH, NORTH, SOUTHEAST, SOUTHWEST, NORTHEAST, NORTHWEST,
+    GRAPH_WIDTH, GRAPH_HEIGHT, WALLS, Grid, as_cell, default_grid,
+)
+from .batch import BatchResult, batch_search, run_queries
+from .cache import PathCache
+from .components import ComponentIndex
+from .cooperative import CooperativePlanner, ReservationTable
+from .flowfield import UNREACHABLE, DistanceField, SharedDistanceField
+from .heuristics import HEURISTICS, Chebyshev, Euclidean, Heuristic, Manhattan, Octile, make_heuristic
+from .hierarchical import HierarchicalPlanner
+from .incremental import DStarLite
+from .instrument import Instrumentation
+from .jps import JumpTable, jump_point_search
+from .landmarks import Landmarks
+from .mapio import MapFile, load_map, parse_walls, read_benchmark_map, save_map, write_benchmark_map
+from .nexthop import ALL_PAIRS_LIMIT, NextHopTable
+from .openset import OpenSet
+from .path import LazyPath, Path, path_of, smooth
+from .scheduler import PlanScheduler, ResumableSearch
+from .search import STRAIGHT_COST, DIAGONAL_COST, SearchResult, SearchSpace, a_star_search, search_space, step_cost
+from .service import PlannerService
@@ -0,0 +1,71 @@
+'''
+Batch queries: many (start, goal) searches on the same grid, spread over a pool of worker processes
+
+The grid is copied once into shared memory and every worker wraps that memory in its own Grid, so the walls are never pickled per task
+Queries are sent to the workers in chunks and the results stream back in the same order as the queries, while later chunks are still running
+'''
+
+import os
+from collections import namedtuple
+from itertools import islice
+
+from .grid import as_cell
+from .search import a_star_search
+from .workers import share_cells, start_worker, worker
+
+# What the batch hands back for each query. cost is None when there is no path, nodes is only filled in when paths=True
+BatchResult = namedtuple('BatchResult', ['start', 'goal', 'cost', 'nodes'])
+
+def _run_chunk(chunk):
+    return run_queries(worker['grid'], chunk, **worker['options'])
+
+# Runs queries one after the other in the current process
+def run_queries(graph, queries, paths=False, **options):
+    results = []
+    for start, goal in queries:
+        result = a_star_search(graph, start, goal, **options)
+        results.append(BatchResult(result.start, result.goal, result.cost, result.nodes if paths else None))
+    return results
+
+def _chunks(queries, size):
+    queries = iter(queries)
+    while True:
+        chunk = [(as_cell(start), as_cell(goal)) for start, goal in islice(queries, size)]
+        if not chunk:
+            return
+        yield chunk
+
+'''
+Runs every (start, goal) query in queries on the grid and yields a BatchResult per query, in the same order
+
+Params:
+processes: how many worker processes to use, os.cpu_count() by default. With 1, everything runs in this process
+chunksize: how many queries are sent to a worker at a time. Bigger chunks cost less overhead, smaller ones balance better
+paths: also send back the nodes of every path, not only the costs
+options: passed on to a_star_search, such as heuristic or weight. They have to be picklable
+
+The workers search a snapshot of the grid taken when the batch starts, so later wall changes are not seen by it
+'''
+def batch_search(graph, queries, processes=None, chunksize=256, paths=False, **options):
+    if chunksize < 1:
+        raise ValueError('chunksize must be at least 1')
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    options = dict(options, paths=paths)
+
+    if processes <= 1:
+        for chunk in _chunks(queries, chunksize):
+            yield from run_queries(graph, chunk, **options)
+        return
+
+    import multiprocessing # Imported here for the same reason as in workers.share_cells()
+
+    memory = share_cells(graph)
+    try:
+        with multiprocessing.Pool(processes, start_worker, (memory.name, graph.width, graph.height, options, graph.version)) as pool:
+            for results in pool.imap(_run_chunk, _chunks(queries, chunksize)):
+                yield from results
+    finally:
+        memory.close()
+        memory.unlink()
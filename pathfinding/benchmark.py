@@ -0,0 +1,473 @@
+'''
+Benchmarks for the search engines, run without pygame or a display:
+    python -m pathfinding.benchmark [--quick] [--json results.json] [--compare baseline.json]
+
+Every scenario is a grid with a fixed set of random queries (always the same for the same --seed), and every engine answers all of them
+For each scenario and engine it reports:
+- queries/s, and the seconds spent on setup (building jump tables or clusters) apart from the queries
+- expanded nodes per query
+- peak memory of the setup and the queries, measured with tracemalloc in a second run so it doesn't slow the timed one
+- optimality error: how much more the paths cost than the shortest ones, as a fraction (0 for a search that always finds the shortest)
+
+--json saves the results, and --compare checks them against saved results and flags regressions: slower queries, more expanded nodes,
+more memory (each past --threshold) or paths that got further from the shortest. The exit code is 1 when there is a regression
+
+--crowd 10,100,500 also measures cooperative planning (cooperative.CooperativePlanner) on every scenario: agents planned per second
+for each crowd size
+
+--chase also measures replanning while both ends move, like an enemy chasing the player: incremental.DStarLite against a new
+a_star_search for every plan, in milliseconds and expanded nodes per plan
+'''
+
+import argparse
+import fnmatch
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from .components import ComponentIndex
+from .cooperative import CooperativePlanner
+from .grid import DIRECTIONS, Grid, default_grid
+from .hierarchical import HierarchicalPlanner
+from .incremental import DStarLite
+from .jps import JumpTable, jump_point_search
+from .landmarks import Landmarks
+from .mapio import load_map, read_benchmark_map
+from .nexthop import ALL_PAIRS_LIMIT, NextHopTable
+from .search import a_star_search
+
+# Scenario maps, all built from a seeded random generator so every run gets the same grids
+
+def random_grid(width, height, density, rng):
+    grid = Grid(width, height)
+    grid.cells[:] = bytes(rng.random() < density for index in range(width * height))
+    return grid
+
+# A maze of 1 node wide corridors carved with a depth-first search. Diagonal moves past wall corners can still cut through some of its walls
+def maze_grid(width, height, rng):
+    grid = Grid(width, height)
+    grid.cells[:] = b'\1' * (width * height)
+    start = (1, 1)
+    grid.cells[grid.index(start)] = 0
+    stack = [start]
+    while stack:
+        x, y = stack[-1]
+        options = [(dx, dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                   if 0 < x + dx < width - 1 and 0 < y + dy < height - 1 and grid.cells[(y + dy) * width + x + dx]]
+        if not options:
+            stack.pop()
+            continue
+        dx, dy = rng.choice(options)
+        grid.cells[(y + dy // 2) * width + x + dx // 2] = 0 # The wall between the two nodes
+        grid.cells[(y + dy) * width + x + dx] = 0
+        stack.append((x + dx, y + dy))
+    return grid
+
+# Square rooms separated by 1 node thick walls, with a door in every wall at a random place
+def rooms_grid(width, height, rng, room=8):
+    grid = Grid(width, height)
+    for y in range(0, height, room):
+        for x in range(width):
+            grid.cells[y * width + x] = 1
+    for x in range(0, width, room):
+        for y in range(height):
+            grid.cells[y * width + x] = 1
+
+    for y in range(0, height, room):
+        for x in range(0, width, room):
+            if x + 1 < width and y > 0: # A door in the wall above the room
+                grid.cells[y * width + min(x + rng.randrange(1, room), width - 1)] = 0
+            if y + 1 < height and x > 0: # A door in the wall left of the room
+                grid.cells[min(y + rng.randrange(1, room), height - 1) * width + x] = 0
+    return grid
+
+'''
+The scenarios as (name, function that builds the grid) pairs
+quick: only the small ones, for a check that takes seconds
+'''
+def scenarios(seed=0, quick=False):
+    found = [('walls', default_grid)]
+    sizes = [64] if quick else [64, 256]
+    for size in sizes:
+        for density in (0.1, 0.2, 0.3):
+            found.append(('random-' + str(size) + '-' + str(int(density * 100)),
+                          lambda size=size, density=density: random_grid(size, size, density, random.Random(seed))))
+    for size in sizes:
+        found.append(('maze-' + str(size - 1), lambda size=size: maze_grid(size - 1, size - 1, random.Random(seed))))
+        found.append(('rooms-' + str(size), lambda size=size: rooms_grid(size, size, random.Random(seed))))
+    return found
+
+# Random (start, goal) pairs of open nodes that have a path between them, so every query exercises a full search
+def pick_queries(graph, count, rng):
+    components = ComponentIndex(graph)
+    components.detach()
+    open_nodes = [graph.coordinates(index) for index in range(len(graph.cells)) if not graph.cells[index]]
+    queries = []
+    for attempt in range(count * 100):
+        if len(queries) == count or not open_nodes:
+            break
+        start = rng.choice(open_nodes)
+        goal = rng.choice(open_nodes)
+        if components.connected(start, goal):
+            queries.append((start, goal))
+    return queries
+
+'''
+The engines, each a function that sets up whatever it needs on a grid and returns (search, cleanup):
+search(start, goal) answers a query with a SearchResult and cleanup() undoes the setup (unhooks grid listeners)
+An engine that doesn't handle a grid (e.g. one too big for it) returns None, and is left out of that scenario
+'''
+
+def _nothing():
+    pass
+
+def _a_star(graph):
+    return (lambda start, goal: a_star_search(graph, start, goal)), _nothing
+
+def _weighted_a_star(graph):
+    return (lambda start, goal: a_star_search(graph, start, goal, weight=2)), _nothing
+
+def _jps(graph):
+    return (lambda start, goal: jump_point_search(graph, start, goal)), _nothing
+
+def _jps_plus(graph):
+    table = JumpTable(graph)
+    return (lambda start, goal: jump_point_search(graph, start, goal, table=table)), table.detach
+
+def _hpa(graph):
+    planner = HierarchicalPlanner(graph)
+    return planner.find_path, planner.detach
+
+def _a_star_landmarks(graph):
+    landmarks = Landmarks(graph)
+    return (lambda start, goal: a_star_search(graph, start, goal, heuristic=landmarks)), landmarks.detach
+
+def _next_hop(graph):
+    if graph.width * graph.height > ALL_PAIRS_LIMIT:
+        return None
+    table = NextHopTable(graph)
+    table.build()
+    return table.find_path, _nothing
+
+ENGINES = {
+    'astar': _a_star,
+    'astar-weighted': _weighted_a_star,
+    'jps': _jps,
+    'jps+': _jps_plus,
+    'hpa': _hpa,
+    'astar-alt': _a_star_landmarks,
+    'next-hop': _next_hop,
+}
+
+# Runs every query of a scenario with one engine and measures it. optimal holds the shortest path cost of every query
+# Returns None if the engine doesn't handle the grid
+def measure(graph, queries, optimal, engine, memory=True):
+    started = time.perf_counter()
+    prepared = engine(graph)
+    if prepared is None:
+        return None
+    search, cleanup = prepared
+    setup = time.perf_counter() - started
+
+    expanded = 0
+    errors = []
+    started = time.perf_counter()
+    for (start, goal), best in zip(queries, optimal):
+        result = search(start, goal)
+        expanded += result.expanded
+        if not result.found:
+            errors.append(float('inf')) # Missing a path that exists is as wrong as it gets
+        elif best:
+            errors.append(result.cost / best - 1)
+        else:
+            errors.append(0.0)
+    elapsed = time.perf_counter() - started
+    cleanup()
+
+    peak = None
+    if memory:
+        # A second, traced run. tracemalloc slows everything down, so it is kept out of the timing above
+        # The grid's shared SearchSpace was allocated by the reference searches already, so only what the engine adds is counted
+        tracemalloc.start()
+        search, cleanup = engine(graph)
+        for start, goal in queries:
+            search(start, goal)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        cleanup()
+
+    count = len(queries)
+    return {
+        'queries': count,
+        'setup_seconds': setup,
+        'seconds': elapsed,
+        'queries_per_second': count / elapsed if elapsed else None,
+        'expanded_per_query': expanded / count if count else 0,
+        'peak_memory_bytes': peak,
+        'mean_optimality_error': sum(errors) / count if count else 0,
+        'max_optimality_error': max(errors, default=0),
+    }
+
+'''
+Crowd throughput: plans crowds of growing size with a CooperativePlanner and returns a result per crowd size
+Every agent starts on its own random open node and heads for one of a few shared goals, like a crowd chasing a handful of targets
+Each crowd is planned rounds times, as a game would plan it again every few steps: the first round builds the goals' distance fields
+and the later ones reuse them
+'''
+def crowd(graph, counts, goals=4, rounds=3, window=16, seed=0):
+    rng = random.Random(seed)
+    open_nodes = [graph.coordinates(index) for index in range(len(graph.cells)) if not graph.cells[index]]
+    targets = rng.sample(open_nodes, min(goals, len(open_nodes)))
+    results = []
+    for count in counts:
+        starts = rng.sample(open_nodes, min(count, len(open_nodes)))
+        agents = [(number, start, targets[number % len(targets)]) for number, start in enumerate(starts)]
+        planner = CooperativePlanner(graph, window)
+
+        expanded = 0
+        started = time.perf_counter()
+        for repeat in range(rounds):
+            plans = planner.plan(agents)
+            expanded += planner.expanded
+        elapsed = time.perf_counter() - started
+        stuck = sum(1 for result in plans.values() if not result.found)
+
+        planned = len(agents) * rounds
+        results.append({
+            'agents': len(agents),
+            'rounds': rounds,
+            'window': window,
+            'seconds': elapsed,
+            'agents_per_second': planned / elapsed if elapsed else None,
+            'expanded_per_agent': expanded / planned if planned else 0,
+            'fields_built': planner.fields_built,
+            'unreachable': stuck,
+        })
+    return results
+
+'''
+Replanning while both ends move: a hunter follows its path one node per plan towards a target that takes a random step per plan,
+the way the game's enemies chase the player. Every plan is made by a DStarLite kept for the whole chase, and by a new
+a_star_search for comparison. Returns a result per planner, with mismatches counting the plans whose costs differ
+'''
+def chase(graph, chases=10, moves=20, seed=0):
+    rng = random.Random(seed)
+    queries = pick_queries(graph, chases, rng)
+    timings = {'dstar-lite': [0.0, 0, 0], 'astar': [0.0, 0, 0]} # seconds, plans, expanded
+    mismatches = 0
+    restarts = 0
+    for start, goal in queries:
+        planner = DStarLite(graph, start, goal)
+        for move in range(moves):
+            started = time.perf_counter()
+            planner.move_start(start)
+            planner.move_goal(goal)
+            incremental = planner.plan()
+            middle = time.perf_counter()
+            fresh = a_star_search(graph, start, goal)
+            finished = time.perf_counter()
+
+            for name, seconds, result in (('dstar-lite', middle - started, incremental), ('astar', finished - middle, fresh)):
+                timing = timings[name]
+                timing[0] += seconds
+                timing[1] += 1
+                timing[2] += result.expanded
+            if incremental.cost != fresh.cost:
+                mismatches += 1
+            if not incremental.found or len(incremental.nodes.indices) <= 2:
+                break # Caught, or next to the target
+
+            start = graph.coordinates(incremental.nodes.indices[1]) # Along the planner's own path, like an enemy follows its plan
+            x, y = goal
+            steps = [(x + dx, y + dy) for dx, dy in DIRECTIONS
+                     if 0 <= x + dx < graph.width and 0 <= y + dy < graph.height and not graph.cells[graph.index((x + dx, y + dy))]]
+            if steps:
+                goal = rng.choice(steps)
+        restarts += planner.restarts
+        planner.detach()
+
+    results = []
+    for name, (seconds, plans, expanded) in timings.items():
+        results.append({
+            'planner': name,
+            'plans': plans,
+            'seconds': seconds,
+            'ms_per_plan': seconds * 1000 / plans if plans else None,
+            'expanded_per_plan': expanded / plans if plans else 0,
+            'mismatches': mismatches if name == 'dstar-lite' else 0,
+            'restarts': restarts if name == 'dstar-lite' else 0,
+        })
+    return results
+
+'''
+Runs the benchmark and returns the report as a dictionary (what --json saves)
+
+Params:
+scenario_list: (name, function that builds the grid) pairs, see scenarios()
+engines: engine names from ENGINES
+queries: how many queries per scenario
+crowd_sizes: crowd sizes to measure with crowd() on every scenario, None to skip it
+chasing: measure replanning with chase() on every scenario
+log: called with a line of text as every result comes in, None to stay quiet
+'''
+def run(scenario_list, engines, queries=100, seed=0, memory=True, crowd_sizes=None, chasing=False, log=None):
+    results = []
+    crowd_results = []
+    chase_results = []
+    for name, build in scenario_list:
+        graph = build()
+        query_list = pick_queries(graph, queries, random.Random(seed))
+        optimal = [a_star_search(graph, start, goal).cost for start, goal in query_list]
+
+        for engine in engines:
+            result = measure(graph, query_list, optimal, ENGINES[engine], memory)
+            if result is None:
+                continue
+            result.update(scenario=name, engine=engine, width=graph.width, height=graph.height)
+            results.append(result)
+            if log is not None:
+                log(format_result(result))
+
+        if crowd_sizes:
+            for result in crowd(graph, crowd_sizes, seed=seed):
+                result.update(scenario=name, width=graph.width, height=graph.height)
+                crowd_results.append(result)
+                if log is not None:
+                    log(format_crowd_result(result))
+
+        if chasing:
+            for result in chase(graph, seed=seed):
+                result.update(scenario=name, width=graph.width, height=graph.height)
+                chase_results.append(result)
+                if log is not None:
+                    log(format_chase_result(result))
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'seed': seed,
+        'results': results,
+        'crowd': crowd_results,
+        'chase': chase_results,
+    }
+
+def format_result(result):
+    line = '{scenario:<16} {engine:<15} {queries_per_second:>10.1f} q/s {expanded_per_query:>10.1f} expanded/query'.format(**result)
+    line += ' {:>8.3f} s setup'.format(result['setup_seconds'])
+    if result['peak_memory_bytes'] is not None:
+        line += ' {:>10.1f} KiB peak'.format(result['peak_memory_bytes'] / 1024)
+    return line + ' {:>7.2%} max error'.format(result['max_optimality_error'])
+
+def format_crowd_result(result):
+    return '{scenario:<16} crowd of {agents:<6} {agents_per_second:>10.1f} agents/s {expanded_per_agent:>8.1f} expanded/agent {fields_built:>4} fields'.format(**result)
+
+def format_chase_result(result):
+    return '{scenario:<16} chase {planner:<12} {ms_per_plan:>8.3f} ms/plan {expanded_per_plan:>8.1f} expanded/plan {mismatches:>4} mismatches'.format(**result)
+
+'''
+Compares a report with a baseline report and returns a list of regressions, as text
+threshold: how much slower, bigger or more expanding (as a fraction) a result may get before it counts as a regression
+Timings are only comparable between runs on the same machine
+'''
+def compare(report, baseline, threshold=0.1):
+    old_results = {(result['scenario'], result['engine']): result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        key = (result['scenario'], result['engine'])
+        old = old_results.get(key)
+        if old is None:
+            continue
+        label = key[0] + ' ' + key[1] + ': '
+
+        if old['queries_per_second'] and result['queries_per_second'] is not None:
+            if result['queries_per_second'] < old['queries_per_second'] * (1 - threshold):
+                regressions.append(label + 'queries/s dropped from {:.1f} to {:.1f}'.format(old['queries_per_second'], result['queries_per_second']))
+        if result['expanded_per_query'] > old['expanded_per_query'] * (1 + threshold):
+            regressions.append(label + 'expanded nodes per query rose from {:.1f} to {:.1f}'.format(old['expanded_per_query'], result['expanded_per_query']))
+        if old['peak_memory_bytes'] and result['peak_memory_bytes'] is not None:
+            if result['peak_memory_bytes'] > old['peak_memory_bytes'] * (1 + threshold):
+                regressions.append(label + 'peak memory rose from {} to {} bytes'.format(old['peak_memory_bytes'], result['peak_memory_bytes']))
+        if result['max_optimality_error'] > old['max_optimality_error'] + 1e-9:
+            regressions.append(label + 'max optimality error rose from {:.2%} to {:.2%}'.format(old['max_optimality_error'], result['max_optimality_error']))
+
+    old_crowds = {(result['scenario'], result['agents']): result for result in baseline.get('crowd', [])}
+    for result in report.get('crowd', []):
+        old = old_crowds.get((result['scenario'], result['agents']))
+        if old is None or not old['agents_per_second'] or result['agents_per_second'] is None:
+            continue
+        if result['agents_per_second'] < old['agents_per_second'] * (1 - threshold):
+            regressions.append(result['scenario'] + ' crowd of ' + str(result['agents']) + ': agents/s dropped from {:.1f} to {:.1f}'.format(
+                old['agents_per_second'], result['agents_per_second']))
+
+    old_chases = {(result['scenario'], result['planner']): result for result in baseline.get('chase', [])}
+    for result in report.get('chase', []):
+        label = result['scenario'] + ' chase ' + result['planner'] + ': '
+        if result['mismatches']:
+            regressions.append(label + str(result['mismatches']) + ' plans cost something else than a new search')
+        old = old_chases.get((result['scenario'], result['planner']))
+        if old is None or not old['ms_per_plan'] or result['ms_per_plan'] is None:
+            continue
+        if result['ms_per_plan'] > old['ms_per_plan'] * (1 + threshold):
+            regressions.append(label + 'ms/plan rose from {:.3f} to {:.3f}'.format(old['ms_per_plan'], result['ms_per_plan']))
+    return regressions
+
+# A scenario for a map file: the binary format of mapio.save_map(), or the .map text format
+def map_scenario(path):
+    if path.endswith('.map'):
+        return path, lambda: read_benchmark_map(path)
+    return path, lambda: load_map(path).grid
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m pathfinding.benchmark', description='Benchmarks the pathfinding engines.')
+    parser.add_argument('--quick', action='store_true', help='only the small scenarios')
+    parser.add_argument('--scenarios', default='*', help='only the scenarios matching this pattern, e.g. "random-*"')
+    parser.add_argument('--map', action='append', default=[], help='add a map file as a scenario (.map text or save_map() binary)')
+    parser.add_argument('--engines', default=','.join(ENGINES), help='comma separated engines out of: ' + ', '.join(ENGINES))
+    parser.add_argument('--queries', type=int, default=100, help='queries per scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run that measures peak memory')
+    parser.add_argument('--json', help='save the results to this file')
+    parser.add_argument('--compare', help='check the results against a file saved with --json')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown or growth before a regression is flagged')
+    parser.add_argument('--chase', action='store_true', help='also benchmark incremental replanning (D* Lite) against new searches')
+    parser.add_argument('--crowd', help='comma separated crowd sizes for the cooperative planning benchmark, e.g. 10,100,500')
+    options = parser.parse_args(arguments)
+
+    engines = [engine.strip() for engine in options.engines.split(',') if engine.strip()]
+    for engine in engines:
+        if engine not in ENGINES:
+            parser.error('unknown engine ' + repr(engine))
+
+    scenario_list = [scenario for scenario in scenarios(options.seed, options.quick) if fnmatch.fnmatch(scenario[0], options.scenarios)]
+    scenario_list += [map_scenario(path) for path in options.map]
+
+    crowd_sizes = None
+    if options.crowd:
+        try:
+            crowd_sizes = [int(size) for size in options.crowd.split(',') if size.strip()]
+        except ValueError:
+            parser.error('--crowd takes comma separated numbers, not ' + repr(options.crowd))
+
+    report = run(scenario_list, engines, options.queries, options.seed, not options.no_memory, crowd_sizes, options.chase, log=print)
+
+    if options.json:
+        with open(options.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, options.threshold)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            return 1
+        print('No regressions against ' + options.compare)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
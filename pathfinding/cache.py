@@ -0,0 +1,111 @@
+'''
+A cache of search results for one grid, with least-recently-used eviction
+
+The cache listens to the grid, so a wall change only throws away the results it can affect:
+- A new wall breaks the paths that go through it. Every other path is still there and still the shortest, since walls only ever make paths longer
+- A removed wall can only help a path that goes through the freed node. A path is kept if even the octile estimate start -> node -> goal
+  is not cheaper than it. Results without a path are dropped, since the freed node might connect them
+'''
+
+from collections import OrderedDict
+
+from .grid import as_cell
+from .heuristics import Octile
+from .search import a_star_search
+
+class PathCache:
+    '''
+    Params:
+    graph: the Grid the paths are searched on
+    capacity: how many results are kept before the least recently used one is evicted
+    search: the search function to call on a miss, called as search(graph, start, goal, **options)
+    options: extra keyword arguments for the search, such as heuristic or weight
+    '''
+    def __init__(self, graph, capacity=1024, search=a_star_search, **options):
+        if capacity < 1:
+            raise ValueError('The capacity of a PathCache must be at least 1')
+
+        self.graph = graph
+        self.capacity = capacity
+        self.search = search
+        self.options = options
+
+        self.entries = OrderedDict() # (start, goal) -> SearchResult, the least recently used first
+        self.through = {} # node -> set of (start, goal) keys whose path goes through that node
+        self.version = graph.version # The grid version the entries are valid for
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+        graph.add_listener(self.wall_changed)
+
+    # Stops listening to the grid, for a cache that is no longer needed
+    def detach(self):
+        self.graph.remove_listener(self.wall_changed)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        start, goal = key
+        return self.graph.version == self.version and (as_cell(start), as_cell(goal)) in self.entries
+
+    def find_path(self, start, goal):
+        # The grid was changed without the cache hearing about it (e.g. cells was written to directly), so nothing in it can be trusted
+        if self.graph.version != self.version:
+            self.clear()
+
+        key = (as_cell(start), as_cell(goal))
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = self.search(self.graph, key[0], key[1], **self.options)
+        self.store(key, result)
+        return result
+
+    def store(self, key, result):
+        self.entries[key] = result
+        for node in result.nodes or ():
+            self.through.setdefault(node, set()).add(key)
+
+        while len(self.entries) > self.capacity:
+            self.discard(next(iter(self.entries)))
+
+    def discard(self, key):
+        result = self.entries.pop(key)
+        for node in result.nodes or ():
+            keys = self.through.get(node)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.through[node]
+
+    def clear(self):
+        self.entries.clear()
+        self.through.clear()
+        self.version = self.graph.version
+
+    # Grid listener: drops the results the changed node can affect, the rest are carried over to the new version
+    def wall_changed(self, node, blocked):
+        if self.version != self.graph.version - 1:
+            self.clear() # Some other change was missed, so start over
+            return
+
+        if blocked:
+            stale = list(self.through.get(node, ()))
+        else:
+            estimate = Octile()
+            stale = []
+            for key, result in self.entries.items():
+                if not result.found or estimate(key[0], node) + estimate(node, key[1]) < result.cost:
+                    stale.append(key)
+
+        for key in stale:
+            self.discard(key)
+        self.invalidated += len(stale)
+        self.version = self.graph.version
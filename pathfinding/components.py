@@ -0,0 +1,212 @@
+'''
+Connected components of the open ground, so a query whose goal is walled off is answered before any search runs
+
+Every open node carries a label, and labels that turned out to be connected are joined with union-find, so two nodes are
+connected when their labels have the same root. The index listens to the grid:
+- A removed wall can only join components: the freed node gets a new label that is joined with its open neighbours
+- A new wall can split a component. Its open neighbours are grouped by whether they touch each other around it; if they all do,
+  nothing splits. Otherwise a breadth-first search starts from each group, one node per search in turn, and searches that meet
+  are merged. A search that runs out of nodes first has found a piece that got cut off, and only that piece is relabelled,
+  so the work is about the size of the smaller pieces, not of the whole map
+'''
+
+from array import array
+from collections import deque
+
+from .search import search_space
+
+class ComponentIndex:
+    '''
+    Params:
+    graph: the Grid to index. The index listens to it, so it stays up to date when walls change
+    labels: labels saved with the map by mapio.save_map(), used as they are instead of labelling the grid again
+    '''
+    def __init__(self, graph, labels=None):
+        space = search_space(graph)
+        self.graph = graph
+        self.kinds = space.kinds
+        self.table = space.neighbours
+        self.labels = None # labels[node] is the label of an open node, -1 for walls
+        self.roots = None # Union-find parents of the labels, a label is a root if roots[label] == label
+        self.version = None
+        if labels is None:
+            self.build()
+        else:
+            if len(labels) != graph.width * graph.height:
+                raise ValueError('Expected ' + str(graph.width * graph.height) + ' labels, got ' + str(len(labels)))
+            self.labels = labels
+            self.roots = list(range(max(labels, default=-1) + 1))
+            self.version = graph.version
+        graph.add_listener(self.wall_changed)
+
+    # Stops listening to the grid, for an index that is no longer needed
+    def detach(self):
+        self.graph.remove_listener(self.wall_changed)
+
+    # Labels every component from scratch with a flood fill
+    def build(self):
+        graph = self.graph
+        cells = graph.cells
+        labels = self.labels = array('l', [-1]) * (graph.width * graph.height)
+        self.roots = []
+
+        for node in range(len(labels)):
+            if cells[node] or labels[node] != -1:
+                continue
+            label = len(self.roots)
+            self.roots.append(label)
+            labels[node] = label
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                for offset, step in self.table[self.kinds[current]]:
+                    child = current + offset
+                    if not cells[child] and labels[child] == -1:
+                        labels[child] = label
+                        stack.append(child)
+
+        self.version = graph.version
+
+    # The open neighbours of a node, as indices
+    def neighbours(self, node):
+        cells = self.graph.cells
+        return [node + offset for offset, step in self.table[self.kinds[node]] if not cells[node + offset]]
+
+    def find(self, label):
+        roots = self.roots
+        root = label
+        while roots[root] != root:
+            root = roots[root]
+        while roots[label] != root: # Point every label on the way straight at the root, so the next find is quicker
+            roots[label], label = root, roots[label]
+        return root
+
+    def union(self, label, other):
+        label = self.find(label)
+        other = self.find(other)
+        if label != other:
+            self.roots[other] = label
+
+    # The component of a node, or -1 for a wall. Two nodes with the same component are connected
+    def component(self, node):
+        if self.version != self.graph.version:
+            self.build() # The grid was changed without the index hearing about it (e.g. cells was written to directly)
+        label = self.labels[self.graph.index(node)]
+        if label == -1:
+            return -1
+        return self.find(label)
+
+    # The label of every node with the joined labels replaced by their root, so the labels can be saved and used without the roots
+    def canonical_labels(self):
+        if self.version != self.graph.version:
+            self.build()
+        find = self.find
+        return array('l', [label if label == -1 else find(label) for label in self.labels])
+
+    # Whether a path can join two open nodes. Walls are never connected to anything
+    def connected(self, node, other):
+        component = self.component(node)
+        return component != -1 and component == self.component(other)
+
+    '''
+    Whether two nodes are known to have no path between them: both are open and in different components
+    a_star_search lets a search start on a wall, so a wall endpoint is never called separated and is left to the search
+    '''
+    def separated(self, node, other):
+        component = self.component(node)
+        other_component = self.component(other)
+        return component != -1 and other_component != -1 and component != other_component
+
+    # Grid listener: joins components around a freed node, or splits the component around a new wall
+    def wall_changed(self, node, blocked):
+        graph = self.graph
+        if self.version != graph.version - 1:
+            self.build() # Some other change was missed, so start over
+            return
+        self.version = graph.version
+
+        index = graph.index(node)
+        if blocked:
+            self.labels[index] = -1
+            self.split(index)
+        else:
+            label = len(self.roots)
+            self.roots.append(label)
+            self.labels[index] = label
+            for child in self.neighbours(index):
+                self.union(label, self.labels[child])
+
+    # The open neighbours of a node, grouped by whether they are connected to each other without going through the node
+    def groups(self, node):
+        width = self.graph.width
+        around = self.neighbours(node)
+        groups = []
+        for child in around:
+            y, x = divmod(child, width)
+            touching = []
+            for group in groups:
+                if any(max(abs(x - other % width), abs(y - other // width)) <= 1 for other in group):
+                    touching.append(group)
+            merged = [child]
+            for group in touching:
+                groups.remove(group)
+                merged.extend(group)
+            groups.append(merged)
+        return groups
+
+    # A new wall at node may have cut its component in pieces. Finds the pieces that got cut off and gives them new labels
+    def split(self, node):
+        groups = self.groups(node)
+        if len(groups) < 2:
+            return # The neighbours still touch each other, so everything they connected is still connected
+
+        labels = self.labels
+        owner = {} # node -> the search that reached it first
+        merged_into = list(range(len(groups))) # Searches that met are merged, like the labels
+        queues = []
+        for search, group in enumerate(groups):
+            for child in group:
+                owner[child] = search
+            queues.append(deque(group))
+
+        def find(search):
+            while merged_into[search] != search:
+                search = merged_into[search]
+            return search
+
+        active = list(range(len(groups)))
+        while len(active) > 1:
+            for search in list(active):
+                if search not in active:
+                    continue # Merged into another search earlier in this round
+                queue = queues[search]
+                if not queue:
+                    # Ran out of nodes without meeting another search: this piece is cut off from the rest
+                    active.remove(search)
+                    label = len(self.roots)
+                    self.roots.append(label)
+                    for reached, reached_by in owner.items():
+                        if find(reached_by) == search:
+                            labels[reached] = label
+                    if len(active) == 1:
+                        break
+                    continue
+
+                current = queue.popleft()
+                for child in self.neighbours(current):
+                    other = owner.get(child)
+                    if other is None:
+                        owner[child] = search
+                        queue.append(child)
+                        continue
+                    other = find(other)
+                    if other != search:
+                        # The two searches met, so they are in the same piece: one carries on with both queues
+                        merged_into[other] = search
+                        queue.extend(queues[other])
+                        queues[other].clear()
+                        active.remove(other)
+                        if len(active) == 1:
+                            break
+                if len(active) == 1:
+                    break
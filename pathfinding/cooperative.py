@@ -0,0 +1,254 @@
+'''
+Cooperative pathfinding for crowds: Windowed Hierarchical Cooperative A* (WHCA*, Silver 2005)
+
+Agents plan one after the other in space and time. Each plan is written into a reservation table, (node, time) -> agent,
+and the agents planned after it treat those reservations as walls that are only there at that time, so they step aside or wait
+instead of walking into each other. Swapping places (two agents crossing the same edge in opposite directions) is reserved too
+
+Every agent only plans window steps ahead, which keeps each search small, and the rest of the way is estimated with the
+true distance to its goal: the "hierarchical" part. That distance comes from a DistanceField per goal, shared by every agent
+that goes there, so a hundred agents chasing one target cost one Dijkstra search plus a hundred small windowed ones
+
+Time is counted in steps: every move, straight or diagonal, or waiting in place, takes one step. Plans are made again
+as the agents move, so the reservations only ever have to cover the next window steps
+'''
+
+import heapq
+from array import array
+from collections import OrderedDict, deque
+
+from .flowfield import UNREACHABLE, DistanceField
+from .grid import as_cell
+from .path import Path
+from .search import STRAIGHT_COST, SearchResult, search_space
+
+WAIT_COST = STRAIGHT_COST # Waiting costs as much as a straight step, except at the goal where it is free
+
+class ReservationTable:
+    def __init__(self):
+        self.cells = {} # (node, time) -> key of the agent that is on the node at that time
+        self.moves = {} # (node, next node, time) -> key of the agent that moves between them from time to time + 1
+        self.held = {} # key -> the agent's reservations, so they can be released
+
+    def __len__(self):
+        return len(self.cells)
+
+    def clear(self):
+        self.cells.clear()
+        self.moves.clear()
+        self.held.clear()
+
+    '''
+    Reserves a plan: indices[time] is the grid index of the node the agent is on at that time
+    until: the agent stays on its last node up to this time, so nobody plans to walk into it once it has stopped
+    A reservation another agent holds already is left to it, so two agents never hold the same one
+    '''
+    def reserve(self, key, indices, until=0):
+        cells, moves = self.held.setdefault(key, ([], []))
+        for time, node in enumerate(indices):
+            if self.cells.setdefault((node, time), key) == key:
+                cells.append((node, time))
+            if time + 1 < len(indices):
+                move = (node, indices[time + 1], time)
+                if self.moves.setdefault(move, key) == key:
+                    moves.append(move)
+        for time in range(len(indices), until + 1):
+            if self.cells.setdefault((indices[-1], time), key) == key:
+                cells.append((indices[-1], time))
+
+    def release(self, key):
+        cells, moves = self.held.pop(key, ((), ()))
+        for cell in cells:
+            if self.cells.get(cell) == key:
+                del self.cells[cell]
+        for move in moves:
+            if self.moves.get(move) == key:
+                del self.moves[move]
+
+    # Whether the node is free at a time, for the agent with the given key
+    def free(self, node, time, key=None):
+        holder = self.cells.get((node, time))
+        return holder is None or holder == key
+
+    # Whether the node is free from a time up to another, both included
+    def free_from(self, node, time, until, key=None):
+        return all(self.free(node, later, key) for later in range(time, until + 1))
+
+class CooperativePlanner:
+    '''
+    Params:
+    graph: the Grid the agents are on
+    window: how many steps ahead every agent plans
+    max_fields: how many goals keep their distance field between calls. The fields are thrown away when a wall changes
+    '''
+    def __init__(self, graph, window=16, max_fields=64):
+        if window < 1:
+            raise ValueError('The window of a CooperativePlanner must be at least 1 step')
+
+        space = search_space(graph)
+        self.graph = graph
+        self.window = window
+        self.max_fields = max_fields
+        self.kinds = space.kinds
+        self.neighbours = space.neighbours
+        self.reservations = ReservationTable()
+        self.fields = OrderedDict() # goal index -> DistanceField, the least recently used first
+        self.version = graph.version
+
+        self.expanded = 0 # Space-time nodes expanded by the last plan()
+        self.fields_built = 0
+        self.boxed = 0 # How many times the last plan() found an agent boxed in
+
+    # The shared heuristic: the distance field of a goal, computed once for every agent that goes there
+    def field(self, goal):
+        graph = self.graph
+        if self.version != graph.version:
+            self.fields.clear()
+            self.version = graph.version
+
+        field = self.fields.get(goal)
+        if field is None:
+            field = self.fields[goal] = DistanceField(graph, graph.coordinates(goal))
+            self.fields_built += 1
+            while len(self.fields) > self.max_fields:
+                self.fields.popitem(last=False)
+        else:
+            self.fields.move_to_end(goal)
+        return field
+
+    '''
+    Plans every agent from scratch and returns key -> SearchResult
+    agents: (key, start, goal) for every agent, in priority order: the first ones get the best paths and the others work around them
+
+    Each result's path covers the next window steps at most, one node per step, so a wait shows up as the same node twice
+    Its cost is the cost of those steps plus the distance that is left from the last one. found is False only when the goal
+    can't be reached at all
+
+    An agent the ones before it have boxed in, with nowhere to stand before the window is over, goes before the agents that
+    planned to go through its node: they give their plans up and plan again at the end, and it plans again at once, when it can
+    at least wait where it is. An agent boxed in a second time is pinned there for the whole window instead, and is never moved
+again, so plan() always ends
+    '''
+    def plan(self, agents):
+        agents = {key: (key, as_cell(start), as_cell(goal)) for key, start, goal in agents}
+        graph = self.graph
+        window = self.window
+        reservations = self.reservations
+        reservations.clear()
+        self.expanded = 0
+        self.boxed = 0
+
+        # Where the agents are now is theirs for the first step, so the ones planned first don't step onto an agent that hasn't
+        # planned yet. From the step after, they are planned around, and the agent moves out of their way when its turn comes
+        for key, start, goal in agents.values():
+            reservations.reserve(key, [graph.index(start)], 1)
+
+        queue = deque(agents.values())
+        boxed = set()
+        pinned = set()
+        results = {}
+        while queue:
+            key, start, goal = queue.popleft()
+            reservations.release(key)
+            result = self.search(key, start, goal)
+            if result is None:
+                self.boxed += 1
+                source = graph.index(start)
+                for time in range(window + 1):
+                    holder = reservations.cells.get((source, time))
+                    if holder is not None and holder != key and holder not in pinned:
+                        reservations.release(holder)
+                        if results.pop(holder, None) is not None:
+                            reservations.reserve(holder, [graph.index(agents[holder][1])], 1)
+                            queue.append(agents[holder])
+                if key not in boxed:
+                    boxed.add(key)
+                    result = self.search(key, start, goal)
+                if result is None:
+                    pinned.add(key)
+                    reservations.reserve(key, [source], window)
+                    result = self.stay(start, goal)
+            results[key] = result
+        return results
+
+    # The result of a pinned agent, which waits where it is
+    def stay(self, start, goal):
+        graph = self.graph
+        source = graph.index(start)
+        distance = self.field(graph.index(goal)).distance
+        if distance[source] == UNREACHABLE:
+            return SearchResult(start, goal, None, None)
+        return SearchResult(start, goal, Path(graph.width, array('l', [source])), distance[source])
+
+    # One agent's windowed space-time A*. Its plan is reserved for the agents that come after it. Returns None if the agent is boxed in
+    def search(self, key, start, goal):
+        graph = self.graph
+        size = graph.width * graph.height
+        window = self.window
+        cells = graph.cells
+        kinds = self.kinds
+        neighbours = self.neighbours
+        reserved = self.reservations.cells
+        moves = self.reservations.moves
+
+        source = graph.index(start)
+        target = graph.index(goal)
+        distance = self.field(target).distance
+        if distance[source] == UNREACHABLE:
+            if not self.reservations.free_from(source, 0, window, key):
+                return None # Stuck where the agents before it want to go
+            self.reservations.reserve(key, [source], window) # Stuck where it is, so the others go around it
+            return SearchResult(start, goal, None, None)
+
+        # A state is time * size + node, so both fit in one int
+        g = {source: 0}
+        parent = {source: -1}
+        heap = [(distance[source], distance[source], source)]
+        closed = set()
+        best = None
+        while heap:
+            f, h, state = heapq.heappop(heap)
+            if state in closed:
+                continue
+            closed.add(state)
+            time, node = divmod(state, size)
+
+            # Done when the window is used up, or at the goal if the agent can stay there until the end of the window
+            if time == window or node == target and self.reservations.free_from(target, time, window, key):
+                best = state
+                break
+
+            cost = g[state]
+            for offset, step in neighbours[kinds[node]] + ((0, WAIT_COST),):
+                child = node + offset
+                if cells[child]:
+                    continue
+                holder = reserved.get((child, time + 1))
+                if holder is not None and holder != key:
+                    continue # Someone is there at that time
+                holder = moves.get((child, node, time))
+                if holder is not None and holder != key:
+                    continue # Someone comes the other way along the same edge
+
+                child_state = state + size + offset
+                child_cost = cost + (0 if child == node == target else step)
+                if child_cost < g.get(child_state, child_cost + 1):
+                    g[child_state] = child_cost
+                    parent[child_state] = state
+                    child_h = distance[child]
+                    heapq.heappush(heap, (child_cost + child_h, child_h, child_state))
+
+        self.expanded += len(closed)
+        if best is None:
+            return None
+
+        indices = array('l')
+        state = best
+        while state != -1:
+            indices.append(state % size)
+            state = parent.get(state, -1)
+        indices.reverse()
+        self.reservations.reserve(key, indices, window)
+
+        last = indices[-1]
+        return SearchResult(start, goal, Path(graph.width, indices), g.get(best, 0) + distance[last], len(closed))
@@ -0,0 +1,147 @@
+'''
+Distance fields (also called flow fields) for many agents that go to the same goal
+
+Instead of one search per agent, a single Dijkstra search runs backwards from the goal over the whole grid
+It stores every node's distance to the goal and the neighbour to step to, so each agent reads its next step in O(1),
+however many agents there are
+'''
+
+from array import array
+
+from .grid import as_cell
+from .path import Path
+from .search import SearchResult, search_space
+
+UNREACHABLE = -1 # The distance of walls and of the nodes that can't reach the goal
+
+'''
+Dijkstra's search from one or more roots (grid indices): A* without a heuristic, run until every reachable node is settled
+Returns (distance, next_node, expanded): the cost from every node to the nearest root, the neighbour to step to on the way there
+(-1 for the roots and the nodes that can't reach one) and how many nodes were expanded
+'''
+def dijkstra(graph, roots):
+    cells = graph.cells
+    size = graph.width * graph.height
+    distance = array('l', [UNREACHABLE]) * size
+    next_node = array('l', [-1]) * size
+    space = search_space(graph)
+    kinds = space.kinds
+    neighbours = space.neighbours
+    open_set = space.open_set
+
+    open_set.clear()
+    for root in roots:
+        distance[root] = 0
+        open_set.push(root, 0)
+    push = open_set.push
+    pop = open_set.pop
+    expanded = 0
+
+    while True:
+        current = pop()
+        if current == -1:
+            break
+
+        expanded += 1
+        current_distance = distance[current]
+        for offset, step in neighbours[kinds[current]]:
+            child = current + offset
+            if cells[child]:
+                continue
+
+            cost = current_distance + step
+            child_distance = distance[child]
+            if child_distance == UNREACHABLE or cost < child_distance:
+                distance[child] = cost
+                next_node[child] = current
+                push(child, cost)
+
+    return distance, next_node, expanded
+
+class DistanceField:
+    def __init__(self, graph, goal):
+        self.graph = graph
+        self.goal = as_cell(goal)
+        self.version = graph.version # The grid version the field was computed for
+        self.expanded = 0
+
+        # distance[node] is the cost to the goal and next_node[node] the neighbour one step closer to it
+        # Both are flat, indexed like Grid.cells, and next_node is -1 for the goal and unreachable nodes
+        self.distance = None
+        self.next_node = None
+        self.compute()
+
+    # Dijkstra's search from the goal over the whole grid
+    def compute(self):
+        self.distance, self.next_node, self.expanded = dijkstra(self.graph, [self.graph.index(self.goal)])
+
+    # Whether the field still matches the grid it was computed on
+    def current(self):
+        return self.version == self.graph.version
+
+    def reachable(self, node):
+        return self.distance[self.graph.index(node)] != UNREACHABLE
+
+    # The cost of the shortest path from a node to the goal, or None if there is no path
+    def cost(self, node):
+        distance = self.distance[self.graph.index(node)]
+        if distance == UNREACHABLE:
+            return None
+        return int(distance)
+
+    # The direction to take from a node to get one step closer to the goal, as an (x, y) tuple
+    def direction(self, node):
+        node = as_cell(node)
+        following = self.next_node[self.graph.index(node)]
+        if following == -1:
+            return (0, 0) # Already at the goal, or the goal can't be reached
+        x, y = self.graph.coordinates(int(following))
+        return x - node[0], y - node[1]
+
+    # The path from a node to the goal, as a SearchResult like the one a_star_search returns
+    def path(self, start):
+        graph = self.graph
+        start = as_cell(start)
+        node = graph.index(start)
+        if self.distance[node] == UNREACHABLE:
+            return SearchResult(start, self.goal, None, None)
+
+        indices = array('l', [node])
+        root = graph.index(self.goal)
+        while node != root:
+            node = int(self.next_node[node])
+            indices.append(node)
+        return SearchResult(start, self.goal, Path(graph.width, indices), int(self.distance[graph.index(start)]))
+
+    # Yields (node, direction) for every step from a node to the goal, like SearchResult.steps()
+    def steps(self, node):
+        graph = self.graph
+        node = graph.index(node)
+        if self.distance[node] == UNREACHABLE:
+            return
+        root = graph.index(self.goal)
+        while node != root:
+            following = int(self.next_node[node])
+            x, y = graph.coordinates(node)
+            next_x, next_y = graph.coordinates(following)
+            yield (x, y), (next_x - x, next_y - y)
+            node = following
+
+'''
+Hands out the distance field of a goal to any number of agents, and only computes it again when the goal or the walls change
+field_class picks the engine: DistanceField, or vectorized.VectorDistanceField when numpy is installed
+'''
+class SharedDistanceField:
+    def __init__(self, graph, field_class=DistanceField):
+        self.graph = graph
+        self.field_class = field_class
+        self.field = None
+        self.builds = 0 # How many times a field was computed
+
+    def towards(self, goal):
+        goal = as_cell(goal)
+        field = self.field
+        if field is None or field.goal != goal or not field.current():
+            field = self.field = self.field_class(self.graph, goal)
+            self.builds += 1
+        return field
@@ -0,0 +1,137 @@
+'''
+Headless maze grid used by the search engine
+Nothing in this module imports pygame, so the grid can be built by batch workers and test harnesses without opening a window
+'''
+
+import random
+
+# Directions in graph coordinates. The origin starts on the top-left corner with increasing x going right and increasing y going down (not up)
+EAST = (1, 0) # RIGHT
+WEST = (-1, 0) # LEFT
+SOUTH = (0, 1) # DOWN
+NORTH = (0, -1) # UP
+SOUTHEAST = (1, 1) # RIGHT_DOWN
+SOUTHWEST = (-1, 1) # LEFT_DOWN
+NORTHEAST = (1, -1) # RIGHT_UP
+NORTHWEST = (-1, -1) # LEFT_UP
+DIRECTIONS = [EAST, WEST, SOUTH, NORTH, SOUTHEAST, SOUTHWEST, NORTHEAST, NORTHWEST]
+
+# Size of the built-in maze, in nodes
+GRAPH_WIDTH = 28
+GRAPH_HEIGHT = 15
+
+# Nodes in which the player shouldn't be able to pass
+WALLS = [(2,0),(0,11),(23,14),(0,0),(1,0),(3,0),(17,0),(18,0),(19,0),(20,0),(22,0),(23,0),(24,0),(27,3),(27,4),(27,5),(27,12),(24,14),(22,14),(21,14),(19,14),(18,14),(10,14),(9,14),(8,14),
+(7,14),(6,14),(3,14),(4,14),(2,14),(0,14),(0,13),(0,12),(0,9),(0,8),(0,7),(0,5),(0,4),(0,3),(0,1),(19,6),(15,5),(15,7),(17,10),(17,8),(17,6),(17,5),(17,4),(22,5),(23,7),(22,10),(24,10),(24,9),
+(24,7),(25,5),(26,5),(22,8),(19,10),(13,12),(6,5),(4,8),(5,12),(7,12),(7,10),(6,8),(3,5),(3,3),(4,3),(10,3),(11,4),(15,6),(15,8),(14,5),(11,7),(11,6),(11,5),(12,5),(22,2),(24,2),(24,5),(24,6),
+(22,7),(22,3),(22,4),(23,2),(26,3),(25,3),(24,3),(20,6),(19,5),(19,7),(19,8),(19,9),(20,10),(21,10),(20,8),(25,9),(26,8),(26,9),(17,9),(17,11),(17,3),(17,2),(13,10),(13,11),(7,11),(6,12),(5,8),
+(7,8),(7,9),(4,7),(3,4),(5,5),(4,5),(7,5),(8,5),(9,5),(11,3),(13,2),(13,3),(15,3),(14,3),(15,1),(6,6),(8,8),(10,8),(9,12),(10,12),(11,12),(9,11),(9,10),(15,12),(16,12),(17,12),(13,13),(15,13),
+(17,14),(11,14),(5,1),(26,2),(26,0),(19,2),(20,2),(20,3),(20,4),(19,4),(26,7),(19,12),(20,12),(21,12),(22,12),(23,12),(24,12),(24,11),(26,12),(26,11),(3,10),(4,9),(4,10),(5,10),(2,10),(2,9),
+(2,8),(2,7),(2,11),(2,12),(3,12),(2,5),(1,3),(2,1),(4,2),(5,2),(7,2),(9,3),(13,1),(12,1),(11,1),(6,4),(8,3),(8,2),(10,1),(27,14),(26,14),(8,7),(11,8),(11,9),(12,9),(13,9),(14,9),(15,9),(11,11),
+(15,10),(10,7),(7,1),(7,0),(10,0),(9,0)]
+
+# Turns any 2D coordinate (a tuple, a list or a pygame Vector2 holding floats) into an integer (x, y) tuple
+def as_cell(node):
+    return int(node[0]), int(node[1])
+
+class Grid:
+    '''
+    The walls are stored as one byte per node in a flat bytearray, indexed by y * width + x
+    A byte of 1 means wall and 0 means open ground, so checking a node is a single index instead of a scan through every wall
+
+    Walls should be changed through set_wall() and the functions built on it: they bump version and tell every listener
+    which node changed, which is how caches and indices built on top of the grid stay up to date
+
+    Params:
+    walls: (x, y) nodes to start out as walls
+    cells: an existing buffer of width * height bytes to use as the occupancy index instead of a new bytearray,
+    such as shared memory or a memory-mapped file. It is used as it is, nothing is copied
+    '''
+    def __init__(self, width, height, walls=(), cells=None):
+        self.width = width
+        self.height = height
+
+        if cells is None:
+            cells = bytearray(width * height)
+        elif len(cells) != width * height:
+            raise ValueError('Expected ' + str(width * height) + ' cells for a ' + str(width) + 'x' + str(height) + ' grid, got ' + str(len(cells)))
+        self.cells = cells
+
+        for wall in walls:
+            self.cells[self.index(wall)] = 1
+
+        self.version = 0 # Bumped every time a wall is added or removed
+        self.listeners = [] # Functions called as listener(node, blocked) after a wall changes
+
+    # Converts graph coordinates into the position of the node inside cells
+    def index(self, node):
+        return int(node[1]) * self.width + int(node[0])
+
+    # Converts a position inside cells back into graph coordinates
+    def coordinates(self, index):
+        y, x = divmod(index, self.width)
+        return x, y
+
+    # Checks to see if the given node is within the grid
+    def in_bounds(self, node):
+        return 0 <= node[0] < self.width and 0 <= node[1] < self.height # Is x is between 0 and the width? Is y between 0 and the height?
+
+    # Checks if a node is a wall. The node has to be in bounds
+    def passable(self, node):
+        return not self.cells[int(node[1]) * self.width + int(node[0])]
+
+    def is_wall(self, node):
+        return not self.passable(node)
+
+    def set_wall(self, node, blocked):
+        index = self.index(node)
+        value = 1 if blocked else 0
+        if self.cells[index] == value:
+            return # Nothing changes, so the version stays the same
+
+        self.cells[index] = value
+        self.version += 1
+        node = as_cell(node)
+        for listener in list(self.listeners):
+            listener(node, bool(blocked))
+
+    def add_wall(self, node):
+        self.set_wall(node, True)
+
+    def remove_wall(self, node):
+        self.set_wall(node, False)
+
+    def toggle_wall(self, node):
+        self.set_wall(node, self.passable(node))
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # Every wall as an (x, y) tuple, in row order
+    @property
+    def walls(self):
+        cells = self.cells
+        return [self.coordinates(index) for index in range(len(cells)) if cells[index]]
+
+    # Returns a random node that is not a wall
+    def random_open_cell(self, rng=random):
+        if all(self.cells):
+            raise ValueError('The grid has no open nodes')
+
+        while True:
+            index = rng.randrange(len(self.cells))
+            if not self.cells[index]:
+                return self.coordinates(index)
+
+    # Print out a list of the walls for easy updating
+    def print_walls(self):
+        for wall in self.walls:
+            print('(' + str(wall[0]) + ',' + str(wall[1]) + ')')
+
+# Builds the maze that ships with the game
+def default_grid():
+    return Grid(GRAPH_WIDTH, GRAPH_HEIGHT, WALLS)
@@ -0,0 +1,140 @@
+'''
+Heuristics for the 8-connected grid, where a straight step costs 10 and a diagonal step costs 14
+
+A heuristic estimates the cost between a node and the search target. bind() is called once per search and returns a
+function that takes a node index and gives the estimate, so the search only pays for one call per pushed node
+
+Only the heuristics that never overestimate (octile, chebyshev and euclidean) guarantee the shortest path
+Giving them a weight above 1 turns the search into weighted A*: it expands fewer nodes and the path it returns
+costs at most weight times the shortest one
+'''
+
+import copy
+import math
+
+from .grid import as_cell
+
+class Heuristic:
+    name = None
+    admissible = True # Never overestimates, at weight 1
+
+    def __init__(self, weight=1):
+        if weight < 1:
+            raise ValueError('The weight of a heuristic must be at least 1')
+        self.weight = weight
+
+    # The estimate between two nodes that are dx and dy apart (both positive)
+    def distance(self, dx, dy):
+        raise NotImplementedError
+
+    def bind(self, graph, target):
+        width = graph.width
+        target_x, target_y = as_cell(target)
+        distance = self.distance
+        weight = self.weight
+
+        if weight == 1:
+            def estimate(node):
+                y, x = divmod(node, width)
+                return distance(abs(x - target_x), abs(y - target_y))
+        else:
+            def estimate(node):
+                y, x = divmod(node, width)
+                return int(distance(abs(x - target_x), abs(y - target_y)) * weight)
+        return estimate
+
+    # A copy of this heuristic with another weight
+    def with_weight(self, weight):
+        if weight < 1:
+            raise ValueError('The weight of a heuristic must be at least 1')
+        heuristic = copy.copy(self)
+        heuristic.weight = weight
+        return heuristic
+
+    # The estimate between two (x, y) nodes
+    def __call__(self, node, other):
+        node = as_cell(node)
+        other = as_cell(other)
+        return int(self.distance(abs(node[0] - other[0]), abs(node[1] - other[1])) * self.weight)
+
+    def __repr__(self):
+        if self.weight == 1:
+            return self.__class__.__name__ + '()'
+        return self.__class__.__name__ + '(weight=' + repr(self.weight) + ')'
+
+'''
+The exact cost of the path between two nodes on an empty grid: go diagonally until lined up, then go straight
+14 * min + 10 * (max - min), which is the same as 10 * (dx + dy) - 6 * min
+'''
+class Octile(Heuristic):
+    name = 'octile'
+
+    def distance(self, dx, dy):
+        if dx < dy:
+            return 10 * dy + 4 * dx
+        return 10 * dx + 4 * dy
+
+    # The default heuristic, so the formula is written out in the returned function instead of calling distance()
+    def bind(self, graph, target):
+        if self.weight != 1:
+            return Heuristic.bind(self, graph, target)
+
+        width = graph.width
+        target_x, target_y = as_cell(target)
+
+        def estimate(node):
+            y, x = divmod(node, width)
+            dx = abs(x - target_x)
+            dy = abs(y - target_y)
+            if dx < dy:
+                return 10 * dy + 4 * dx
+            return 10 * dx + 4 * dy
+        return estimate
+
+# Every step, straight or diagonal, is counted as 10. Never overestimates, but is looser than octile
+class Chebyshev(Heuristic):
+    name = 'chebyshev'
+
+    def distance(self, dx, dy):
+        return 10 * max(dx, dy)
+
+'''
+The straight line distance. A diagonal step costs 14, a little less than 10 * sqrt(2) ~ 14.14,
+so the line is scaled by 14 / sqrt(2) ~ 9.9 instead of 10 to keep it from overestimating long diagonals
+'''
+class Euclidean(Heuristic):
+    name = 'euclidean'
+    scale = 14 / math.sqrt(2)
+
+    def distance(self, dx, dy):
+        return int(math.sqrt(dx * dx + dy * dy) * self.scale)
+
+'''
+The manhattan distance, h2, from the lecture slides. It ignores diagonal moves, so it overestimates and is only kept for comparison
+The path it finds is not always the shortest, and which one it is depends on how the open set breaks ties on f
+'''
+class Manhattan(Heuristic):
+    name = 'manhattan'
+    admissible = False
+
+    def distance(self, dx, dy):
+        return (dx + dy) * 10
+
+HEURISTICS = {heuristic.name: heuristic for heuristic in (Octile, Chebyshev, Euclidean, Manhattan)}
+
+'''
+Turns what a caller passes to a search into a Heuristic:
+None gives the default (octile), a name such as 'euclidean' gives that heuristic, and a Heuristic is used as it is
+A weight, if given, overrides the one of the heuristic
+'''
+def make_heuristic(heuristic=None, weight=None):
+    if heuristic is None:
+        heuristic = Octile()
+    elif isinstance(heuristic, str):
+        if heuristic not in HEURISTICS:
+            raise ValueError('Unknown heuristic ' + repr(heuristic) + ', expected one of ' + ', '.join(sorted(HEURISTICS)))
+        heuristic = HEURISTICS[heuristic]()
+
+    if weight is not None and weight != heuristic.weight:
+        heuristic = heuristic.with_weight(weight)
+    return heuristic
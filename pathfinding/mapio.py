@@ -0,0 +1,250 @@
+'''
+Reading and writing maps
+
+The binary format is made to load big maps quickly:
+- A header: magic, format version, width, height and how many sections follow
+- A directory of (name, offset, length) entries, one per section
+- The sections, each starting on an 8 byte boundary:
+  cells: the walls, one byte per node exactly like Grid.cells, or
+  bits: the walls packed 8 nodes per byte, lowest bit first, for a file 8 times smaller
+  labels: optional, the ComponentIndex labels as int32
+  jumps: optional, the 8 JumpTable tables as int32, one after the other
+  landmark: optional, Landmarks: their count and table item size (2 or 4) as uint32, the landmark nodes as uint32, then their tables
+  hops: optional, the rows of a NextHopTable, one per goal, as uint16 (uint32 on maps with 65535 nodes or more)
+All numbers are little-endian
+
+With byte packing, load_map() memory-maps the file and the grid uses the mapped bytes as its cells, so nothing is read or copied
+up front and only the pages a search touches are loaded. The mapping is copy-on-write: walls changed in the game never reach the file
+
+There are also readers for the text formats: the .map format of the grid benchmarks (Sturtevant's Moving AI maps),
+and lists of (x, y) walls like WALLS in grid.py or the output of Grid.print_walls()
+'''
+
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+from .components import ComponentIndex
+from .grid import GRAPH_HEIGHT, GRAPH_WIDTH, Grid
+from .jps import JumpTable
+from .landmarks import Landmarks
+from .nexthop import NextHopTable
+
+MAGIC = b'PFMP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIII4x') # magic, format version, reserved, width, height, number of sections
+SECTION = struct.Struct('<8sQQ') # name, offset from the start of the file, length in bytes
+LANDMARK_HEADER = struct.Struct('<II') # number of landmarks, bytes per table entry
+
+# 8 cells of 0 or 1 -> the byte they pack into, and back
+_PACK = {}
+_UNPACK = []
+for _value in range(256):
+    _cells = bytes((_value >> bit) & 1 for bit in range(8))
+    _PACK[_cells] = _value
+    _UNPACK.append(_cells)
+
+def _pack_bits(cells):
+    cells = bytes(cells)
+    padded = cells + bytes(-len(cells) % 8)
+    return bytes([_PACK[padded[index:index + 8]] for index in range(0, len(padded), 8)])
+
+def _unpack_bits(data, size):
+    return bytearray(b''.join([_UNPACK[value] for value in data])[:size])
+
+# Turns little-endian bytes into something that can be indexed like an array of the typecode ('i' for int32), without copying them when possible
+def _values(data, typecode='i'):
+    if sys.byteorder == 'little':
+        return data.cast(typecode)
+    values = array(typecode, bytes(data))
+    values.byteswap()
+    return values
+
+def _value_bytes(values, typecode='i'):
+    values = array(typecode, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+'''
+Writes a grid to path in the binary format
+
+Params:
+packing: 'bytes' so load_map() can map the walls without copying them, or 'bits' for a file 8 times smaller
+components: a ComponentIndex of the grid to save along with it
+jumps: a JumpTable of the grid to save along with it
+landmarks: a landmarks.Landmarks of the grid to save along with it
+hops: a nexthop.NextHopTable of the grid to save along with it. Its missing rows are worked out first
+'''
+def save_map(path, graph, packing='bytes', components=None, jumps=None, landmarks=None, hops=None):
+    if packing == 'bytes':
+        sections = [(b'cells', bytes(graph.cells))]
+    elif packing == 'bits':
+        sections = [(b'bits', _pack_bits(graph.cells))]
+    else:
+        raise ValueError("packing must be 'bytes' or 'bits', not " + repr(packing))
+
+    if components is not None:
+        sections.append((b'labels', _value_bytes(components.canonical_labels())))
+    if jumps is not None:
+        sections.append((b'jumps', b''.join(_value_bytes(table) for table in jumps.distances)))
+    if landmarks is not None:
+        if not landmarks.current():
+            landmarks.build()
+        itemsize = array(landmarks.typecode).itemsize
+        data = LANDMARK_HEADER.pack(len(landmarks.nodes), itemsize) + _value_bytes(landmarks.nodes, 'I')
+        sections.append((b'landmark', data + b''.join(_value_bytes(table, landmarks.typecode) for table in landmarks.tables)))
+    if hops is not None:
+        hops.build()
+        sections.append((b'hops', b''.join(_value_bytes(row, hops.typecode) for row in hops.rows)))
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    offsets = []
+    for name, data in sections:
+        offset += -offset % 8
+        offsets.append(offset)
+        offset += len(data)
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, graph.width, graph.height, len(sections)))
+        for (name, data), offset in zip(sections, offsets):
+            file.write(SECTION.pack(name, offset, len(data)))
+        for (name, data), offset in zip(sections, offsets):
+            file.write(bytes(offset - file.tell())) # Padding up to the section's boundary
+            file.write(data)
+
+# What load_map() hands back: the grid, and the optional sections that were saved with it
+class MapFile:
+    def __init__(self, grid, sections):
+        self.grid = grid
+        self.sections = sections # section name -> memoryview of its bytes
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    # A ComponentIndex for the grid, from the saved labels when there are some, labelled from scratch otherwise
+    def components(self):
+        if 'labels' not in self.sections:
+            return ComponentIndex(self.grid)
+        return ComponentIndex(self.grid, _values(self.sections['labels']))
+
+    # A JumpTable for the grid, from the saved tables when there are some, built from scratch otherwise
+    def jump_table(self):
+        if 'jumps' not in self.sections:
+            return JumpTable(self.grid)
+        size = self.grid.width * self.grid.height
+        tables = _values(self.sections['jumps'])
+        return JumpTable(self.grid, [tables[index * size:(index + 1) * size] for index in range(8)])
+
+    # Landmarks for the grid, from the saved tables when there are some, picked and worked out from scratch otherwise
+    def landmarks(self, count=8, rebuild=True):
+        if 'landmark' not in self.sections:
+            return Landmarks(self.grid, count, rebuild=rebuild)
+        data = self.sections['landmark']
+        count, itemsize = LANDMARK_HEADER.unpack_from(data)
+        start = LANDMARK_HEADER.size + 4 * count
+        nodes = list(_values(data[LANDMARK_HEADER.size:start], 'I'))
+        tables = _values(data[start:], 'H' if itemsize == 2 else 'I')
+        size = self.grid.width * self.grid.height
+        return Landmarks(self.grid, nodes=nodes, tables=[tables[index * size:(index + 1) * size] for index in range(count)], rebuild=rebuild)
+
+    # A NextHopTable for the grid, from the saved rows when there are some, empty (filled in as goals are asked for) otherwise
+    def next_hops(self):
+        if 'hops' not in self.sections:
+            return NextHopTable(self.grid)
+        size = self.grid.width * self.grid.height
+        rows = _values(self.sections['hops'], 'H' if size < 0xFFFF else 'I')
+        return NextHopTable(self.grid, [rows[goal * size:(goal + 1) * size] for goal in range(size)])
+
+'''
+Reads a map written by save_map() and returns a MapFile
+
+Params:
+memory_map: map the file instead of reading it. With byte packing the grid's cells are then the mapped bytes themselves
+'''
+def load_map(path, memory_map=True):
+    with open(path, 'rb') as file:
+        # Checked before mapping it, as mmap refuses an empty file with an error of its own
+        if os.fstat(file.fileno()).st_size < HEADER.size:
+            raise ValueError(str(path) + ' is too short to be a map')
+        if memory_map:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        else:
+            data = bytearray(file.read())
+    data = memoryview(data)
+
+    magic, version, reserved, width, height, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(str(path) + ' is not a map file')
+    if version != FORMAT_VERSION:
+        raise ValueError(str(path) + ' has map format version ' + str(version) + ', only ' + str(FORMAT_VERSION) + ' can be read')
+
+    sections = {}
+    for number in range(count):
+        name, offset, length = SECTION.unpack_from(data, HEADER.size + number * SECTION.size)
+        if offset + length > len(data):
+            raise ValueError(str(path) + ' is cut short')
+        sections[name.rstrip(b'\0').decode('ascii')] = data[offset:offset + length]
+
+    size = width * height
+    if 'cells' in sections:
+        cells = sections.pop('cells')
+    elif 'bits' in sections:
+        cells = _unpack_bits(sections.pop('bits'), size)
+    else:
+        raise ValueError(str(path) + ' has no walls section')
+
+    return MapFile(Grid(width, height, cells=cells), sections)
+
+# The characters of a .map file that can be walked on: ground, grass ('G') and swamp ('S'). Trees, water and out of bounds are walls
+OPEN_TERRAIN = '.GS'
+_TERRAIN_TO_CELL = bytes(0 if chr(character) in OPEN_TERRAIN else 1 for character in range(256)) # A bytes.translate() table
+_CELL_TO_TERRAIN = b'.@' + bytes(254)
+
+# Reads a map in the .map text format of the grid benchmarks (a "type", "height", "width" and "map" header, then one line per row)
+def read_benchmark_map(path):
+    with open(path) as file:
+        lines = file.read().splitlines()
+
+    header = {}
+    row = 0
+    while row < len(lines) and lines[row].strip() != 'map':
+        parts = lines[row].split()
+        if len(parts) == 2:
+            header[parts[0]] = parts[1]
+        row += 1
+    if 'width' not in header or 'height' not in header or row == len(lines):
+        raise ValueError(str(path) + ' is missing the width, height or map lines of a .map file')
+
+    width = int(header['width'])
+    height = int(header['height'])
+    rows = lines[row + 1:row + 1 + height]
+    if len(rows) != height or any(len(line) < width for line in rows):
+        raise ValueError(str(path) + ' has fewer rows or columns than its header says')
+
+    cells = bytearray(width * height)
+    for y, line in enumerate(rows):
+        cells[y * width:(y + 1) * width] = line[:width].encode('latin-1').translate(_TERRAIN_TO_CELL)
+    return Grid(width, height, cells=cells)
+
+# Writes a grid in the .map text format, '.' for open ground and '@' for walls
+def write_benchmark_map(path, graph):
+    with open(path, 'w') as file:
+        file.write('type octile\nheight ' + str(graph.height) + '\nwidth ' + str(graph.width) + '\nmap\n')
+        for y in range(graph.height):
+            row = bytes(graph.cells[y * graph.width:(y + 1) * graph.width])
+            file.write(row.translate(_CELL_TO_TERRAIN).decode('ascii') + '\n')
+
+'''
+Builds a grid from text holding (x, y) walls, like the WALLS list in grid.py or what Grid.print_walls() prints
+Every "(x, y)" pair in the text is a wall, whatever is around them
+'''
+def parse_walls(text, width=GRAPH_WIDTH, height=GRAPH_HEIGHT):
+    walls = [(int(x), int(y)) for x, y in re.findall(r'\(\s*(\d+)\s*,\s*(\d+)\s*\)', text)]
+    for wall in walls:
+        if not (0 <= wall[0] < width and 0 <= wall[1] < height):
+            raise ValueError('The wall ' + str(wall) + ' is outside a ' + str(width) + 'x' + str(height) + ' grid')
+    return Grid(width, height, walls)
@@ -0,0 +1,107 @@
+'''
+All-pairs next-hop table, for small maps like the game's 28x15 one
+
+For every goal, the table holds the neighbour to step to from every node, so the next step between any two nodes is one lookup
+and a whole path is as many lookups as it has nodes, with no search at all
+A goal's row is the next_node array of a DistanceField, stored as uint16 (uint32 on maps with 65535 nodes or more)
+The grid's 420 nodes need 420 rows of 420 entries, about 350 KiB. The size grows with the square of the map, so only
+maps up to ALL_PAIRS_LIMIT nodes are accepted
+
+Rows are worked out the first time their goal is asked for, or all at once with build(). After a wall change every row is
+forgotten and worked out again when it is needed, like SharedDistanceField does for one goal
+'''
+
+from array import array
+
+from .flowfield import DistanceField
+from .grid import as_cell
+from .path import Path
+from .search import SearchResult, step_cost
+
+ALL_PAIRS_LIMIT = 1024 # The most nodes a NextHopTable is built for
+
+class NextHopTable:
+    '''
+    Params:
+    graph: the Grid to plan on, with at most limit nodes
+    rows: rows saved by mapio.save_map(), one per goal, used as they are until a wall changes
+    '''
+    def __init__(self, graph, rows=None, limit=ALL_PAIRS_LIMIT):
+        size = graph.width * graph.height
+        if size > limit:
+            raise ValueError('A ' + str(graph.width) + 'x' + str(graph.height) + ' grid is too big for an all-pairs table (more than ' + str(limit) + ' nodes)')
+
+        self.graph = graph
+        self.typecode = 'H' if size < 0xFFFF else 'I'
+        self.none = 0xFFFF if self.typecode == 'H' else 0xFFFFFFFF # The entry of the goal itself and of the nodes that can't reach it
+        self.built = 0 # How many rows were worked out
+        if rows is None:
+            self.rows = [None] * size # rows[goal][node] is the node to step to from node towards goal
+        else:
+            if len(rows) != size or any(len(row) != size for row in rows):
+                raise ValueError('Expected ' + str(size) + ' rows of ' + str(size) + ' next hops')
+            self.rows = list(rows)
+        self.version = graph.version
+
+    # Works out every row up front, so no query has to wait for one
+    def build(self):
+        for goal in range(len(self.rows)):
+            self.row(goal)
+
+    # The next hops towards a goal, given as a grid index
+    def row(self, goal):
+        if self.version != self.graph.version:
+            self.rows = [None] * len(self.rows) # The walls changed, so every row is out of date
+            self.version = self.graph.version
+
+        row = self.rows[goal]
+        if row is None:
+            none = self.none
+            field = DistanceField(self.graph, self.graph.coordinates(goal))
+            row = self.rows[goal] = array(self.typecode, [none if node == -1 else node for node in field.next_node])
+            self.built += 1
+        return row
+
+    # The node to step to from a node to get one step closer to the goal, or None at the goal or if the goal can't be reached
+    def next_hop(self, node, goal):
+        following = self.row(self.graph.index(goal))[self.graph.index(node)]
+        if following == self.none:
+            return None
+        return self.graph.coordinates(following)
+
+    # The direction to take from a node towards the goal, (0, 0) at the goal or if it can't be reached
+    def direction(self, node, goal):
+        node = as_cell(node)
+        following = self.next_hop(node, goal)
+        if following is None:
+            return (0, 0)
+        return following[0] - node[0], following[1] - node[1]
+
+    # The path between two nodes as a SearchResult, read from the table without searching
+    def find_path(self, start, goal):
+        graph = self.graph
+        start = as_cell(start)
+        goal = as_cell(goal)
+        width = graph.width
+        target = graph.index(goal)
+        row = self.row(target)
+        none = self.none
+
+        node = graph.index(start)
+        indices = array('l', [node])
+        cost = 0
+        while node != target:
+            following = row[node]
+            if following == none:
+                return SearchResult(start, goal, None, None)
+            # From the coordinates, not the index offset: on a 2 wide grid a diagonal step and a straight one can have the same offset
+            y, x = divmod(node, width)
+            following_y, following_x = divmod(following, width)
+            cost += step_cost((following_x - x, following_y - y))
+            node = following
+            indices.append(node)
+        return SearchResult(start, goal, Path(width, indices), cost)
+
+    # The cost of the shortest path between two nodes, or None if there is no path
+    def cost(self, start, goal):
+        return self.find_path(start, goal).cost
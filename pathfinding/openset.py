@@ -0,0 +1,75 @@
+'''
+The open set used by the searches
+It is a binary heap (heapq) with lazy deletion: improving a node pushes a new entry instead of searching the heap for the old one,
+and the old entries are recognised and skipped when they come out of the heap
+'''
+
+import heapq
+from array import array
+
+class OpenSet:
+    def __init__(self, size):
+        self.heap = []
+
+        # best[node] is the priority of the newest entry of the node. It is only valid while queued[node] holds the current generation
+        self.best = array('l', [0]) * size
+        self.queued = array('L', [0]) * size
+        self.generation = 1 # queued starts out all 0, which has to mean "not queued", so the first generation is 1
+
+        self.pushes = 0
+        self.pops = 0
+        self.stale = 0
+
+    # Empties the set for a new search. The arrays are not touched, bumping the generation is enough to forget every entry
+    def clear(self):
+        self.heap.clear()
+        self.generation += 1
+        self.pushes = 0
+        self.pops = 0
+        self.stale = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def empty(self):
+        return len(self.heap) == 0
+
+    '''
+    Queues a node with the given priority, f, and a tie breaker, normally h. Entries are plain (f, tie, node) int tuples,
+    so ties on f go to the smaller tie breaker and then to the smaller node index, the same way every time
+    With an admissible heuristic this only picks among paths of the same cost. With one that overestimates (Manhattan), the order
+    also decides which of the suboptimal paths comes out, so such searches can return other paths and costs than the plain heap did
+    If the node is queued already with a priority that is as good, nothing is pushed and False is returned
+    '''
+    def push(self, node, priority, tie=0):
+        if self.queued[node] == self.generation and self.best[node] <= priority:
+            return False
+
+        self.best[node] = priority
+        self.queued[node] = self.generation
+        heapq.heappush(self.heap, (priority, tie, node))
+        self.pushes += 1
+        return True
+
+    # Removes and returns the node with the lowest priority, skipping the entries that were replaced by a better one. Returns -1 when empty
+    def pop(self):
+        heap = self.heap
+        best = self.best
+        queued = self.queued
+        generation = self.generation
+
+        while heap:
+            priority, tie, node = heapq.heappop(heap)
+            self.pops += 1
+
+            if queued[node] != generation or best[node] != priority:
+                self.stale += 1 # The node was popped already, or it was pushed again with a better priority
+                continue
+
+            queued[node] = 0 # No longer queued, so a later push (a reopen) is accepted again
+            return node
+
+        return -1
+
+    def counters(self):
+        return {'pushes': self.pushes, 'pops': self.pops, 'stale': self.stale}
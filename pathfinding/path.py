@@ -0,0 +1,242 @@
+'''
+Compact paths
+
+A Path keeps the nodes of a path as grid indices in an array, 8 bytes a node instead of a list of (x, y) tuples,
+and turns them back into (x, y) tuples only when they are read, one at a time
+
+Agents follow a path one node after the other, so the path remembers where the last lookup was (its cursor):
+asking for the direction at the node the agent is on, or the one right after it, takes O(1) without a dictionary of every step
+'''
+
+from array import array
+
+from .grid import as_cell
+
+class Path:
+    def __init__(self, width, indices):
+        self.width = width
+        self.indices = indices # Grid indices (y * width + x) from the start to the goal, both included
+        self.cursor = 0 # Position of the last node looked up with locate()
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        width = self.width
+        for index in self.indices:
+            y, x = divmod(index, width)
+            yield x, y
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [(index % self.width, index // self.width) for index in self.indices[position]]
+        y, x = divmod(self.indices[position], self.width)
+        return x, y
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return 'Path(' + repr(list(self)) + ')'
+
+    # The (dx, dy) of every step of the path, in order
+    def directions(self):
+        width = self.width
+        indices = self.indices
+        for position in range(len(indices) - 1):
+            y, x = divmod(indices[position], width)
+            next_y, next_x = divmod(indices[position + 1], width)
+            yield next_x - x, next_y - y
+
+    # The path as a run-length encoding of its directions: (direction, how many steps in a row) pairs
+    def runs(self):
+        direction = None
+        count = 0
+        for step in self.directions():
+            if step == direction:
+                count += 1
+                continue
+            if direction is not None:
+                yield direction, count
+            direction = step
+            count = 1
+        if direction is not None:
+            yield direction, count
+
+    # The start, every node where the path turns, and the goal
+    def waypoints(self):
+        if not self.indices:
+            return
+        x, y = self[0]
+        yield x, y
+        for (dx, dy), count in self.runs():
+            x += dx * count
+            y += dy * count
+            yield x, y
+
+    # The position of a node in the path, or -1 if it is not on it. Looking up the node at or after the last one found is O(1)
+    def locate(self, node):
+        index = int(node[1]) * self.width + int(node[0])
+        indices = self.indices
+        cursor = self.cursor
+        for position in (cursor, cursor + 1):
+            if position < len(indices) and indices[position] == index:
+                self.cursor = position
+                return position
+
+        # The agent jumped somewhere else on the path (or this is the first lookup from the middle), so look for it once
+        for position, other in enumerate(indices):
+            if other == index:
+                self.cursor = position
+                return position
+        return -1
+
+    # The direction to take from a node on the path to get one step closer to the goal
+    def direction(self, node):
+        position = self.locate(node)
+        if position == -1:
+            raise KeyError(as_cell(node))
+        if position == len(self.indices) - 1:
+            return (0, 0) # Already at the goal
+        y, x = divmod(self.indices[position], self.width)
+        next_y, next_x = divmod(self.indices[position + 1], self.width)
+        return next_x - x, next_y - y
+
+    # Yields (node, direction) for every step from a node on the path to the goal, without moving the cursor
+    def steps(self, node):
+        cursor = self.cursor
+        position = self.locate(node)
+        self.cursor = cursor
+        if position == -1:
+            raise KeyError(as_cell(node))
+
+        width = self.width
+        indices = self.indices
+        for position in range(position, len(indices) - 1):
+            y, x = divmod(indices[position], width)
+            next_y, next_x = divmod(indices[position + 1], width)
+            yield (x, y), (next_x - x, next_y - y)
+
+'''
+A Path whose nodes come from an iterator of (x, y) nodes and are only read out of it as far as they are needed,
+for paths that cost something to work out node by node, like the refined paths of HierarchicalPlanner
+Following it with direction() or steps() reads one node ahead of the agent. Anything that needs the whole path
+(len(), the end of it, runs(), or looking up a node that was not read yet) reads the rest of it first
+'''
+class LazyPath(Path):
+    def __init__(self, width, nodes):
+        super().__init__(width, array('l'))
+        self.pending = iter(nodes) # The nodes not read yet, None once they all were
+
+    # Reads nodes until count of them are known or the path ends, -1 reading all of them
+    def read(self, count=-1):
+        indices = self.indices
+        width = self.width
+        while self.pending is not None and (count == -1 or len(indices) < count):
+            node = next(self.pending, None)
+            if node is None:
+                self.pending = None
+            else:
+                indices.append(int(node[1]) * width + int(node[0]))
+
+    def __len__(self):
+        self.read()
+        return len(self.indices)
+
+    def __iter__(self):
+        width = self.width
+        indices = self.indices
+        position = 0
+        while True:
+            self.read(position + 1)
+            if position == len(indices):
+                return
+            y, x = divmod(indices[position], width)
+            yield x, y
+            position += 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice) or position < 0:
+            self.read()
+        else:
+            self.read(position + 1)
+        return super().__getitem__(position)
+
+    def directions(self):
+        self.read()
+        return super().directions()
+
+    def locate(self, node):
+        self.read(self.cursor + 2)
+        position = super().locate(node)
+        if position == -1 and self.pending is not None:
+            self.read()
+            position = super().locate(node)
+        return position
+
+    def direction(self, node):
+        position = self.locate(node)
+        if position != -1:
+            self.read(position + 2)
+        return super().direction(node)
+
+    def steps(self, node):
+        cursor = self.cursor
+        position = self.locate(node)
+        self.cursor = cursor
+        if position == -1:
+            raise KeyError(as_cell(node))
+
+        width = self.width
+        indices = self.indices
+        while True:
+            self.read(position + 2)
+            if position + 1 >= len(indices):
+                return
+            y, x = divmod(indices[position], width)
+            next_y, next_x = divmod(indices[position + 1], width)
+            yield (x, y), (next_x - x, next_y - y)
+            position += 1
+
+# Builds a Path out of (x, y) nodes
+def path_of(width, nodes):
+    return Path(width, array('l', [int(node[1]) * width + int(node[0]) for node in nodes]))
+
+'''
+The nodes of a straight line from one node to another, the first one left out. Every step is one of the 8 moves:
+max(|dx|, |dy|) steps, |dx| and |dy| of which move along x and y, so it costs exactly the octile distance between them
+'''
+def _line(x, y, to_x, to_y):
+    dx = to_x - x
+    dy = to_y - y
+    steps = max(abs(dx), abs(dy))
+    for step in range(1, steps + 1):
+        yield x + (2 * step * dx + steps) // (2 * steps), y + (2 * step * dy + steps) // (2 * steps)
+
+'''
+String pulling: returns a copy of the path where every stretch that a straight line can cut across is replaced by that line
+From each kept node, the path is followed as far as the nodes stay in sight (the line to them crosses no wall), and the last one
+in sight is kept next. The lines are still made of 8-directional steps, so agents follow the result the same way, and since a line
+costs the octile distance between its ends, the smoothed path never costs more than the original one
+'''
+def smooth(graph, path):
+    if len(path) < 3:
+        return Path(path.width, array('l', path.indices))
+
+    width = graph.width
+    cells = graph.cells
+
+    def in_sight(node, other):
+        return not any(cells[y * width + x] for x, y in _line(node[0], node[1], other[0], other[1]))
+
+    nodes = list(path)
+    smoothed = array('l', [path.indices[0]])
+    anchor = 0
+    while anchor < len(nodes) - 1:
+        reach = anchor + 1
+        while reach + 1 < len(nodes) and in_sight(nodes[anchor], nodes[reach + 1]):
+            reach += 1
+        for x, y in _line(nodes[anchor][0], nodes[anchor][1], nodes[reach][0], nodes[reach][1]):
+            smoothed.append(y * width + x)
+        anchor = reach
+    return Path(width, smoothed)
@@ -0,0 +1,218 @@
+'''
+Path planning on a time budget, for a game loop that has to draw a frame every few milliseconds however many agents are planning
+
+A ResumableSearch is an A* search that can be stopped after any number of expanded nodes and carried on later, so a search
+that is too long for one frame is spread over several. It keeps its open set and arrays in its own SearchSpace, so other searches
+can run on the grid in between. If walls change while it is paused it starts over, since its g-scores can no longer be trusted
+
+A PlanScheduler queues path requests and works through them with a fixed number of seconds per frame:
+- Requests the PathCache already holds, or the ComponentIndex knows can't be reached, are answered at once
+- The rest are searched one after the other, oldest first, in slices of a few nodes between looks at the clock
+- Whatever doesn't fit is carried over to the next frame, and a new request from the same agent replaces its old one
+'''
+
+import time
+from array import array
+from collections import OrderedDict
+
+from .grid import as_cell
+from .heuristics import make_heuristic
+from .path import Path
+from .search import SearchResult, SearchSpace, expand
+
+class ResumableSearch:
+    '''
+    Params:
+    graph: the Grid to search
+    heuristic, weight: like a_star_search
+    space: the SearchSpace to keep the search in. It must not be used by any other search until this one is done
+    instrument: an instrument.Instrumentation, filled in when the search is done, like with a_star_search
+    '''
+    def __init__(self, graph, start, goal, heuristic=None, weight=None, space=None, instrument=None):
+        if space is None:
+            space = SearchSpace(graph.width, graph.height)
+        self.graph = graph
+        self.start = as_cell(start)
+        self.goal = as_cell(goal)
+        self.heuristic = make_heuristic(heuristic, weight)
+        self.space = space
+        self.instrument = instrument
+        self.result = None # The SearchResult, once the search is done
+        self.slices = 0 # How many calls to step() the search took
+        self.restarts = 0 # How many times walls changed in the middle of the search
+        self.restart()
+
+    # Starts the search from scratch on the grid as it is now
+    def restart(self):
+        started = time.perf_counter()
+        graph = self.graph
+        space = self.space
+        self.version = graph.version
+        self.generation = space.next_generation()
+
+        # Like a_star_search, the search goes from the goal to the start, so following the parents from the start walks towards the goal
+        self.root = graph.index(self.goal)
+        self.target = graph.index(self.start)
+        self.estimate = self.heuristic.bind(graph, self.start)
+        self.reopen = self.heuristic.weight == 1
+
+        space.g[self.root] = 0
+        space.parent[self.root] = -1
+        space.seen[self.root] = self.generation
+        space.open_set.clear()
+        h = self.estimate(self.root)
+        space.open_set.push(self.root, h, h)
+
+        self.expanded = 0
+        self.reopened = 0
+        self.wall_checks = 0
+        self.on_expand = None
+        if self.instrument is not None:
+            self.on_expand = self.instrument.begin()
+        self.timings = {'setup': time.perf_counter() - started, 'search': 0, 'path': 0}
+
+    def done(self):
+        return self.result is not None
+
+    # Expands up to limit nodes. Returns True once the search is done and result is set
+    def step(self, limit):
+        if self.result is not None:
+            return True
+        if self.version != self.graph.version:
+            self.restarts += 1
+            self.restart() # Walls changed since the last slice
+
+        started = time.perf_counter()
+        self.slices += 1
+        found, finished, expanded, reopened, wall_checks = expand(self.space, self.graph.cells, self.generation, self.target, self.estimate,
+                                                                  self.reopen, limit, instrumented=True, on_expand=self.on_expand)
+
+        self.expanded += expanded
+        self.reopened += reopened
+        self.wall_checks += wall_checks
+        copying = time.perf_counter()
+        self.timings['search'] += copying - started
+        if finished:
+            self.finish(found)
+            self.timings['path'] = time.perf_counter() - copying
+            if self.instrument is not None:
+                counters = {'expanded': self.expanded, 'reopened': self.reopened, 'wall_checks': self.wall_checks}
+                self.instrument.finish(self.result, counters, self.timings)
+        return finished
+
+    def finish(self, found):
+        space = self.space
+        counters = space.open_set.counters()
+        counters['slices'] = self.slices
+        counters['restarts'] = self.restarts
+        if not found:
+            self.result = SearchResult(self.start, self.goal, None, None, self.expanded, counters)
+            return
+
+        indices = array('l')
+        node = self.target
+        while node != -1:
+            indices.append(node)
+            node = space.parent[node]
+        self.result = SearchResult(self.start, self.goal, Path(self.graph.width, indices), space.g[self.target], self.expanded, counters)
+
+class PlanScheduler:
+    '''
+    Params:
+    graph: the Grid the paths are planned on
+    budget: seconds of planning per frame, counted from begin_frame()
+    chunk: how many nodes a search expands between two looks at the clock
+    cache: a PathCache. Its results are handed out without searching, and finished searches are stored in it
+    components: a ComponentIndex, so queries that can't be reached are answered without searching
+    options: extra keyword arguments for ResumableSearch, such as heuristic, weight or instrument
+    '''
+    def __init__(self, graph, budget=0.004, chunk=64, cache=None, components=None, **options):
+        if chunk < 1:
+            raise ValueError('The chunk of a PlanScheduler must be at least 1 node')
+
+        self.graph = graph
+        self.budget = budget
+        self.chunk = chunk
+        self.cache = cache
+        self.components = components
+        self.options = options
+
+        self.jobs = OrderedDict() # key -> (start, goal, callback), the oldest request first
+        self.search = None # The ResumableSearch of the oldest request, once it has been started
+        # The SearchSpace of the scheduler's searches, kept apart from the one a_star_search shares. Building it takes a pass
+        # over the whole grid, so it is done here instead of in the middle of a frame
+        self.space = SearchSpace(graph.width, graph.height)
+        self.deadline = 0
+
+        self.completed = 0 # Searches finished
+        self.answered = 0 # Requests answered at once, from the cache or the component index
+        self.deferred = 0 # Frames that ended with requests still waiting
+
+    def __len__(self):
+        return len(self.jobs)
+
+    # Starts the planning time of a frame
+    def begin_frame(self):
+        self.deadline = time.perf_counter() + self.budget
+
+    # Whether some of the frame's planning time is left, for planning done outside the scheduler
+    def has_time(self):
+        return time.perf_counter() < self.deadline
+
+    def pending(self, key):
+        return key in self.jobs
+
+    '''
+    Asks for a path from start to goal. callback(result) is called with the SearchResult once it is ready,
+    right away if it needs no search (and then True is returned), or from a later run() otherwise
+    key: who the path is for, usually the agent. A request replaces the one that has the same key
+    '''
+    def request(self, key, start, goal, callback):
+        start = as_cell(start)
+        goal = as_cell(goal)
+        self.cancel(key)
+
+        if self.components is not None and self.components.separated(start, goal):
+            self.answered += 1
+            callback(SearchResult(start, goal, None, None))
+            return True
+        if self.cache is not None and (start, goal) in self.cache:
+            self.answered += 1
+            callback(self.cache.find_path(start, goal))
+            return True
+
+        self.jobs[key] = (start, goal, callback)
+        return False
+
+    # Forgets the request with the given key, if there is one
+    def cancel(self, key):
+        if key not in self.jobs:
+            return
+        if next(iter(self.jobs)) == key:
+            self.search = None # The request was being searched
+        del self.jobs[key]
+
+    # Works through the requests until they are all answered or the frame's planning time runs out
+    def run(self):
+        graph = self.graph
+        while self.jobs and time.perf_counter() < self.deadline:
+            key, (start, goal, callback) = next(iter(self.jobs.items()))
+            if self.search is None:
+                if self.space.width != graph.width or self.space.height != graph.height:
+                    self.space = SearchSpace(graph.width, graph.height)
+                self.search = ResumableSearch(graph, start, goal, space=self.space, **self.options)
+
+            if not self.search.step(self.chunk):
+                continue
+
+            result = self.search.result
+            self.search = None
+            del self.jobs[key]
+            self.completed += 1
+            cache = self.cache
+            if cache is not None and cache.version == graph.version and (start, goal) not in cache:
+                cache.store((start, goal), result)
+            callback(result)
+
+        if self.jobs:
+            self.deferred += 1
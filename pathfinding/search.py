@@ -0,0 +1,275 @@
+'''
+A* search over a Grid
+The search is independent from any sprite: it takes a grid, a start and a goal and hands back a SearchResult
+
+Nodes are handled as integer indices into Grid.cells (y * width + x) instead of Node objects, and the g-scores,
+parents and closed flags live in flat arrays that are allocated once per grid size and reused by every search
+'''
+
+import time
+import weakref
+from array import array
+
+from .grid import DIRECTIONS, as_cell
+from .heuristics import make_heuristic
+from .openset import OpenSet
+from .path import Path, smooth
+
+# Cost of moving to an adjacent node and to a diagonal node: 1 and sqrt(2) ~ 1.4, both multiplied by 10 to avoid floats
+STRAIGHT_COST = 10
+DIAGONAL_COST = 14
+
+def step_cost(direction):
+    if direction[0] == 0 or direction[1] == 0:
+        return STRAIGHT_COST
+    return DIAGONAL_COST
+
+'''
+Every node falls into one of 16 kinds depending on which edges of the grid it touches:
+bit 0 = left edge, bit 1 = right edge, bit 2 = top edge, bit 3 = bottom edge
+For each kind, the table lists the (index offset, cost) of every direction that stays inside the grid,
+so the search never has to bounds check a neighbour
+'''
+def neighbour_table(width):
+    tables = []
+    for kind in range(16):
+        table = []
+        for dx, dy in DIRECTIONS:
+            if dx < 0 and kind & 1 or dx > 0 and kind & 2 or dy < 0 and kind & 4 or dy > 0 and kind & 8:
+                continue
+            table.append((dy * width + dx, step_cost((dx, dy))))
+        tables.append(tuple(table))
+    return tables
+
+def node_kind(x, y, width, height):
+    return (x == 0) | (x == width - 1) << 1 | (y == 0) << 2 | (y == height - 1) << 3
+
+# The reusable arrays for searching grids of one size
+class SearchSpace:
+    def __init__(self, width, height):
+        size = width * height
+        self.width = width
+        self.height = height
+        self.g = array('l', [0]) * size
+        self.parent = array('l', [-1]) * size
+
+        '''
+        Instead of clearing the arrays before every search, each search gets a new generation number
+        A node's g and parent are only valid if seen[node] holds the current generation, the same goes for closed
+        '''
+        self.seen = array('L', [0]) * size
+        self.closed = array('L', [0]) * size
+        self.generation = 0
+
+        self.open_set = OpenSet(size)
+
+        self.kinds = bytearray(size)
+        for y in range(height):
+            for x in range(width):
+                self.kinds[y * width + x] = node_kind(x, y, width, height)
+        self.neighbours = neighbour_table(width)
+
+    def next_generation(self):
+        self.generation += 1
+        return self.generation
+
+_spaces = weakref.WeakKeyDictionary()
+
+# Returns the search space that belongs to a grid, building a new one the first time or after the grid is resized
+def search_space(graph):
+    space = _spaces.get(graph)
+    if space is None or space.width != graph.width or space.height != graph.height:
+        space = SearchSpace(graph.width, graph.height)
+        _spaces[graph] = space
+    return space
+
+# What a search hands back to its caller. The search arrays are reused, so the path is copied out into a compact Path
+class SearchResult:
+    def __init__(self, start, goal, nodes, cost, expanded=0, counters=None):
+        self.start = start
+        self.goal = goal
+        self.nodes = nodes # A Path from the start to the goal, both included, or None if there is no path
+        self.found = nodes is not None
+        self.cost = cost
+        self.expanded = expanded # How many nodes the search expanded
+        self.counters = counters or {} # Open set statistics: pushes, pops and stale entries that were skipped
+        self.timings = {} # Seconds per phase of the search, only filled in by an instrumented search
+
+    # The nodes from the start to the goal, both included
+    def path(self):
+        if not self.found:
+            return []
+        return list(self.nodes)
+
+    # The direction to take from a node on the path to get one step closer to the goal. O(1) for an agent walking the path
+    def direction(self, node):
+        return self.nodes.direction(node)
+
+    # Yields (node, direction) for every step from a node on the path to the goal
+    def steps(self, node):
+        return self.nodes.steps(node)
+
+    # A copy of the result with the path string-pulled by path.smooth(), and its cost worked out again
+    def smoothed(self, graph):
+        if not self.found:
+            return self
+        nodes = smooth(graph, self.nodes)
+        cost = sum(step_cost(direction) for direction in nodes.directions())
+        return SearchResult(self.start, self.goal, nodes, cost, self.expanded, self.counters)
+
+'''
+The A* main loop, shared by a_star_search and scheduler.ResumableSearch. Expands nodes out of the open set of space until the target
+(a grid index) comes out of it, the open set runs dry, or limit nodes were expanded, -1 meaning no limit. Called again after the limit,
+it carries on where it stopped, as long as nothing else used space in between
+generation, estimate and reopen are the search's, set up like a_star_search does. With instrumented, the wall checks are counted
+and on_expand (if not None) is called with every expanded node
+
+Returns (found, finished, expanded, reopened, wall_checks). finished is False when the limit stopped the search,
+and the counters are only for this call
+'''
+def expand(space, cells, generation, target, estimate, reopen, limit=-1, early_exit=False, instrumented=False, on_expand=None):
+    g = space.g
+    parent = space.parent
+    seen = space.seen
+    closed = space.closed
+    kinds = space.kinds
+    neighbours = space.neighbours
+    push = space.open_set.push
+    pop = space.open_set.pop
+    found = False
+    finished = False
+    expanded = 0
+    reopened = 0
+    wall_checks = 0
+
+    while expanded != limit:
+        # Will always pop, and subsequently, examine the node with the lowest priority, f. Outdated copies of nodes are skipped by the open set
+        current = pop()
+        if current == -1:
+            finished = True
+            break
+
+        if current == target:
+            finished = found = True
+            break
+
+        closed[current] = generation
+        expanded += 1
+        current_g = g[current]
+        table = neighbours[kinds[current]]
+        if instrumented:
+            wall_checks += len(table)
+            if on_expand is not None:
+                on_expand(current)
+
+        for offset, step in table:
+            child = current + offset
+            if cells[child]:
+                continue # Walls are never entered
+
+            cost = current_g + step
+            if seen[child] == generation:
+                if cost >= g[child]:
+                    continue # Case 3: the child has been reached with a cost that is as small already, do nothing!
+                if closed[child] == generation:
+                    if not reopen:
+                        continue
+                    reopened += 1
+                # Case 2: the child was reached but its cost is too large. Pushing it again replaces the old entry, or reopens it if it was closed
+            else:
+                seen[child] = generation # Case 1: the child is unvisited
+
+            g[child] = cost
+            parent[child] = current
+
+            if child == target and early_exit:
+                finished = found = True
+                break
+
+            h = estimate(child)
+            push(child, cost + h, h)
+
+        if found:
+            break
+
+    return found, finished, expanded, reopened, wall_checks
+
+'''
+Params:
+heuristic: None for octile, a name from heuristics.HEURISTICS or a Heuristic object
+weight: inflates the heuristic for weighted A*, which returns a path costing at most weight times the shortest one, but expands fewer nodes
+early_exit: stop as soon as the start is reached instead of when it is expanded. Faster, but the path is no longer guaranteed to be the shortest
+space: the SearchSpace to use instead of the one shared by every search on the grid, for example one per thread
+components: a ComponentIndex of the grid. When it knows the start and the goal are not connected, no search is run at all
+instrument: an instrument.Instrumentation that collects counters, phase timings and callbacks for the query. None costs nothing
+'''
+def a_star_search(graph, start, goal, heuristic=None, weight=None, early_exit=False, space=None, components=None, instrument=None):
+    if instrument is not None:
+        started = time.perf_counter()
+    if components is not None and components.separated(start, goal):
+        result = SearchResult(as_cell(start), as_cell(goal), None, None)
+        if instrument is not None:
+            instrument.begin()
+            instrument.finish(result, {'expanded': 0, 'reopened': 0, 'wall_checks': 0}, {'setup': time.perf_counter() - started, 'search': 0, 'path': 0})
+        return result
+    if space is None:
+        space = search_space(graph)
+    heuristic = make_heuristic(heuristic, weight)
+
+    width = graph.width
+    cells = graph.cells
+    g = space.g
+    parent = space.parent
+    seen = space.seen
+    generation = space.next_generation()
+
+    # SWITCHED because search will find a path from the goal TO THE start positions
+    # This way, following the parents from the start walks towards the goal
+    start = as_cell(start)
+    goal = as_cell(goal)
+    root = graph.index(goal)
+    target = graph.index(start)
+    estimate = heuristic.bind(graph, start)
+    '''
+    Closed nodes are reopened at weight 1, with any heuristic. With octile, chebyshev or euclidean a closed node is never improved,
+    so it only happens with the overestimating manhattan heuristic, like the original search did
+    Above weight 1 they are never reopened, whatever the heuristic: weighted A* keeps its bound without it
+    '''
+    reopen = heuristic.weight == 1
+
+    g[root] = 0
+    parent[root] = -1
+    seen[root] = generation
+
+    open_set = space.open_set
+    open_set.clear()
+    start_h = estimate(root)
+    open_set.push(root, start_h, start_h)
+
+    instrumented = instrument is not None
+    on_expand = None
+    if instrumented:
+        on_expand = instrument.begin()
+        searching = time.perf_counter()
+
+    found, finished, expanded, reopened, wall_checks = expand(space, cells, generation, target, estimate, reopen,
+                                                              early_exit=early_exit, instrumented=instrumented, on_expand=on_expand)
+
+    if instrumented:
+        copying = time.perf_counter()
+
+    if not found:
+        result = SearchResult(start, goal, None, None, expanded, open_set.counters())
+    else:
+        # Follow the parents from the start to the goal to copy the path out of the shared arrays
+        indices = array('l')
+        node = target
+        while node != -1:
+            indices.append(node)
+            node = parent[node]
+        result = SearchResult(start, goal, Path(width, indices), g[target], expanded, open_set.counters())
+
+    if instrumented:
+        timings = {'setup': searching - started, 'search': copying - searching, 'path': time.perf_counter() - copying}
+        instrument.finish(result, {'expanded': expanded, 'reopened': reopened, 'wall_checks': wall_checks}, timings)
+    return result
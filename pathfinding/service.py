@@ -0,0 +1,202 @@
+'''
+Path planning in the background, so a long search never blocks the game loop
+
+A PlannerService runs the searches on a pool of worker threads (or processes) and the main loop calls poll() once per frame
+to collect the ones that finished. Results are handed out from poll() only, on the thread that calls it, so the callbacks
+can touch sprites and the grid without any locking
+
+- Every request has a key, usually the agent it is for. A newer request with the same key supersedes the older one:
+  the older one is cancelled if no worker has started it yet, and its result is thrown away if one has
+- The workers search the live grid (threads) or a copy of it in shared memory that is kept up to date as walls change (processes).
+  The grid's version is noted with every request, and a result that comes back after a wall changed is searched again
+  instead of being handed out, so no callback ever gets a path that was planned around walls that are gone
+'''
+
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .grid import as_cell
+from .landmarks import Landmarks
+from .search import SearchResult, SearchSpace, a_star_search
+from .workers import share_cells, start_worker, worker
+
+# Every worker thread searches in its own SearchSpace, the one a_star_search shares per grid is not safe to use from two threads
+_local = threading.local()
+
+def _thread_search(graph, start, goal, options):
+    space = getattr(_local, 'space', None)
+    if space is None or space.width != graph.width or space.height != graph.height:
+        space = _local.space = SearchSpace(graph.width, graph.height)
+    return a_star_search(graph, start, goal, space=space, **options)
+
+'''
+Worker processes are set up by workers.start_worker(), like the ones of batch_search, with the options given once when they start
+version is the grid's when the request was made. The walls in shared memory change without the worker's grid knowing, so
+the version is brought up to date here, and Landmarks tables are worked out again like the ones in the main process are
+'''
+def _process_search(start, goal, version):
+    grid = worker['grid']
+    if grid.version != version:
+        grid.version = version
+        heuristic = worker['options'].get('heuristic')
+        if isinstance(heuristic, Landmarks) and heuristic.rebuild:
+            heuristic.build()
+    return a_star_search(grid, start, goal, **worker['options'])
+
+# One request on its way: where it goes, the grid version it was sent for, and the future the caller got back
+class _Request:
+    def __init__(self, start, goal, callback, delivery):
+        self.start = start
+        self.goal = goal
+        self.callback = callback
+        self.delivery = delivery
+        self.version = None
+        self.future = None # The worker's future
+
+class PlannerService:
+    '''
+    Params:
+    graph: the Grid the paths are planned on
+    workers: how many worker threads or processes, at most 4 by default
+    processes: use worker processes instead of threads. They search at the same time as the game for real, but options
+               have to be picklable, and instrument callbacks run in the workers. A Landmarks heuristic is rebuilt in every worker
+               on its own copy of the grid, and again when walls change
+    cache: a PathCache. Its results are handed out without searching, and the results that come back are stored in it
+    components: a ComponentIndex, so queries that can't be reached are answered without searching
+    options: extra keyword arguments for a_star_search, such as heuristic, weight or instrument
+    '''
+    def __init__(self, graph, workers=None, processes=False, cache=None, components=None, **options):
+        if workers is None:
+            workers = min(4, os.cpu_count() or 1)
+        if workers < 1:
+            raise ValueError('A PlannerService needs at least 1 worker')
+
+        self.graph = graph
+        self.cache = cache
+        self.components = components
+        self.options = options
+
+        self.requests = {} # key -> the _Request whose result is still wanted
+        self.finished = queue.SimpleQueue() # (key, worker future) pairs, put there by the workers as they finish
+        self.memory = None
+
+        if processes:
+            # Imported here for the same reason as in workers.share_cells()
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.memory = share_cells(graph)
+            self.executor = ProcessPoolExecutor(workers, initializer=start_worker, initargs=(self.memory.name, graph.width, graph.height, options, graph.version))
+            graph.add_listener(self.wall_changed)
+        else:
+            self.executor = ThreadPoolExecutor(workers, thread_name_prefix='planner')
+
+        self.submitted = 0 # Searches sent to the workers
+        self.delivered = 0 # Results handed out by poll()
+        self.answered = 0 # Requests answered at once, from the cache or the component index
+        self.superseded = 0 # Requests replaced or cancelled before their result was handed out
+        self.retried = 0 # Results thrown away because a wall changed during the search
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def __len__(self):
+        return len(self.requests)
+
+    def pending(self, key):
+        return key in self.requests
+
+    '''
+    Asks for a path from start to goal and returns a Future that poll() resolves with the SearchResult
+    callback(result) is called along with it. Requests that need no search are resolved (and called back) right away
+    key: who the path is for. A request supersedes the one that has the same key
+    '''
+    def request(self, key, start, goal, callback=None):
+        start = as_cell(start)
+        goal = as_cell(goal)
+        self.cancel(key)
+
+        delivery = Future()
+        result = None
+        if self.components is not None and self.components.separated(start, goal):
+            result = SearchResult(start, goal, None, None)
+        elif self.cache is not None and (start, goal) in self.cache:
+            result = self.cache.find_path(start, goal)
+        if result is not None:
+            self.answered += 1
+            delivery.set_result(result)
+            if callback is not None:
+                callback(result)
+            return delivery
+
+        self.submit(key, _Request(start, goal, callback, delivery))
+        return delivery
+
+    def submit(self, key, request):
+        request.version = self.graph.version
+        if self.memory is None:
+            request.future = self.executor.submit(_thread_search, self.graph, request.start, request.goal, self.options)
+        else:
+            request.future = self.executor.submit(_process_search, request.start, request.goal, request.version)
+        self.requests[key] = request
+        self.submitted += 1
+        request.future.add_done_callback(lambda future: self.finished.put((key, future)))
+
+    # Forgets the request with the given key: it won't be searched if it hasn't started yet, and won't be handed out if it has
+    def cancel(self, key):
+        request = self.requests.pop(key, None)
+        if request is None:
+            return
+        request.future.cancel()
+        request.delivery.cancel()
+        self.superseded += 1
+
+    # Hands out the results that came back since the last call. Returns how many were handed out
+    def poll(self):
+        delivered = 0
+        while True:
+            try:
+                key, future = self.finished.get_nowait()
+            except queue.Empty:
+                break
+
+            request = self.requests.get(key)
+            if request is None or request.future is not future:
+                continue # Superseded or cancelled while it was being searched
+            del self.requests[key]
+            result = future.result() # Raises here, on the caller's thread, if the search failed
+
+            if request.version != self.graph.version:
+                self.retried += 1
+                self.submit(key, request) # Walls changed while it was searching, so the path may go through a new wall or around an old one
+                continue
+
+            cache = self.cache
+            if cache is not None and cache.version == self.graph.version and (request.start, request.goal) not in cache:
+                cache.store((request.start, request.goal), result)
+            request.delivery.set_result(result)
+            if request.callback is not None:
+                request.callback(result)
+            delivered += 1
+
+        self.delivered += delivered
+        return delivered
+
+    # Grid listener for worker processes: copies the wall change into their shared memory
+    def wall_changed(self, node, blocked):
+        self.memory.buf[self.graph.index(node)] = 1 if blocked else 0
+
+    # Stops the workers, waiting for the searches they are running. Requests still on their way are cancelled
+    def close(self):
+        for key in list(self.requests):
+            self.cancel(key)
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.memory is not None:
+            self.graph.remove_listener(self.wall_changed)
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
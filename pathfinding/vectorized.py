@@ -0,0 +1,238 @@
+'''
+NumPy engine for whole-map queries: distance-to-goal transforms, BFS wavefronts and reachability
+
+Instead of popping one node at a time from a priority queue, every step works on a whole frontier at once with array operations
+The distances use the same 10/14 costs as a_star_search, so both engines give the same answer for the same query
+
+That pays off on open ground, rooms and random walls, where the paths are fairly straight: on 512x512 maps distance_transform()
+takes about 0.2-0.3 s against 0.9 s for DistanceField. Mazes are the opposite. Their long winding corridors need a pass or a step
+per bend, hundreds or thousands of them, each one touching whole rows for a handful of nodes. On maze-511 the sweep alone
+took 3 s and the wavefront 5.4 s, against 0.5 s for DistanceField. So both give up on array operations past a limit
+(MAX_PASSES, MAX_STEPS) and finish with a plain search instead: 0.6 s and 0.9 s on maze-511
+
+numpy is optional. The rest of the package works without it, this module is the only one that needs it,
+and it is not imported by "import pathfinding" so the package still loads quickly
+'''
+
+try:
+    import numpy as np
+except ImportError as error: # pragma: no cover
+    raise ImportError('pathfinding.vectorized needs numpy, install it with: pip install numpy') from error
+
+from .flowfield import UNREACHABLE, DistanceField, dijkstra
+from .grid import DIRECTIONS, as_cell
+from .search import DIAGONAL_COST, STRAIGHT_COST, step_cost
+
+# The walls of a grid as a (height, width) uint8 array, 1 for a wall. It is a view of Grid.cells, nothing is copied
+def occupancy(graph):
+    return np.frombuffer(graph.cells, dtype=np.uint8).reshape(graph.height, graph.width)
+
+def _goal_list(goals):
+    if len(goals) == 2 and not hasattr(goals[0], '__len__'):
+        return [as_cell(goals)] # A single (x, y) goal
+    return [as_cell(goal) for goal in goals]
+
+INFINITE = 1 << 40 # Larger than any real distance, and small enough to leave room for the stretch offsets below
+SEGMENT = 1 << 42 # Offset between the open stretches of a row, see _sweep_row()
+MAX_WIDTH = 1 << 20 # Keeps SEGMENT times the number of stretches in a row within int64
+MAX_PASSES = 64 # Sweeps distance_transform() makes before it hands over to Dijkstra's search. Random 512x512 maps need up to about 30
+MAX_STEPS = 4 # wavefront() hands over to a plain BFS after MAX_STEPS * (width + height) steps, far deeper than any open map gets
+
+'''
+Relaxes one row against itself: a node can be reached from any node in the same open stretch of the row (walls split stretches)
+at 10 per step. The best one on the left is a running minimum of distance - 10 * x, and the best one on the right is a running
+minimum of distance + 10 * x taken backwards. Subtracting/adding a large offset per stretch keeps the running minimum from leaking
+through a wall, since every other stretch then looks much more expensive
+'''
+def _sweep_row(row, offset):
+    # row: distances of the row, offset: straight * x plus SEGMENT times the stretch number, for every node of the row
+    left = np.minimum.accumulate(row - offset) + offset
+    right = np.minimum.accumulate((row + offset)[::-1])[::-1] - offset
+    return np.minimum(row, np.minimum(left, right))
+
+'''
+The cost of the shortest path from every node to the nearest goal, as a (height, width) int64 array, UNREACHABLE for walls and cut off nodes
+goals: one (x, y) node or a list of them
+max_passes: when the sweeps still change something after this many passes, the map is maze-like and the rest is left to
+            flowfield.dijkstra(), which is much faster there. Only with the default 10/14 costs, which are the ones it uses
+
+Instead of a priority queue, a whole row of nodes is relaxed at once: a pass sweeps down the grid, letting every row take the costs of
+the row above (straight for 10, diagonally for 14) and then spreading them sideways along the row, then sweeps back up the same way
+Passes repeat until one changes nothing. On open ground a single pass settles everything, and every pass after that only deals with
+the detours walls force on the paths. The result is the same as Dijkstra's search gives
+'''
+def distance_transform(graph, goals, straight=STRAIGHT_COST, diagonal=DIAGONAL_COST, max_passes=MAX_PASSES):
+    height = graph.height
+    width = graph.width
+    if width > MAX_WIDTH:
+        raise ValueError('distance_transform() supports grids up to ' + str(MAX_WIDTH) + ' nodes wide')
+
+    walls = occupancy(graph) != 0
+    goals = _goal_list(goals)
+    distance = np.full((height, width), INFINITE, dtype=np.int64)
+    for x, y in goals:
+        distance[y, x] = 0
+
+    blocked = walls & (distance != 0) # A goal placed on a wall still spreads its distance, like in a_star_search
+    distance[blocked] = INFINITE
+    offsets = np.cumsum(blocked, axis=1) * SEGMENT + straight * np.arange(width, dtype=np.int64) # A goal on a wall doesn't split its row
+
+    # Spread the goals along their own rows before the first pass, since the downwards sweep starts below the top row
+    for y in range(height):
+        distance[y] = _sweep_row(distance[y], offsets[y])
+        distance[y][blocked[y]] = INFINITE
+
+    '''
+    A row only has to be relaxed again if the row the sweep comes from changed since the last time it was pulled from
+    changed_at[y] is when row y last got cheaper, and pulled_at[direction][y] when row y last took the costs of its previous row
+    '''
+    clock = 1
+    changed_at = [1] * height
+    pulled_at = {True: [0] * height, False: [0] * height}
+
+    fallback = straight == STRAIGHT_COST and diagonal == DIAGONAL_COST
+    passes = 0
+    changed = True
+    while changed:
+        passes += 1
+        if passes > max_passes and fallback:
+            distance = np.array(dijkstra(graph, [graph.index(goal) for goal in goals])[0], dtype=np.int64).reshape(height, width)
+            distance[blocked] = UNREACHABLE
+            return distance
+
+        changed = False
+        for downwards in (True, False):
+            rows = range(1, height) if downwards else range(height - 2, -1, -1)
+            pulled = pulled_at[downwards]
+            for y in rows:
+                source = y - 1 if downwards else y + 1
+                if changed_at[source] <= pulled[y]:
+                    continue
+
+                clock += 1
+                pulled[y] = clock
+                previous = distance[source]
+                row = distance[y]
+
+                best = np.minimum(row, previous + straight)
+                if width > 1:
+                    best[1:] = np.minimum(best[1:], previous[:-1] + diagonal)
+                    best[:-1] = np.minimum(best[:-1], previous[1:] + diagonal)
+                best[blocked[y]] = INFINITE
+                best = _sweep_row(best, offsets[y])
+                best[blocked[y]] = INFINITE
+
+                if (best < row).any():
+                    distance[y] = best
+                    changed_at[y] = clock
+                    changed = True
+
+    distance[distance >= INFINITE] = UNREACHABLE
+    return distance
+
+'''
+Breadth-first wavefront: the number of moves (straight or diagonal, all counted as 1) from the nearest goal to every node,
+as a (height, width) int64 array, UNREACHABLE for walls and cut off nodes
+max_steps: after this many steps (MAX_STEPS * (width + height) by default) the frontier is only a few nodes wide, as in a maze,
+           and the rest of the wavefront is grown one node at a time by _finish_wavefront()
+'''
+def wavefront(graph, goals, max_steps=None):
+    height = graph.height
+    width = graph.width
+    open_ground = np.zeros((height + 2, width + 2), dtype=bool)
+    open_ground[1:-1, 1:-1] = occupancy(graph) == 0
+
+    hops = np.full((height + 2, width + 2), UNREACHABLE, dtype=np.int64)
+    frontier = np.zeros((height + 2, width + 2), dtype=bool)
+    for x, y in _goal_list(goals):
+        frontier[y + 1, x + 1] = True
+    reached = frontier.copy()
+    if max_steps is None:
+        max_steps = MAX_STEPS * (width + height)
+
+    step = 0
+    while True:
+        if step > max_steps:
+            _finish_wavefront(hops, frontier, reached, open_ground, step)
+            break
+        rows = np.flatnonzero(frontier.any(axis=1))
+        if len(rows) == 0:
+            break
+        columns = np.flatnonzero(frontier.any(axis=0))
+        hops[frontier] = step
+
+        # Grow the frontier by one node in all 8 directions at once, only looking at the box around it
+        top = max(rows[0] - 1, 1)
+        bottom = min(rows[-1] + 1, height)
+        left = max(columns[0] - 1, 1)
+        right = min(columns[-1] + 1, width)
+
+        grown = np.zeros((bottom - top + 1, right - left + 1), dtype=bool)
+        for dx, dy in DIRECTIONS:
+            grown |= frontier[top - dy:bottom + 1 - dy, left - dx:right + 1 - dx]
+        grown &= open_ground[top:bottom + 1, left:right + 1] & ~reached[top:bottom + 1, left:right + 1]
+
+        frontier[:] = False
+        frontier[top:bottom + 1, left:right + 1] = grown
+        reached[top:bottom + 1, left:right + 1] |= grown
+        step += 1
+
+    return hops[1:-1, 1:-1].copy()
+
+# Carries on a wavefront() from its frontier with a plain breadth-first search, filling in hops. The arrays have a 1 node border
+def _finish_wavefront(hops, frontier, reached, open_ground, step):
+    stride = hops.shape[1]
+    offsets = [dy * stride + dx for dx, dy in DIRECTIONS]
+    ground = open_ground.ravel().tolist() # The border is not open ground, so no neighbour is ever out of bounds
+    seen = reached.ravel().tolist()
+
+    nodes = []
+    steps = []
+    level = np.flatnonzero(frontier).tolist()
+    while level:
+        nodes += level
+        steps += [step] * len(level)
+        following = []
+        for node in level:
+            for offset in offsets:
+                child = node + offset
+                if ground[child] and not seen[child]:
+                    seen[child] = True
+                    following.append(child)
+        level = following
+        step += 1
+    hops.flat[nodes] = steps
+
+# A (height, width) bool array of the nodes that can reach the goal
+def reachable(graph, goals):
+    return wavefront(graph, goals) != UNREACHABLE
+
+'''
+For every node, the flat index of the neighbour one step closer to the goal according to a distance_transform() result, or -1
+Directions are tried in the order of DIRECTIONS and the first one on a shortest path wins, like in DistanceField
+'''
+def next_nodes(graph, distance):
+    height = graph.height
+    width = graph.width
+    padded = np.full((height + 2, width + 2), UNREACHABLE, dtype=np.int64)
+    padded[1:-1, 1:-1] = distance
+
+    indices = np.arange(height * width, dtype=np.int64).reshape(height, width)
+    result = np.full((height, width), -1, dtype=np.int64)
+    undecided = distance > 0 # The goal itself and unreachable nodes have no next node
+
+    for dx, dy in DIRECTIONS:
+        neighbour = padded[1 + dy:height + 1 + dy, 1 + dx:width + 1 + dx]
+        on_path = undecided & (neighbour != UNREACHABLE) & (neighbour + step_cost((dx, dy)) == distance)
+        result[on_path] = indices[on_path] + dy * width + dx
+        undecided &= ~on_path
+
+    return result.ravel()
+
+# A DistanceField computed with distance_transform() instead of a heap-based Dijkstra search
+class VectorDistanceField(DistanceField):
+    def compute(self):
+        distance = distance_transform(self.graph, self.goal)
+        self.distance = distance.ravel()
+        self.next_node = next_nodes(self.graph, distance)
+        self.expanded = int(np.count_nonzero(distance != UNREACHABLE))
@@ -0,0 +1,41 @@
+'''
+Worker processes that search a grid kept in shared memory, set up the same way for batch_search and PlannerService
+
+The walls are copied into shared memory once with share_cells(), and every worker wraps that memory in its own Grid
+in start_worker(), so the grid is never pickled per task. Wall changes written into the memory are seen by every worker
+'''
+
+from .grid import Grid
+from .landmarks import Landmarks
+
+# State of a worker process, set up once by start_worker(): its grid and the options it searches with
+worker = {}
+
+# Copies the walls of a grid into new shared memory, for the workers to wrap in start_worker(). The caller closes and unlinks it
+def share_cells(graph):
+    # Imported here instead of at the top, multiprocessing would take longer to import than the whole package
+    from multiprocessing import shared_memory
+
+    size = graph.width * graph.height
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    memory.buf[:size] = graph.cells
+    return memory
+
+'''
+The initializer of a worker process: wraps the shared memory called name in a Grid, kept in worker with the options
+version: the version of the grid the memory was copied from
+A Landmarks heuristic in the options comes without its grid and is given the worker's. Its tables still hold for as long as
+the versions match
+'''
+def start_worker(name, width, height, options, version=0):
+    from multiprocessing import shared_memory
+
+    memory = shared_memory.SharedMemory(name=name)
+    grid = Grid(width, height, cells=memory.buf[:width * height])
+    grid.version = version
+    heuristic = options.get('heuristic')
+    if isinstance(heuristic, Landmarks):
+        heuristic.graph = grid
+    worker['memory'] = memory # Kept alive for as long as the worker runs, the grid points into it
+    worker['grid'] = grid
+    worker['options'] = options
@@ -0,0 +1,69 @@
+'''
+What the tests share: random grids, and DistanceField as the reference every planner's costs are checked against
+DistanceField itself is checked against reference_cost(), a plain Dijkstra search that shares no code with the package
+'''
+
+import heapq
+import random
+
+from pathfinding import DIRECTIONS, DistanceField, Grid, step_cost
+
+INFINITY = float('inf')
+
+def random_grid(seed, width=24, height=18, density=0.25):
+    rng = random.Random(seed)
+    graph = Grid(width, height)
+    for node in range(width * height):
+        if rng.random() < density:
+            graph.cells[node] = 1
+    return graph
+
+# A random open node, as an (x, y) tuple
+def open_node(rng, graph):
+    while True:
+        node = (rng.randrange(graph.width), rng.randrange(graph.height))
+        if graph.passable(node):
+            return node
+
+# Toggles a random node that is not one of keep, and returns it
+def toggle_random(rng, graph, keep=()):
+    while True:
+        node = (rng.randrange(graph.width), rng.randrange(graph.height))
+        if node not in keep:
+            graph.toggle_wall(node)
+            return node
+
+# The cost of the shortest path from start to goal, or None if there is none
+def shortest(graph, start, goal):
+    return DistanceField(graph, goal).cost(start)
+
+# The cost of the shortest path from start to goal over open nodes, or None if there is none
+def reference_cost(graph, start, goal):
+    distance = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if node == goal:
+            return cost
+        if cost > distance[node]:
+            continue
+        for dx, dy in DIRECTIONS:
+            child = (node[0] + dx, node[1] + dy)
+            if graph.in_bounds(child) and graph.passable(child) and cost + step_cost((dx, dy)) < distance.get(child, INFINITY):
+                distance[child] = cost + step_cost((dx, dy))
+                heapq.heappush(heap, (distance[child], child))
+    return None
+
+# Checks that a result's path goes from its start to its goal over open nodes, one step at a time, and costs what it says
+def check_path(graph, result):
+    nodes = result.path()
+    assert nodes[0] == result.start
+    assert nodes[-1] == result.goal
+    cost = 0
+    for node, following in zip(nodes, nodes[1:]):
+        dx = following[0] - node[0]
+        dy = following[1] - node[1]
+        assert max(abs(dx), abs(dy)) == 1, 'not a step: ' + str(node) + ' -> ' + str(following)
+        cost += step_cost((dx, dy))
+    assert all(graph.passable(node) for node in nodes)
+    assert cost == result.cost
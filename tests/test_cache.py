@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from pathfinding import PathCache, jump_point_search
+
+from helpers import check_path, open_node, random_grid, shortest, toggle_random
+
+SEEDS = range(6)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_cached_paths_stay_shortest_through_wall_changes(seed):
+    graph = random_grid(seed)
+    rng = random.Random(seed)
+    cache = PathCache(graph, capacity=16)
+    queries = [(open_node(rng, graph), open_node(rng, graph)) for query in range(24)]
+    for change in range(30):
+        for start, goal in rng.sample(queries, 8):
+            result = cache.find_path(start, goal)
+            assert result.cost == shortest(graph, start, goal)
+            if result.found:
+                check_path(graph, result)
+        toggle_random(rng, graph, keep=[node for query in queries for node in query])
+    assert cache.hits and cache.invalidated
+    assert len(cache) <= 16
+    cache.detach()
+
+def test_only_paths_through_a_new_wall_are_dropped():
+    graph = random_grid(0, density=0.0)
+    cache = PathCache(graph)
+    top = cache.find_path((0, 0), (20, 0))
+    bottom = cache.find_path((0, 17), (20, 17))
+    graph.add_wall(top.path()[5])
+    assert (((0, 0), (20, 0)) in cache, ((0, 17), (20, 17)) in cache) == (False, True)
+    assert cache.find_path((0, 17), (20, 17)) is bottom
+    assert cache.find_path((0, 0), (20, 0)).cost == shortest(graph, (0, 0), (20, 0))
+
+def test_a_grid_changed_behind_its_back_clears_the_cache():
+    graph = random_grid(0, density=0.0)
+    cache = PathCache(graph, search=jump_point_search)
+    cache.find_path((0, 0), (20, 0))
+    graph.cells[graph.index((10, 0))] = 1
+    graph.version += 1
+    assert ((0, 0), (20, 0)) not in cache
+    assert cache.find_path((0, 0), (20, 0)).cost == shortest(graph, (0, 0), (20, 0))
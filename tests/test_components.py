@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from pathfinding import ComponentIndex, DistanceField, Grid
+
+from helpers import open_node, random_grid, toggle_random
+
+SEEDS = range(6)
+
+# Whether every pair of sampled open nodes is connected in the index exactly when DistanceField finds a path between them
+def check_against_fields(rng, graph, index):
+    nodes = [open_node(rng, graph) for sample in range(8)]
+    for goal in nodes:
+        field = DistanceField(graph, goal)
+        for node in nodes:
+            assert index.connected(node, goal) == field.reachable(node)
+            assert index.separated(node, goal) == (not field.reachable(node))
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('density', [0.2, 0.4])
+def test_wall_changes_keep_components_right(seed, density):
+    graph = random_grid(seed, density=density)
+    rng = random.Random(seed)
+    index = ComponentIndex(graph)
+    for change in range(40):
+        toggle_random(rng, graph)
+        check_against_fields(rng, graph, index)
+    index.detach()
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_split_by_a_line_of_walls(seed):
+    graph = random_grid(seed, density=0.1)
+    rng = random.Random(seed)
+    index = ComponentIndex(graph)
+    column = rng.randrange(2, graph.width - 2)
+    for y in rng.sample(range(graph.height), graph.height):
+        graph.add_wall((column, y)) # The last one cuts the map in two, wherever it lands
+        check_against_fields(rng, graph, index)
+    left = [(x, y) for x in range(column) for y in range(graph.height) if graph.passable((x, y))]
+    right = [(x, y) for x in range(column + 1, graph.width) for y in range(graph.height) if graph.passable((x, y))]
+    assert not any(index.connected(left[0], node) for node in right)
+    assert not index.separated(left[0], (column, 0)) # A wall endpoint is never called separated, it is left to the search
+    index.detach()
+
+def test_a_wall_between_touching_neighbours_splits_nothing():
+    graph = Grid(5, 5)
+    index = ComponentIndex(graph)
+    graph.add_wall((2, 2))
+    assert len(index.groups(graph.index((2, 2)))) == 1
+    assert index.connected((1, 2), (3, 2))
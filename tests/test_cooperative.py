@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from pathfinding import CooperativePlanner, Grid, ReservationTable
+
+from helpers import open_node, random_grid, shortest
+
+SEEDS = range(6)
+
+# Every agent's plan, one node per time step, with the agent staying on its last node until the end of the window
+def timelines(results, window):
+    lines = {}
+    for key, result in results.items():
+        nodes = result.path() if result.found else [result.start]
+        lines[key] = nodes + [nodes[-1]] * (window + 1 - len(nodes))
+    return lines
+
+def check_no_conflicts(graph, results, window):
+    lines = timelines(results, window)
+    for key, nodes in lines.items():
+        for node, following in zip(nodes, nodes[1:]):
+            assert max(abs(following[0] - node[0]), abs(following[1] - node[1])) <= 1 # A step or a wait
+            assert graph.passable(following)
+    for time in range(window + 1):
+        here = [nodes[time] for nodes in lines.values()]
+        assert len(set(here)) == len(here), 'two agents on the same node at time ' + str(time)
+    for time in range(window):
+        moves = {(nodes[time], nodes[time + 1]) for nodes in lines.values() if nodes[time] != nodes[time + 1]}
+        assert not any((following, node) in moves for node, following in moves), 'two agents swapped places at time ' + str(time)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_crowds_never_collide(seed):
+    graph = random_grid(seed, density=0.15)
+    rng = random.Random(seed)
+    window = 8
+    planner = CooperativePlanner(graph, window=window)
+    starts = set()
+    while len(starts) < 12:
+        starts.add(open_node(rng, graph))
+    goal = open_node(rng, graph)
+    agents = {key: start for key, start in enumerate(sorted(starts))}
+    for turn in range(10):
+        results = planner.plan([(key, node, goal) for key, node in agents.items()])
+        check_no_conflicts(graph, results, window)
+        for key, result in results.items():
+            if result.found and len(result.path()) > 1:
+                agents[key] = result.path()[1] # Everyone takes one step, and plans again
+        if turn % 3 == 2:
+            goal = open_node(rng, graph) # The target moves
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_an_agent_alone_gets_the_shortest_cost(seed):
+    graph = random_grid(seed)
+    rng = random.Random(seed)
+    planner = CooperativePlanner(graph, window=6)
+    for query in range(10):
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        result = planner.plan([('alone', start, goal)])['alone']
+        assert result.cost == shortest(graph, start, goal)
+
+def test_head_on_agents_step_aside():
+    graph = random_grid(0, 9, 3, density=0.0)
+    planner = CooperativePlanner(graph, window=12)
+    results = planner.plan([('a', (0, 1), (8, 1)), ('b', (8, 1), (0, 1))])
+    check_no_conflicts(graph, results, 12)
+    assert results['a'].path()[-1] == (8, 1) and results['b'].path()[-1] == (0, 1)
+
+# Agents that haven't planned yet stand where they are, so the ones before them wait or go around instead of walking through
+def test_agents_planned_first_never_walk_into_the_others():
+    graph = Grid(3, 1)
+    results = CooperativePlanner(graph, window=4).plan([('a', (0, 0), (2, 0)), ('b', (1, 0), (2, 0))])
+    check_no_conflicts(graph, results, 4)
+    assert results['b'].path()[-1] == (2, 0)
+
+def corridor():
+    graph = Grid(4, 3)
+    for x in range(4):
+        graph.add_wall((x, 0))
+        graph.add_wall((x, 2))
+    return graph
+
+def test_an_agent_standing_in_a_corridor_is_not_walked_through():
+    graph = corridor()
+    results = CooperativePlanner(graph, window=6).plan([('a', (0, 1), (3, 1)), ('b', (2, 1), (2, 1))])
+    check_no_conflicts(graph, results, 6)
+    assert list(results['b'].path()) == [(2, 1)]
+
+# Neither can get past the other, so one of them is boxed in whatever the other does
+def test_head_on_agents_in_a_corridor_never_collide():
+    graph = corridor()
+    planner = CooperativePlanner(graph, window=6)
+    results = planner.plan([('a', (0, 1), (3, 1)), ('b', (3, 1), (0, 1))])
+    check_no_conflicts(graph, results, 6)
+    assert planner.boxed
+
+def test_reservations_held_by_another_agent_are_kept():
+    table = ReservationTable()
+    table.reserve('a', [1, 2])
+    table.reserve('b', [1, 3])
+    assert not table.free(1, 0, 'b') and table.free(1, 0, 'a')
+    table.release('b')
+    assert not table.free(1, 0) and table.free(3, 1)
+
+def test_released_reservations_are_free_again():
+    table = ReservationTable()
+    table.reserve('a', [1, 2, 3], until=5)
+    assert not table.free(3, 5) and table.free(3, 5, 'a')
+    table.release('a')
+    assert len(table) == 0 and table.free_from(3, 0, 5)
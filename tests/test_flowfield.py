@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from pathfinding import DistanceField, SharedDistanceField
+
+from helpers import check_path, open_node, random_grid, reference_cost, toggle_random
+
+SEEDS = range(6)
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('density', [0.0, 0.25, 0.4])
+def test_distance_field_matches_dijkstra(seed, density):
+    graph = random_grid(seed, density=density)
+    rng = random.Random(seed)
+    goal = open_node(rng, graph)
+    field = DistanceField(graph, goal)
+    for query in range(30):
+        start = open_node(rng, graph)
+        best = reference_cost(graph, start, goal)
+        assert field.cost(start) == best
+        assert field.reachable(start) == (best is not None)
+        if best is not None:
+            check_path(graph, field.path(start))
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_shared_field_follows_the_goal_and_the_walls(seed):
+    graph = random_grid(seed)
+    rng = random.Random(seed)
+    shared = SharedDistanceField(graph)
+    for change in range(10):
+        goal = open_node(rng, graph)
+        field = shared.towards(goal)
+        assert shared.towards(goal) is field # Nothing changed in between, so the same field is handed out
+        start = open_node(rng, graph)
+        assert field.cost(start) == reference_cost(graph, start, goal)
+        toggle_random(rng, graph, keep=(goal,))
+        assert shared.towards(goal) is not field
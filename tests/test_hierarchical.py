@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from pathfinding import HierarchicalPlanner, step_cost
+
+from helpers import check_path, open_node, random_grid, shortest, toggle_random
+
+SEEDS = range(6)
+
+# HPA* paths are not always the shortest, so they are checked for being real paths that are found exactly when one exists
+def check_query(graph, planner, start, goal):
+    best = shortest(graph, start, goal)
+    result = planner.find_path(start, goal)
+    raw = planner.find_path(start, goal, smooth=False)
+    if best is None:
+        assert not result.found and not raw.found
+        return
+    check_path(graph, result)
+    check_path(graph, raw)
+    assert best <= result.cost <= raw.cost
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('cluster_size', [4, 7])
+def test_paths_are_found_exactly_when_they_exist(seed, cluster_size):
+    graph = random_grid(seed, 30, 22)
+    planner = HierarchicalPlanner(graph, cluster_size)
+    rng = random.Random(seed)
+    for query in range(30):
+        check_query(graph, planner, open_node(rng, graph), open_node(rng, graph))
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_start_and_goal_inserted_in_the_same_cluster(seed):
+    graph = random_grid(seed, 30, 22)
+    planner = HierarchicalPlanner(graph, 8)
+    rng = random.Random(seed)
+    for query in range(30):
+        start = open_node(rng, graph)
+        goal = (start[0] // 8 * 8 + rng.randrange(8), start[1] // 8 * 8 + rng.randrange(8))
+        if graph.in_bounds(goal) and graph.passable(goal):
+            check_query(graph, planner, start, goal)
+        entrance = rng.choice(sorted(planner.links))
+        check_query(graph, planner, graph.coordinates(entrance), start) # Starting on an entrance
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_wall_changes_match_a_new_planner(seed):
+    graph = random_grid(seed, 30, 22)
+    planner = HierarchicalPlanner(graph, 6)
+    rng = random.Random(seed)
+    for change in range(25):
+        toggle_random(rng, graph)
+        fresh = HierarchicalPlanner(graph, 6)
+        fresh.detach()
+        assert planner.links == fresh.links
+        assert [cluster.edges for cluster in planner.clusters] == [cluster.edges for cluster in fresh.clusters]
+        check_query(graph, planner, open_node(rng, graph), open_node(rng, graph))
+    planner.detach()
+
+def test_paths_are_a_few_percent_longer_at_most_on_average():
+    graph = random_grid(0, 64, 64, density=0.1)
+    planner = HierarchicalPlanner(graph)
+    rng = random.Random(0)
+    total = best_total = 0
+    for query in range(40):
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        best = shortest(graph, start, goal)
+        if best is not None:
+            total += planner.find_path(start, goal).cost
+            best_total += best
+    assert total <= 1.05 * best_total
+
+# Without smoothing, the clusters are only refined as far as the path is followed
+def test_unsmoothed_paths_are_refined_as_they_are_followed():
+    graph = random_grid(0, 64, 64, density=0.1)
+    planner = HierarchicalPlanner(graph, 8)
+    start = next(node for node in zip(range(8), range(8)) if graph.passable(node))
+    goal = next(node for node in zip(range(63, 55, -1), range(63, 55, -1)) if graph.passable(node))
+    result = planner.find_path(start, goal, smooth=False)
+    assert result.found
+
+    refined = []
+    for cluster in planner.clusters:
+        cluster.path = lambda graph, start, goal, path=cluster.path: refined.append(start) or path(graph, start, goal)
+    node = start
+    for step in range(3):
+        dx, dy = result.direction(node)
+        node = (node[0] + dx, node[1] + dy)
+    assert len(refined) == 1
+    check_path(graph, result)
+    assert result.cost == sum(step_cost(direction) for direction in result.nodes.directions())
+    assert len(refined) > 4
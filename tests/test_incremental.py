@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from pathfinding import DIRECTIONS, DStarLite, JumpTable, a_star_search, jump_point_search
+
+from helpers import check_path, open_node, random_grid, shortest, toggle_random
+
+SEEDS = range(6)
+
+# One step in a random direction, if it lands on open ground
+def wander(rng, graph, node):
+    dx, dy = rng.choice(DIRECTIONS)
+    following = (node[0] + dx, node[1] + dy)
+    if graph.in_bounds(following) and graph.passable(following):
+        return following
+    return node
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_d_star_lite_repairs_after_wall_changes(seed):
+    graph = random_grid(seed)
+    rng = random.Random(seed)
+    start = open_node(rng, graph)
+    goal = open_node(rng, graph)
+    planner = DStarLite(graph, start, goal)
+    for change in range(30):
+        result = planner.plan()
+        assert result.cost == shortest(graph, start, goal)
+        if result.found:
+            check_path(graph, result)
+        toggle_random(rng, graph, keep=(start, goal))
+    planner.detach()
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_d_star_lite_follows_moving_endpoints(seed):
+    graph = random_grid(seed, density=0.2)
+    rng = random.Random(seed)
+    start = open_node(rng, graph)
+    goal = open_node(rng, graph)
+    planner = DStarLite(graph, start, goal)
+    for turn in range(40):
+        result = planner.plan()
+        assert result.cost == shortest(graph, start, goal)
+        if result.found:
+            check_path(graph, result)
+            start = result.path()[1] if len(result.path()) > 1 else start # The agent walks its path
+        goal = wander(rng, graph, goal)
+        if turn % 5 == 4:
+            toggle_random(rng, graph, keep=(start, goal))
+        planner.move_start(start)
+        planner.move_goal(goal)
+    planner.detach()
+
+# The game lets walls go down on the agent and on the player. Like a_star_search, a goal on a wall can still be reached and a start on one can't
+@pytest.mark.parametrize('seed', SEEDS)
+def test_d_star_lite_agrees_with_a_star_on_wall_endpoints(seed):
+    graph = random_grid(seed, density=0.2)
+    rng = random.Random(seed)
+    start = open_node(rng, graph)
+    goal = open_node(rng, graph)
+    planner = DStarLite(graph, start, goal)
+    for turn in range(60):
+        result = planner.plan()
+        assert result.cost == a_star_search(graph, start, goal).cost
+        if result.found and len(result.path()) > 1:
+            start = result.path()[1]
+        goal = wander(rng, graph, goal)
+        graph.toggle_wall(rng.choice([start, goal, open_node(rng, graph)]))
+        planner.move_start(start)
+        planner.move_goal(goal)
+    planner.detach()
+
+def test_d_star_lite_rejects_an_inconsistent_heuristic():
+    with pytest.raises(ValueError):
+        DStarLite(random_grid(0), (0, 0), (1, 1), heuristic='manhattan')
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_jump_table_updates_match_a_new_table(seed):
+    graph = random_grid(seed)
+    rng = random.Random(seed)
+    table = JumpTable(graph)
+    for change in range(25):
+        toggle_random(rng, graph)
+        fresh = JumpTable(graph)
+        fresh.detach()
+        assert table.distances == fresh.distances
+
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        assert jump_point_search(graph, start, goal, table=table).cost == shortest(graph, start, goal)
+    table.detach()
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from pathfinding import (
+    ComponentIndex, JumpTable, Landmarks, NextHopTable, a_star_search, load_map, parse_walls, read_benchmark_map, save_map,
+    write_benchmark_map,
+)
+
+from helpers import open_node, random_grid, shortest
+
+@pytest.mark.parametrize('packing', ['bytes', 'bits'])
+@pytest.mark.parametrize('memory_map', [True, False])
+def test_round_trip_keeps_walls_and_sections(tmp_path, packing, memory_map):
+    graph = random_grid(3, 13, 9) # 117 nodes, so the bits don't fill the last byte
+    components = ComponentIndex(graph)
+    jumps = JumpTable(graph)
+    landmarks = Landmarks(graph, 4)
+    hops = NextHopTable(graph)
+    path = tmp_path / 'saved.bin'
+    save_map(path, graph, packing, components=components, jumps=jumps, landmarks=landmarks, hops=hops)
+
+    loaded = load_map(path, memory_map=memory_map)
+    grid = loaded.grid
+    assert (grid.width, grid.height) == (graph.width, graph.height)
+    assert bytes(grid.cells) == bytes(graph.cells)
+    assert list(loaded.components().canonical_labels()) == list(components.canonical_labels())
+    assert [list(table) for table in loaded.jump_table().distances] == [list(table) for table in jumps.distances]
+    assert loaded.landmarks().nodes == landmarks.nodes
+    assert [list(row) for row in loaded.next_hops().rows] == [list(row) for row in hops.rows]
+
+    rng = random.Random(3)
+    for query in range(20):
+        start = open_node(rng, grid)
+        goal = open_node(rng, grid)
+        best = shortest(grid, start, goal)
+        assert loaded.next_hops().find_path(start, goal).cost == best
+        assert a_star_search(grid, start, goal, heuristic=loaded.landmarks()).cost == best
+
+def test_walls_changed_after_loading_never_reach_the_file(tmp_path):
+    path = tmp_path / 'saved.bin'
+    save_map(path, random_grid(0))
+    grid = load_map(path).grid
+    grid.toggle_wall((0, 0))
+    assert bytes(load_map(path).grid.cells) != bytes(grid.cells)
+
+def test_sections_are_optional(tmp_path):
+    graph = random_grid(1)
+    path = tmp_path / 'plain.bin'
+    save_map(path, graph)
+    loaded = load_map(path)
+    assert 'labels' not in loaded and 'jumps' not in loaded
+    assert loaded.jump_table().distances == JumpTable(graph).distances
+
+@pytest.mark.parametrize('content', [b'', b'short', b'x' * 64])
+def test_broken_files_raise_value_error(tmp_path, content):
+    path = tmp_path / 'broken.bin'
+    path.write_bytes(content)
+    for memory_map in (True, False):
+        with pytest.raises(ValueError):
+            load_map(path, memory_map=memory_map)
+
+def test_benchmark_map_round_trip(tmp_path):
+    graph = random_grid(2, 17, 11)
+    path = tmp_path / 'saved.map'
+    write_benchmark_map(path, graph)
+    assert bytes(read_benchmark_map(path).cells) == bytes(graph.cells)
+
+def test_parse_walls_reads_a_wall_list():
+    graph = parse_walls('[(1, 2), (3,4)]', 5, 5)
+    assert graph.is_wall((1, 2)) and graph.is_wall((3, 4))
+    assert sum(graph.cells) == 2
@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from pathfinding import Grid, JumpTable, NextHopTable, ResumableSearch, a_star_search, jump_point_search
+
+from helpers import check_path, open_node, random_grid, shortest
+
+SEEDS = range(6)
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('density', [0.0, 0.2, 0.35])
+def test_a_star_matches_distance_field(seed, density):
+    graph = random_grid(seed, density=density)
+    rng = random.Random(seed)
+    for query in range(20):
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        result = a_star_search(graph, start, goal)
+        assert result.cost == shortest(graph, start, goal)
+        if result.found:
+            check_path(graph, result)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_weighted_a_star_stays_in_bound(seed):
+    graph = random_grid(seed)
+    rng = random.Random(seed)
+    for query in range(20):
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        best = shortest(graph, start, goal)
+        result = a_star_search(graph, start, goal, weight=1.5)
+        if best is None:
+            assert not result.found
+        else:
+            check_path(graph, result)
+            assert best <= result.cost <= 1.5 * best
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_jump_point_search_matches_distance_field(seed):
+    graph = random_grid(seed)
+    table = JumpTable(graph)
+    rng = random.Random(seed)
+    for query in range(20):
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        best = shortest(graph, start, goal)
+        for result in (jump_point_search(graph, start, goal), jump_point_search(graph, start, goal, table=table)):
+            assert result.cost == best
+            if result.found:
+                check_path(graph, result)
+
+# Like a_star_search, a goal on a wall can still be reached and a start on one can't, unless it is the goal too
+@pytest.mark.parametrize('seed', SEEDS)
+def test_jump_point_search_agrees_with_a_star_on_wall_endpoints(seed):
+    graph = random_grid(seed, density=0.2)
+    table = JumpTable(graph)
+    rng = random.Random(seed)
+    for query in range(20):
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        walled = rng.choice([start, goal])
+        graph.toggle_wall(walled)
+        results = []
+        for query_start, query_goal in ((start, goal), (walled, walled)):
+            expected = a_star_search(graph, query_start, query_goal).cost
+            for result in (jump_point_search(graph, query_start, query_goal), jump_point_search(graph, query_start, query_goal, table=table)):
+                assert result.cost == expected
+                results.append(result)
+        graph.toggle_wall(walled)
+        for result in results:
+            if result.found:
+                check_path(graph, result) # With the wall gone again, since the path ends on it
+    table.detach()
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_resumable_search_matches_a_star(seed):
+    graph = random_grid(seed)
+    rng = random.Random(seed)
+    for query in range(20):
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        search = ResumableSearch(graph, start, goal)
+        while not search.step(rng.randrange(1, 16)):
+            pass
+        expected = a_star_search(graph, start, goal)
+        assert (search.result.cost, search.result.expanded) == (expected.cost, expected.expanded)
+
+def test_resumable_search_restarts_after_a_wall_change():
+    graph = random_grid(1, density=0.0)
+    search = ResumableSearch(graph, (0, 0), (23, 17))
+    search.step(5)
+    for y in range(1, 18):
+        graph.add_wall((12, y))
+    while not search.step(8):
+        pass
+    assert search.restarts == 1
+    assert search.result.cost == shortest(graph, (0, 0), (23, 17))
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_next_hop_table_matches_distance_field(seed):
+    graph = random_grid(seed, 14, 10)
+    table = NextHopTable(graph)
+    rng = random.Random(seed)
+    for query in range(30):
+        start = open_node(rng, graph)
+        goal = open_node(rng, graph)
+        result = table.find_path(start, goal)
+        assert result.cost == shortest(graph, start, goal)
+        if result.found:
+            check_path(graph, result)
+
+def test_next_hop_table_costs_diagonals_on_a_narrow_grid():
+    graph = Grid(2, 2, cells=bytearray(b'\x00\x00\x00\x01'))
+    assert NextHopTable(graph).find_path((1, 0), (0, 1)).cost == 14
@@ -0,0 +1,54 @@
+import random
+import time
+
+import pytest
+
+from pathfinding import Instrumentation, Landmarks, PlannerService, a_star_search
+
+from helpers import open_node, random_grid, shortest
+
+# Polls until every request came back, and returns the futures' results
+def wait_for(service, futures):
+    deadline = time.monotonic() + 30
+    while len(service) and time.monotonic() < deadline:
+        service.poll()
+        time.sleep(0.001)
+    return [future.result() for future in futures]
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_results_match_the_walls_they_are_handed_out_with(processes):
+    graph = random_grid(0, 40, 30)
+    rng = random.Random(0)
+    with PlannerService(graph, workers=2, processes=processes) as service:
+        for change in range(3):
+            queries = [(open_node(rng, graph), open_node(rng, graph)) for query in range(8)]
+            futures = [service.request(key, start, goal) for key, (start, goal) in enumerate(queries)]
+            graph.add_wall(open_node(rng, graph)) # While the workers search, so some of them are searched again
+            for (start, goal), result in zip(queries, wait_for(service, futures)):
+                assert result.cost == shortest(graph, start, goal)
+
+# The workers build their own tables from their copy of the grid, so they expand as few nodes as the main process
+def test_worker_processes_use_landmarks():
+    graph = random_grid(1, 40, 30)
+    landmarks = Landmarks(graph, 4)
+    rng = random.Random(1)
+    with PlannerService(graph, workers=2, processes=True, heuristic=landmarks) as service:
+        for change in range(3):
+            queries = [(open_node(rng, graph), open_node(rng, graph)) for query in range(8)]
+            futures = [service.request(key, start, goal) for key, (start, goal) in enumerate(queries)]
+            for (start, goal), result in zip(queries, wait_for(service, futures)):
+                expected = a_star_search(graph, start, goal, heuristic=landmarks)
+                assert (result.cost, result.expanded) == (expected.cost, expected.expanded)
+            graph.toggle_wall(open_node(rng, graph))
+
+# The thread workers share one instrument, as the game's debug overlay does
+def test_threads_share_an_instrument():
+    graph = random_grid(2, 40, 30)
+    trace = Instrumentation(record=True)
+    rng = random.Random(2)
+    queries = [(open_node(rng, graph), open_node(rng, graph)) for query in range(40)]
+    with PlannerService(graph, workers=4, instrument=trace) as service:
+        results = wait_for(service, [service.request(key, start, goal) for key, (start, goal) in enumerate(queries)])
+    assert trace.queries == len(queries)
+    assert trace.totals['expanded'] == sum(result.expanded for result in results)
+    assert len(trace.expanded_nodes) == trace.last.expanded
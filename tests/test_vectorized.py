@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from pathfinding import UNREACHABLE, DistanceField
+from pathfinding.vectorized import VectorDistanceField, distance_transform, reachable, wavefront
+
+from helpers import open_node, random_grid
+
+SEEDS = range(6)
+
+# Moves from the goal to every node, each step costing 1, with a plain breadth-first search
+def hops_from(graph, goal):
+    hops = [UNREACHABLE] * (graph.width * graph.height)
+    hops[graph.index(goal)] = 0
+    queue = [graph.index(goal)]
+    for node in queue:
+        x, y = graph.coordinates(node)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                if graph.in_bounds((x + dx, y + dy)) and graph.passable((x + dx, y + dy)):
+                    child = graph.index((x + dx, y + dy))
+                    if hops[child] == UNREACHABLE:
+                        hops[child] = hops[node] + 1
+                        queue.append(child)
+    return hops
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('max_passes', [1, 64])
+def test_distance_transform_matches_distance_field(seed, max_passes):
+    graph = random_grid(seed, density=0.3)
+    rng = random.Random(seed)
+    for query in range(5):
+        goal = open_node(rng, graph)
+        expected = DistanceField(graph, goal).distance
+        assert distance_transform(graph, goal, max_passes=max_passes).ravel().tolist() == list(expected)
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('max_steps', [1, None])
+def test_wavefront_counts_moves(seed, max_steps):
+    graph = random_grid(seed, density=0.3)
+    goal = open_node(random.Random(seed), graph)
+    hops = hops_from(graph, goal)
+    assert wavefront(graph, goal, max_steps=max_steps).ravel().tolist() == hops
+    assert reachable(graph, goal).ravel().tolist() == [distance != UNREACHABLE for distance in hops]
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_vector_field_paths_match_distance_field(seed):
+    graph = random_grid(seed, density=0.25)
+    rng = random.Random(seed)
+    goal = open_node(rng, graph)
+    field = DistanceField(graph, goal)
+    vector = VectorDistanceField(graph, goal)
+    for query in range(20):
+        start = open_node(rng, graph)
+        assert vector.cost(start) == field.cost(start)
+        assert vector.path(start).cost == field.path(start).cost